@@ -1,10 +1,15 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 from app.core.database import SessionLocal
+from app.core.async_database import AsyncSessionLocal
+from app.core.replicas import get_read_db, get_async_read_db
+from app.core.principal import Principal, cache_principal, get_cached_principal
 from app.models.models import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
@@ -16,10 +21,45 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def _load_principal(subject: str) -> Optional[Principal]:
+    """
+    Resolve a token subject (user id or email) to a Principal.
+
+    Served from the principal cache when possible; on a miss the user row
+    is read on the async engine and the result cached for
+    PRINCIPAL_CACHE_TTL_SECONDS. The cache may be Redis, so its calls run
+    in the threadpool.
+    """
+    principal = await run_in_threadpool(get_cached_principal, subject)
+    if principal is not None:
+        return principal
+
+    # If the subject is an email, find the user by email
+    if '@' in subject:
+        condition = User.email == subject
+    else:
+        # Try to convert to integer if it's not an email
+        try:
+            condition = User.id == int(subject)
+        except ValueError:
+            return None
+
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(condition).limit(1))
+    if user is None:
+        return None
+
+    principal = Principal.from_user(user)
+    await run_in_threadpool(cache_principal, subject, principal)
+    return principal
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Your session has expired. Please log in again.",
@@ -33,24 +73,14 @@ async def get_current_user(
         payload = jwt.decode(
             token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
         )
-        user_id: str = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
     try:
-        # If user_id is an email, try to find user by email
-        if '@' in user_id:
-            user = db.query(User).filter(User.email == user_id).first()
-        else:
-            # Try to convert to integer if it's not an email
-            try:
-                user_id_int = int(user_id)
-                user = db.query(User).filter(User.id == user_id_int).first()
-            except ValueError:
-                # If conversion fails, raise exception
-                raise credentials_exception
+        user = await _load_principal(str(user_id))
     except Exception as e:
         print(f"Error retrieving user: {str(e)}")
         raise credentials_exception
@@ -65,8 +95,8 @@ async def get_current_user(
     return user
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -75,8 +105,8 @@ async def get_current_active_user(
     return current_user
 
 async def get_current_active_superuser(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Get current active user and verify they have admin privileges.
     """
@@ -88,12 +118,13 @@ async def get_current_active_superuser(
     return current_user
 
 async def get_current_user_optional(
-    db: Session = Depends(get_db),
     token: Optional[str] = Depends(oauth2_scheme)
-) -> Optional[User]:
+) -> Optional[Principal]:
     """
     Similar to get_current_user but doesn't raise an exception if no token is provided.
     Returns None instead.
+    
+    Anonymous requests return before any cache or database access.
     """
     if not token:
         return None
@@ -102,24 +133,14 @@ async def get_current_user_optional(
         payload = jwt.decode(
             token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
         )
-        user_id: str = payload.get("sub")
+        user_id = payload.get("sub")
         if not user_id:
             return None
     except JWTError:
         return None
     
     try:
-        # If user_id is an email, try to find user by email
-        if '@' in user_id:
-            user = db.query(User).filter(User.email == user_id).first()
-        else:
-            # Try to convert to integer if it's not an email
-            try:
-                user_id_int = int(user_id)
-                user = db.query(User).filter(User.id == user_id_int).first()
-            except ValueError:
-                # If conversion fails, return None
-                return None
+        user = await _load_principal(str(user_id))
     except Exception as e:
         print(f"Error retrieving user: {str(e)}")
         return None
@@ -127,4 +148,4 @@ async def get_current_user_optional(
     if not user:
         return None
     
-    return user 
\ No newline at end of file
+    return user
@@ -7,6 +7,7 @@ from .endpoints.orders import router as orders_router
 from .endpoints.cart import router as cart_router
 from .endpoints.health import router as health_router
 from .endpoints.categories import router as categories_router
+from .endpoints.reviews import router as reviews_router
 from .endpoints.addresses import router as addresses_router
 
 api_router = APIRouter()
@@ -18,4 +19,5 @@ api_router.include_router(orders_router, prefix="/orders", tags=["orders"])
 api_router.include_router(cart_router, prefix="/cart", tags=["cart"])
 api_router.include_router(health_router, prefix="/health", tags=["health"])
 api_router.include_router(categories_router, prefix="/categories", tags=["categories"])
+api_router.include_router(reviews_router, prefix="/products", tags=["reviews"])
 api_router.include_router(addresses_router, prefix="/addresses", tags=["addresses"]) 
\ No newline at end of file
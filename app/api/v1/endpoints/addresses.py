@@ -2,15 +2,16 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
-from app.models.models import Address, User
+from app.models.models import Address
 from app.schemas.address import AddressCreate, AddressResponse, AddressUpdate
+from app.core.principal import Principal
 
 router = APIRouter()
 
 @router.get("/", response_model=List[AddressResponse])
 async def get_addresses(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Get all addresses for the current user.
@@ -22,7 +23,7 @@ async def get_addresses(
 async def create_address(
     address: AddressCreate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Create a new address for the current user.
@@ -54,7 +55,7 @@ async def create_address(
 async def get_address(
     address_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Get a specific address by ID.
@@ -74,7 +75,7 @@ async def update_address(
     address_id: int,
     address_data: AddressUpdate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Update an address.
@@ -111,7 +112,7 @@ async def update_address(
 async def delete_address(
     address_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Delete an address.
@@ -133,7 +134,7 @@ async def delete_address(
 async def set_default_address(
     address_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Set an address as the default.
@@ -1,34 +1,51 @@
 from datetime import timedelta, datetime
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Form
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Form, Header
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.async_database import get_async_db
 from app.models.models import User, UserType
 from app.schemas.auth import Token, LoginResponse
 from app.schemas.user import UserCreate, UserResponse
-from app.services import auth_service
+from app.services import auth_service, guest_cart
+import asyncio
 import secrets
-from app.core.email import send_verification_email
+import logging
+from app.core.email import enqueue_verification_email, enqueue_password_reset_email
 from app.crud import crud_user
-from app.core.security import verify_password, create_access_token, create_refresh_token
+from app.core.security import create_access_token, create_refresh_token
 from app.api import deps
+from app.core.principal import Principal
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def _merge_guest_cart(user_id: int, cart_token: Optional[str]) -> None:
+    """Move the caller's guest cart into their cart; a failure never blocks login."""
+    if not cart_token:
+        return
+    try:
+        await asyncio.to_thread(guest_cart.merge_into_user_cart, user_id, cart_token)
+    except Exception as e:
+        logger.warning(f"Error merging guest cart of user {user_id}: {str(e)}")
+
 @router.post("/register", response_model=UserResponse)
 async def register(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_in: UserCreate,
 ) -> Any:
     """
     Register a new user.
     """
     # Check if user exists
-    user = auth_service.get_user_by_email(db, email=user_in.email)
+    user = await auth_service.get_user_by_email_async(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
@@ -36,38 +53,38 @@ async def register(
         )
     
     # Create user first
-    user = auth_service.create_user(db, user_in=user_in)
+    user = await auth_service.create_user_async(db, user_in=user_in)
     
     # Then set verification token
     verification_token = secrets.token_urlsafe(32)
     token_expires = datetime.utcnow() + timedelta(hours=24)
     
-    # Update user with verification token
+    # Update user with verification token and queue the verification email
+    # in the same transaction
     user.verification_token = verification_token
     user.verification_token_expires = token_expires
-    db.commit()
-    db.refresh(user)
-    
-    # Send verification email
-    await send_verification_email(user.email, verification_token)
+    enqueue_verification_email(db, user.email, verification_token)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 @router.post("/login", response_model=LoginResponse)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    x_cart_token: Optional[str] = Header(None),
 ) -> Any:
     """
-    OAuth2 compatible token login, get an access token for future requests
+    OAuth2 compatible token login, get an access token for future requests.
+    A guest cart sent in the X-Cart-Token header is merged into the user's cart.
     """
-    # Use auth_service to get user by email instead of crud_user directly
-    user = auth_service.get_user_by_email(db, email=form_data.username)
+    user = await auth_service.authenticate_async(db, email=form_data.username, password=form_data.password)
     
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    
+    await _merge_guest_cart(user.id, x_cart_token)
     
     return {
         "token": create_access_token(user.id),
@@ -80,14 +97,14 @@ async def login(
     }
 
 @router.post("/logout")
-async def logout(current_user = Depends(deps.get_current_user)) -> Any:
+async def logout(current_user: Principal = Depends(deps.get_current_user)) -> Any:
     """
     Logout current user
     """
     return {"message": "Successfully logged out"}
 
 @router.get("/me", response_model=dict)
-async def read_users_me(current_user = Depends(deps.get_current_user)) -> Any:
+async def read_users_me(current_user: Principal = Depends(deps.get_current_user)) -> Any:
     """
     Get current user.
     """
@@ -100,7 +117,7 @@ async def read_users_me(current_user = Depends(deps.get_current_user)) -> Any:
 
 @router.post("/refresh-token")
 async def refresh_token(
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Refresh access token.
@@ -140,7 +157,7 @@ def verify_email(
 @router.post("/resend-verification")
 async def resend_verification(
     data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Resend verification email to user
@@ -150,7 +167,7 @@ async def resend_verification(
         raise HTTPException(status_code=400, detail="Email is required")
 
     try:
-        user = db.query(User).filter(User.email == email).first()
+        user = await auth_service.get_user_by_email_async(db, email=email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -161,17 +178,14 @@ async def resend_verification(
         verification_token = secrets.token_urlsafe(32)
         token_expires = datetime.utcnow() + timedelta(hours=24)
         
-        # Update user with new verification token
+        # Update user with new verification token and queue the email
         user.verification_token = verification_token
         user.verification_token_expires = token_expires
-        db.commit()
-        db.refresh(user)
+        enqueue_verification_email(db, user.email, verification_token)
+        await db.commit()
         
         print(f"Generated new verification token for {email}: {verification_token}")
         
-        # Send verification email
-        await send_verification_email(user.email, verification_token)
-        
         return {"message": "Verification email sent successfully"}
     except Exception as e:
         print(f"Error in resend verification: {str(e)}")
@@ -180,7 +194,7 @@ async def resend_verification(
 @router.post("/forgot-password")
 async def forgot_password(
     data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Send password reset email with reset token
@@ -190,7 +204,7 @@ async def forgot_password(
         raise HTTPException(status_code=400, detail="Email is required")
 
     try:
-        user = auth_service.get_user_by_email(db, email=email)
+        user = await auth_service.get_user_by_email_async(db, email=email)
         if not user:
             # Don't reveal that the user doesn't exist
             return {"message": "If the email exists, a password reset link will be sent"}
@@ -199,15 +213,11 @@ async def forgot_password(
         reset_token = secrets.token_urlsafe(32)
         token_expires = datetime.utcnow() + timedelta(hours=24)
         
-        # Update user with reset token
+        # Update user with reset token and queue the reset email
         user.reset_password_token = reset_token
         user.reset_password_token_expires = token_expires
-        db.commit()
-        db.refresh(user)
-        
-        # Send password reset email
-        from app.core.email import send_password_reset_email
-        await send_password_reset_email(user.email, reset_token)
+        enqueue_password_reset_email(db, user.email, reset_token)
+        await db.commit()
         
         return {"message": "If the email exists, a password reset link will be sent"}
     except Exception as e:
@@ -217,7 +227,7 @@ async def forgot_password(
 @router.post("/reset-password")
 async def reset_password(
     data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Reset password using token
@@ -230,19 +240,21 @@ async def reset_password(
     
     try:
         # Find user with valid reset token
-        user = db.query(User).filter(
-            User.reset_password_token == token,
-            User.reset_password_token_expires > datetime.utcnow()
-        ).first()
+        user = await db.scalar(
+            select(User).where(
+                User.reset_password_token == token,
+                User.reset_password_token_expires > datetime.utcnow()
+            ).limit(1)
+        )
         
         if not user:
             raise HTTPException(status_code=400, detail="Invalid or expired reset token")
         
         # Update password
-        user.hashed_password = security.get_password_hash(new_password)
+        user.hashed_password = await security.get_password_hash_async(new_password)
         user.reset_password_token = None  # Clear the token after use
         user.reset_password_token_expires = None
-        db.commit()
+        await db.commit()
         
         return {"message": "Password successfully reset"}
     except HTTPException:
@@ -255,18 +267,18 @@ async def reset_password(
 async def login_alt(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    x_cart_token: Optional[str] = Header(None),
 ) -> Any:
     """
     Alternative login endpoint for scripts
     """
-    # Use auth_service to get user by email instead of crud_user directly
-    user = auth_service.get_user_by_email(db, email=username)
+    user = await auth_service.authenticate_async(db, email=username, password=password)
     
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    if not verify_password(password, user.hashed_password):
-        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    
+    await _merge_guest_cart(user.id, x_cart_token)
     
     return {
         "access_token": create_access_token(user.id),
@@ -1,140 +1,139 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Callable, Dict, List, Optional, Set
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 
 from app import models, schemas, crud
 from app.api import deps
+from app.services import guest_cart
+from app.core.principal import Principal
 
 router = APIRouter()
 
+def _cart_item_read(db: Session, user_id: int, **match) -> schemas.CartItemRead:
+    """
+    The item of the user's cart whose attributes equal `match`, taken from
+    the cart read model (the only read after a mutation).
+    """
+    cart = crud.cart.get_cart_view(db, user_id=user_id)
+    for cart_item in (cart.items if cart else []):
+        if all(getattr(cart_item, key) == value for key, value in match.items()):
+            return schemas.CartItemRead.model_validate(cart_item)
+    raise HTTPException(status_code=404, detail="Cart item not found")
+
+def _check_products(db: Session, product_ids: Set[int]) -> None:
+    found = set(db.scalars(select(models.Product.id).where(models.Product.id.in_(product_ids))))
+    if found != product_ids:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+def _validate_items(db: Session, user_id: int, items: List[schemas.CartItemCreate]) -> None:
+    """
+    Check that the products exist and that customizations belong to the
+    user and match their product; one query for each.
+    """
+    _check_products(db, {item.product_id for item in items})
+
+    customization_ids = {item.product_customization_id for item in items if item.product_customization_id}
+    if not customization_ids:
+        return
+    customizations = {
+        customization.id: customization
+        for customization in db.query(models.ProductCustomization).filter(
+            models.ProductCustomization.id.in_(customization_ids)
+        )
+    }
+    for item in items:
+        if not item.product_customization_id:
+            continue
+        customization = customizations.get(item.product_customization_id)
+        if not customization or customization.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Customization not found or does not belong to user")
+        # Ensure customization matches product
+        if customization.product_id != item.product_id:
+            raise HTTPException(status_code=400, detail="Customization does not match the specified product")
+
 @router.get("/", response_model=schemas.CartRead)
 def get_cart(
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ):
     """
     Get the current user's cart, creating one if it doesn't exist.
-    Includes cart items with product and customization details.
+    Includes cart items with product and customization details, plus the
+    cart subtotal and total item count. Loaded with a single query.
     """
-    cart = crud.cart.get_cart_by_user_id(db, user_id=current_user.id)
+    cart = crud.cart.get_cart_view(db, user_id=current_user.id)
     if not cart:
         cart = crud.cart.create_cart(db, user_id=current_user.id)
-        
-    # Ensure items relationship is loaded with necessary details
-    # The crud function already handles joinedload, but we can be explicit if needed
-    db.refresh(cart) # Refresh to potentially load items if newly created
-
-    # Explicitly load product and customization details for each item
-    # This might be redundant if crud.get_cart_by_user_id handles it correctly
-    # but ensures the data is present for the response model.
-    cart_items = db.query(models.CartItem).options(
-        joinedload(models.CartItem.product).joinedload(models.Product.featured_image),
-        joinedload(models.CartItem.customization) 
-    ).filter(models.CartItem.cart_id == cart.id).all()
-    
-    # Manually construct the response if necessary to fit CartRead schema
-    cart_data = schemas.CartRead.from_orm(cart)
-    cart_data.items = [schemas.CartItemRead.from_orm(item) for item in cart_items]
 
-    return cart_data
+    return schemas.CartRead.model_validate(cart)
 
 @router.post("/items", response_model=schemas.CartItemRead)
 def add_item_to_cart(
     item: schemas.CartItemCreate,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ):
     """
     Add an item (potentially customized) to the user's cart.
     Requires product_id and optionally product_customization_id.
     """
-    cart = crud.cart.get_cart_by_user_id(db, user_id=current_user.id)
-    if not cart:
-        cart = crud.cart.create_cart(db, user_id=current_user.id)
-        
-    # Validate product exists (optional)
-    product = crud.product.get(db, id=item.product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-        
-    # Validate customization exists if ID is provided
-    if item.product_customization_id:
-        customization = crud.get_product_customization(db, item.product_customization_id)
-        if not customization or customization.user_id != current_user.id:
-             raise HTTPException(status_code=404, detail="Customization not found or does not belong to user")
-        # Ensure customization matches product
-        if customization.product_id != item.product_id:
-            raise HTTPException(status_code=400, detail="Customization does not match the specified product")
-            
-    db_item = crud.cart_item.add_item_to_cart(db=db, cart_id=cart.id, item=item)
+    _validate_items(db, current_user.id, [item])
+    cart_id = crud.cart.get_or_create_cart_id(db, user_id=current_user.id)
+    item_id = crud.cart_item.add_item_to_cart(db=db, cart_id=cart_id, item=item)
     
-    # Reload item with relationships for response model
-    db_item_loaded = db.query(models.CartItem).options(
-        joinedload(models.CartItem.product).joinedload(models.Product.featured_image),
-        joinedload(models.CartItem.customization)
-    ).filter(models.CartItem.id == db_item.id).first()
-        
-    return db_item_loaded
+    return _cart_item_read(db, current_user.id, id=item_id)
+
+@router.post("/items/batch", response_model=schemas.CartRead)
+def add_items_to_cart(
+    batch: schemas.CartItemBatchCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_user),
+):
+    """
+    Add many items to the user's cart at once (e.g. to reorder a past
+    order). All items are added with a single statement; repeated
+    products are merged. Returns the updated cart.
+    """
+    _validate_items(db, current_user.id, batch.items)
+    cart_id = crud.cart.get_or_create_cart_id(db, user_id=current_user.id)
+    crud.cart_item.add_items(db, cart_id=cart_id, items=batch.items)
+    db.commit()
+
+    return schemas.CartRead.model_validate(crud.cart.get_cart_view(db, user_id=current_user.id))
 
 @router.put("/items/{item_id}", response_model=schemas.CartItemRead)
 def update_cart_item_quantity(
     item_id: int,
     item_update: schemas.CartItemUpdate, # Schema likely only contains quantity now
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ):
     """
     Update a cart item's quantity.
     """
-    cart = crud.cart.get_cart_by_user_id(db, user_id=current_user.id)
-    if not cart:
-         raise HTTPException(status_code=404, detail="Cart not found")
-         
-    db_item = db.query(models.CartItem).filter(
-        models.CartItem.id == item_id,
-        models.CartItem.cart_id == cart.id # Ensure item belongs to user's cart
-    ).first()
-    
+    db_item = crud.cart_item.get_user_cart_item(db, user_id=current_user.id, cart_item_id=item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
     
     # Only update quantity from the schema
-    updated_item = crud.cart_item.update_cart_item(db, cart_item_id=item_id, item_update=item_update)
+    crud.cart_item.update_cart_item(db, db_item=db_item, item_update=item_update)
 
-    # Reload item with relationships for response model
-    db_item_loaded = db.query(models.CartItem).options(
-        joinedload(models.CartItem.product).joinedload(models.Product.featured_image),
-        joinedload(models.CartItem.customization)
-    ).filter(models.CartItem.id == updated_item.id).first()
-
-    return db_item_loaded
+    return _cart_item_read(db, current_user.id, id=item_id)
 
 @router.delete("/items/{item_id}", status_code=204) # Return 204 No Content
 def remove_item_from_cart(
     item_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ):
     """
     Remove an item from the cart.
     """
-    cart = crud.cart.get_cart_by_user_id(db, user_id=current_user.id)
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-    # Verify the item belongs to the user's cart before deleting
-    db_item = db.query(models.CartItem).filter(
-        models.CartItem.id == item_id,
-        models.CartItem.cart_id == cart.id
-    ).first()
-
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Cart item not found in user's cart")
-        
-    deleted = crud.cart_item.remove_cart_item(db, cart_item_id=item_id)
+    # The delete is scoped to the user's cart, so ownership is checked by the same statement
+    deleted = crud.cart_item.remove_cart_item(db, cart_item_id=item_id, user_id=current_user.id)
     if not deleted:
-         # This shouldn't happen if the check above passed, but included for safety
-        raise HTTPException(status_code=404, detail="Cart item not found for deletion")
+        raise HTTPException(status_code=404, detail="Cart item not found in user's cart")
         
     return None # Return None for 204 status
 
@@ -142,14 +141,163 @@ def remove_item_from_cart(
 @router.delete("/", status_code=204) # Return 204 No Content
 def clear_user_cart(
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ):
     """
     Clear all items from the user's cart.
     """
-    cart = crud.cart.get_cart_by_user_id(db, user_id=current_user.id)
-    if cart:
-        crud.cart_item.clear_cart(db, cart_id=cart.id)
     # No error if cart doesn't exist, just do nothing
+    crud.cart_item.clear_cart(db, user_id=current_user.id)
     
-    return None # Return None for 204 status 
\ No newline at end of file
+    return None # Return None for 204 status 
+
+# Guest carts: anonymous shoppers' carts live in the guest cart store
+# (Redis or in-process), identified by the X-Cart-Token header, and are
+# only written to the database when merged into a user's cart on login.
+
+def _guest_cart_read(db: Session, token: Optional[str], items: Dict[int, int]) -> schemas.GuestCartRead:
+    """The guest cart with its products, loaded in one query."""
+    if not items:
+        return schemas.GuestCartRead(token=token)
+    products = {
+        product.id: product
+        for product in db.query(models.Product).options(
+            joinedload(models.Product.featured_image),
+            joinedload(models.Product.images),
+            joinedload(models.Product.category),
+            joinedload(models.Product.artist),
+        ).filter(models.Product.id.in_(items)).all()
+    }
+    return schemas.GuestCartRead(
+        token=token,
+        items=[
+            # Products deleted since they were added are left out
+            schemas.GuestCartItemRead(
+                product_id=product_id,
+                quantity=quantity,
+                product=schemas.ProductResponse.model_validate(products[product_id]),
+            )
+            for product_id, quantity in sorted(items.items())
+            if product_id in products
+        ],
+    )
+
+def _guest_store_call(operation: Callable, *args: Any) -> Any:
+    try:
+        return operation(*args)
+    except guest_cart.GuestCartUnavailable:
+        raise HTTPException(status_code=503, detail="Cart service temporarily unavailable")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _guest_token(response: Response, token: Optional[str]) -> str:
+    """The request's cart token, or a new one (echoed in the X-Cart-Token response header)."""
+    if not guest_cart.is_valid_token(token):
+        token = guest_cart.new_token()
+    response.headers["X-Cart-Token"] = token
+    return token
+
+@router.get("/guest", response_model=schemas.GuestCartRead)
+def get_guest_cart(
+    db: Session = Depends(deps.get_db),
+    x_cart_token: Optional[str] = Header(None),
+):
+    """
+    Get an anonymous cart by its X-Cart-Token. Without a (known) token
+    the cart is empty; no token is issued until something is added.
+    """
+    if not guest_cart.is_valid_token(x_cart_token):
+        return schemas.GuestCartRead()
+    items = _guest_store_call(guest_cart.get_store().get_items, x_cart_token)
+    return _guest_cart_read(db, x_cart_token, items)
+
+@router.post("/guest/items", response_model=schemas.GuestCartRead)
+def add_item_to_guest_cart(
+    item: schemas.GuestCartItemCreate,
+    response: Response,
+    db: Session = Depends(deps.get_db),
+    x_cart_token: Optional[str] = Header(None),
+):
+    """
+    Add a product to an anonymous cart, starting a new cart (and token)
+    when the request has none. Returns the updated cart.
+    """
+    _check_products(db, {item.product_id})
+    token = _guest_token(response, x_cart_token)
+    items = _guest_store_call(guest_cart.get_store().add_items, token, {item.product_id: item.quantity})
+    return _guest_cart_read(db, token, items)
+
+@router.post("/guest/items/batch", response_model=schemas.GuestCartRead)
+def add_items_to_guest_cart(
+    batch: schemas.GuestCartItemBatchCreate,
+    response: Response,
+    db: Session = Depends(deps.get_db),
+    x_cart_token: Optional[str] = Header(None),
+):
+    """Add many products to an anonymous cart at once; repeated products are merged."""
+    quantities: Dict[int, int] = {}
+    for item in batch.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    _check_products(db, set(quantities))
+    token = _guest_token(response, x_cart_token)
+    items = _guest_store_call(guest_cart.get_store().add_items, token, quantities)
+    return _guest_cart_read(db, token, items)
+
+@router.put("/guest/items/{product_id}", response_model=schemas.GuestCartRead)
+def update_guest_cart_item_quantity(
+    product_id: int,
+    item_update: schemas.CartItemUpdate,
+    db: Session = Depends(deps.get_db),
+    x_cart_token: Optional[str] = Header(None),
+):
+    """Update the quantity of a product in an anonymous cart."""
+    if not guest_cart.is_valid_token(x_cart_token):
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    store = guest_cart.get_store()
+    if item_update.quantity is not None:
+        if not _guest_store_call(store.update_item, x_cart_token, product_id, item_update.quantity):
+            raise HTTPException(status_code=404, detail="Cart item not found")
+    items = _guest_store_call(store.get_items, x_cart_token)
+    if product_id not in items:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    return _guest_cart_read(db, x_cart_token, items)
+
+@router.delete("/guest/items/{product_id}", status_code=204)
+def remove_item_from_guest_cart(
+    product_id: int,
+    x_cart_token: Optional[str] = Header(None),
+):
+    """Remove a product from an anonymous cart."""
+    if not guest_cart.is_valid_token(x_cart_token) or not _guest_store_call(
+        guest_cart.get_store().remove_item, x_cart_token, product_id
+    ):
+        raise HTTPException(status_code=404, detail="Cart item not found in cart")
+    return None
+
+@router.delete("/guest", status_code=204)
+def clear_guest_cart(
+    x_cart_token: Optional[str] = Header(None),
+):
+    """Clear an anonymous cart."""
+    if guest_cart.is_valid_token(x_cart_token):
+        _guest_store_call(guest_cart.get_store().clear, x_cart_token)
+    return None
+
+@router.post("/merge", response_model=schemas.CartRead)
+def merge_guest_cart(
+    x_cart_token: str = Header(...),
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_user),
+):
+    """
+    Move the anonymous cart identified by X-Cart-Token into the user's
+    cart, in a single batched upsert; quantities of products already in
+    the cart are added up. Login does this automatically when the login
+    request carries the header.
+    """
+    _guest_store_call(guest_cart.merge_into_user_cart, current_user.id, x_cart_token)
+
+    cart = crud.cart.get_cart_view(db, user_id=current_user.id)
+    if not cart:
+        cart = crud.cart.create_cart(db, user_id=current_user.id)
+    return schemas.CartRead.model_validate(cart)
@@ -1,22 +1,40 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File, Body
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File, Body, Request
 from sqlalchemy.orm import Session
 from app.api import deps
-from app.models.models import Category, User, UserRole
+from app.models.models import Category, UserRole
 from app.schemas.category import (
     CategoryCreate,
     CategoryUpdate,
     CategoryResponse,
+    CategoryTreeNode,
 )
 from app.utils.slugify import slugify
 from app.core.storage import upload_file_to_s3, delete_file_from_s3
+from app.services import catalog_cache, category_tree, product_counts
+from app.utils.http_cache import conditional_json_response
+from app.core.config import settings
+from app.core import replicas
+from app.core.principal import Principal
+from starlette.concurrency import run_in_threadpool
 import uuid
 
 router = APIRouter()
 
+def _invalidate_catalog() -> None:
+    """
+    Drop derived catalog state after a category write. Listing totals
+    depend on the category subtree, and deleting a category removes its
+    products.
+    """
+    replicas.note_write()
+    product_counts.invalidate()
+    catalog_cache.invalidate_categories()
+
 @router.get("/", response_model=List[CategoryResponse])
-async def get_categories(
-    db: Session = Depends(deps.get_db),
+def get_categories(
+    request: Request,
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
     include_inactive: Optional[bool] = False,
@@ -25,7 +43,7 @@ async def get_categories(
     """
     Get all categories with optional filtering.
     """
-    try:
+    def load_categories():
         query = db.query(Category)
         
         # Filter by active status
@@ -38,17 +56,46 @@ async def get_categories(
         
         # Get paginated results
         categories = query.offset(skip).limit(limit).all()
-        return categories
+        return [CategoryResponse.model_validate(category).model_dump() for category in categories]
+
+    try:
+        cache_key = f"list:{skip}:{limit}:{int(bool(include_inactive))}:{parent_id}"
+        categories = catalog_cache.get_categories(cache_key, load_categories)
+        return conditional_json_response(
+            request, categories, cache_control=settings.CACHE_CONTROL_CATEGORY_LIST
+        )
     except Exception as e:
         # Log the exception
         print(f"Error fetching categories: {str(e)}")
         # Return empty list instead of raising an exception
         return []
 
+@router.get("/tree", response_model=List[CategoryTreeNode])
+def get_category_tree(
+    request: Request,
+    db: Session = Depends(deps.get_read_db),
+    include_inactive: Optional[bool] = False,
+):
+    """
+    Get the whole category hierarchy as nested nodes in one response,
+    e.g. to render navigation menus.
+    """
+    try:
+        tree = catalog_cache.get_categories(
+            f"tree:{int(bool(include_inactive))}",
+            lambda: category_tree.load_tree(db, include_inactive=bool(include_inactive)),
+        )
+        return conditional_json_response(
+            request, tree, cache_control=settings.CACHE_CONTROL_CATEGORY_LIST
+        )
+    except Exception as e:
+        print(f"Error fetching category tree: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: int = Path(..., title="The ID of the category to get"),
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(deps.get_read_db)
 ):
     """
     Get a specific category by ID.
@@ -70,12 +117,12 @@ async def create_category(
     category: CategoryCreate = None,
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Create a new category.
     """
-    if not current_user.is_admin:
+    if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     # Handle both direct JSON and nested "category" field
@@ -96,6 +143,11 @@ async def create_category(
     else:
         raise HTTPException(status_code=422, detail="Category data is required")
 
+    try:
+        category_tree.check_parent(db, None, category_obj.parent_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Handle image upload if provided
     image_url = None
     if image:
@@ -114,6 +166,7 @@ async def create_category(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    await run_in_threadpool(_invalidate_catalog)
     return db_category
 
 @router.put("/{category_id}", response_model=CategoryResponse)
@@ -121,13 +174,13 @@ async def update_category(
     category_id: int,
     category: CategoryUpdate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
     image: Optional[UploadFile] = File(None),
 ):
     """
     Update a category.
     """
-    if not current_user.is_admin:
+    if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     db_category = db.query(Category).filter(Category.id == category_id).first()
@@ -147,24 +200,32 @@ async def update_category(
         image_url = await upload_file_to_s3(image.file, filename, "categories")
         db_category.image_url = image_url
 
-    # Update other fields
-    for key, value in category.dict(exclude_unset=True).items():
+    update_data = category.dict(exclude_unset=True)
+    if "parent_id" in update_data:
+        try:
+            category_tree.check_parent(db, db_category, update_data["parent_id"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Update other fields; moving a category rewrites the paths of its branch
+    for key, value in update_data.items():
         setattr(db_category, key, value)
 
     db.commit()
     db.refresh(db_category)
+    await run_in_threadpool(_invalidate_catalog)
     return db_category
 
-@router.delete("/{category_id}", response_model=CategoryResponse)
+@router.delete("/{category_id}")
 async def delete_category(
     category_id: int = Path(..., title="The ID of the category to delete"),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Delete a category.
     """
-    if not current_user.is_admin:
+    if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     category = db.query(Category).filter(Category.id == category_id).first()
@@ -176,6 +237,9 @@ async def delete_category(
         filename = category.image_url.split("/")[-1]
         await delete_file_from_s3(filename, "categories")
 
+    # Subcategories move up a level instead of being left without a parent
+    category_tree.detach_children(db, category)
     db.delete(category)
     db.commit()
+    await run_in_threadpool(_invalidate_catalog)
     return {"message": "Category deleted successfully"} 
\ No newline at end of file
@@ -8,6 +8,7 @@ from app import schemas, crud, models
 from app.api import deps
 from local_s3 import upload_customization_image_data # Import the new upload function
 from app.core.config import settings
+from app.core.principal import Principal
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -73,7 +74,7 @@ async def generate_with_deepai(prompt: str) -> bytes:
 async def generate_ai_image(
     request: schemas.AIGenerationRequest,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user)
+    current_user: Principal = Depends(deps.get_current_active_user)
 ):
     """
     Generates an image based on a prompt using the selected AI model.
@@ -122,7 +123,7 @@ async def generate_ai_image(
 async def save_product_customization(
     request: schemas.CustomizationSaveRequest,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user)
+    current_user: Principal = Depends(deps.get_current_active_user)
 ):
     """
     Saves a product customization: uploads the rendered image and stores details in the DB.
@@ -1,16 +1,59 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.models.models import User
 from app.api import deps
+from app.services import catalog_cache
+from app.core.database import pool_stats
+from app.core import replicas
+from app.core.background import background_task_stats
+from app.services import view_counter
+from app.core.principal import Principal
+import time
 
 router = APIRouter()
 
 @router.get("/")
 async def health_check(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Health check endpoint.
     """
-    return {"status": "healthy", "user": current_user.email} 
\ No newline at end of file
+    return {"status": "healthy", "user": current_user.email} 
+
+@router.get("/cache")
+async def cache_stats(
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+):
+    """
+    Hit/miss/eviction counters for the in-process catalog caches (admin only).
+    """
+    return catalog_cache.stats()
+
+
+@router.get("/db")
+def database_stats(
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+):
+    """
+    Connection pool checkout wait times and saturation per engine (admin only).
+    """
+    started = time.perf_counter()
+    db.execute(text("SELECT 1"))
+    return {
+        "ping_ms": round((time.perf_counter() - started) * 1000, 3),
+        "pools": pool_stats(),
+        "replicas": replicas.router.status(),
+    }
+
+
+@router.get("/background")
+async def background_stats(
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+):
+    """
+    Run counts, timings and last errors of the periodic background jobs (admin only).
+    """
+    return {"tasks": background_task_stats(), "view_counter": view_counter.stats()}
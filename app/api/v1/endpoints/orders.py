@@ -1,39 +1,89 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.api import deps
-from app.models.models import Order, OrderItem, Product, User, Address
+from app.models.models import Order, OrderItem, OrderStatus, Product, UserRole, Address
 from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate
 from app.services.payment import create_payment_intent
 from app.services.email import send_order_confirmation
+from app.services import inventory
 from app.core.config import settings
+from app.utils.pagination import CURSOR_PAGINATION, OFFSET_PAGINATION, paginate_keyset_async
+from app.core.principal import Principal
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Moving an order into any of these makes its stock reservations final
+FULFILMENT_STATUSES = {OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED}
+
+# Customers can only cancel or delete their orders while they are in these
+CUSTOMER_CANCELLABLE_STATUSES = {OrderStatus.PENDING, OrderStatus.PROCESSING}
+
 @router.get("/", response_model=List[OrderResponse])
 async def get_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    pagination: str = Query(OFFSET_PAGINATION, pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Get all orders for the current user.
+    
+    With `pagination=cursor` orders are returned newest first using keyset
+    pagination on (created_at, id); the cursor for the next page is returned
+    in the `X-Next-Cursor` header. `include_total=true` adds `X-Total-Count`.
     """
-    orders = db.query(Order).filter(Order.user_id == current_user.id).offset(skip).limit(limit).all()
+    query = select(Order).where(Order.user_id == current_user.id)
+    
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        response.headers["X-Total-Count"] = str(total)
+    
+    # Items are part of the response and cannot be lazy-loaded on AsyncSession
+    query = query.options(selectinload(Order.items))
+    
+    if pagination == CURSOR_PAGINATION:
+        orders, next_cursor = await paginate_keyset_async(
+            db,
+            query,
+            Order.created_at,
+            Order.id,
+            sort_key="created_at",
+            sort_order="desc",
+            limit=limit,
+            cursor=cursor,
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return orders
+    
+    orders = (await db.scalars(query.offset(skip).limit(limit))).all()
     return orders
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Get a specific order.
     """
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
+    order = await db.scalar(
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -41,8 +91,8 @@ async def get_order(
 @router.post("/", response_model=OrderResponse)
 async def create_order(
     order: OrderCreate,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Create a new order.
@@ -57,36 +107,50 @@ async def create_order(
         # Create order without items
         order_data = order.dict(exclude={"items"})
         
-        # Log order data for debugging
-        print(f"Order data received: {order_data}")
-        print(f"Order items received: {order_items}")
-        
         # Ensure shipping_id is set
         if "shipping_id" not in order_data or order_data["shipping_id"] is None:
             # Default to shipping ID 1 if not provided
             order_data["shipping_id"] = 1
-            print(f"Setting default shipping_id to 1")
         
         # Validate all required fields are present
         required_fields = ["shipping_address_id", "billing_address_id", "total_amount"]
         for field in required_fields:
             if field not in order_data or order_data[field] is None:
-                print(f"Missing required field: {field}")
+                logger.warning(f"Order rejected, missing required field: {field}")
                 raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
         
-        # Validate shipping and billing addresses exist
-        shipping_address = db.query(Address).filter(Address.id == order_data["shipping_address_id"]).first()
-        if not shipping_address:
-            print(f"Shipping address with ID {order_data['shipping_address_id']} not found")
-            raise HTTPException(status_code=404, detail=f"Shipping address with ID {order_data['shipping_address_id']} not found")
+        if not order_items:
+            raise HTTPException(status_code=400, detail="Order must contain at least one item")
+        
+        # Lines for the same product share one stock check
+        quantities = {}
+        for item_data in order_items:
+            product_id = int(item_data.product_id)
+            quantities[product_id] = quantities.get(product_id, 0) + item_data.quantity
         
-        billing_address = db.query(Address).filter(Address.id == order_data["billing_address_id"]).first()
-        if not billing_address:
-            print(f"Billing address with ID {order_data['billing_address_id']} not found")
-            raise HTTPException(status_code=404, detail=f"Billing address with ID {order_data['billing_address_id']} not found")
+        # All products in one query. Rows are locked in id order so
+        # concurrent checkouts of overlapping baskets cannot deadlock on
+        # the stock update below.
+        prices = dict((await db.execute(
+            select(Product.id, Product.price)
+            .where(Product.id.in_(quantities))
+            .order_by(Product.id)
+            .with_for_update()
+        )).all())
+        missing = [product_id for product_id in quantities if product_id not in prices]
+        if missing:
+            logger.warning(f"Order rejected, products not found: {missing}")
+            raise HTTPException(status_code=404, detail=f"Product with id {missing[0]} not found")
+        
+        # Validate shipping and billing addresses exist, in one query
+        address_ids = {order_data["shipping_address_id"], order_data["billing_address_id"]}
+        found_addresses = set((await db.scalars(select(Address.id).where(Address.id.in_(address_ids)))).all())
+        for field, label in (("shipping_address_id", "Shipping"), ("billing_address_id", "Billing")):
+            if order_data[field] not in found_addresses:
+                logger.warning(f"Order rejected, {label.lower()} address with ID {order_data[field]} not found")
+                raise HTTPException(status_code=404, detail=f"{label} address with ID {order_data[field]} not found")
         
         # Create order with all data from the request
-        print(f"Creating order with data: {order_data}")
         current_time = datetime.now()
         db_order = Order(
             **order_data, 
@@ -96,103 +160,155 @@ async def create_order(
             created_at=current_time    # Ensure created_at is also set
         )
         db.add(db_order)
-        db.flush()  # Generate the order ID without committing
-        print(f"Created order with ID: {db_order.id}")
+        await db.flush()  # Generate the order ID without committing
         
-        # Create order items linked to the order
-        for item_data in order_items:
-            # Get product to get its price
-            product_id = int(item_data.product_id) if isinstance(item_data.product_id, str) else item_data.product_id
-            product = db.query(Product).filter(Product.id == product_id).first()
-            if not product:
-                print(f"Product with id {product_id} not found, rolling back transaction")
-                db.rollback()
-                raise HTTPException(status_code=404, detail=f"Product with id {product_id} not found")
-            
-            # Create the order item
-            print(f"Creating order item for product {product_id}")
-            order_item = OrderItem(
-                order_id=db_order.id,
-                product_id=product_id,
-                quantity=item_data.quantity,
-                unit_price=product.price,
-                customization=item_data.customizations,
-                updated_at=current_time  # Explicitly set updated_at for order item
+        # Hold the stock until the order is paid, cancelled or expires
+        try:
+            await inventory.reserve(db, db_order.id, quantities)
+        except inventory.InsufficientStockError as e:
+            logger.warning(f"Order rejected: {str(e)}")
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Insufficient stock", "product_ids": e.product_ids},
             )
-            db.add(order_item)
+        
+        # Insert all order items in a single multi-row INSERT
+        await db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": db_order.id,
+                    "product_id": int(item_data.product_id),
+                    "quantity": item_data.quantity,
+                    "unit_price": prices[int(item_data.product_id)],
+                    "created_at": current_time,
+                    "updated_at": current_time,
+                }
+                for item_data in order_items
+            ],
+        )
         
         # Commit all changes
-        print("Committing transaction...")
-        db.commit()
-        db.refresh(db_order)
-        print(f"Order {db_order.id} created successfully")
+        await db.commit()
+        await inventory.invalidate_cached_stock(db)
+        await db.refresh(db_order, attribute_names=["items"])
+        logger.info(f"Order {db_order.id} created for user {current_user.id}")
         return db_order
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        print(f"Error creating order: {str(e)}")
-        db.rollback()
+        logger.error(f"Error creating order: {str(e)}")
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 @router.put("/{order_id}", response_model=OrderResponse)
 async def update_order(
     order_id: int,
     order: OrderUpdate,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Update an order.
+    
+    Customers can only cancel their own pending or processing orders.
+    Payment and fulfilment status changes, which make the order's stock
+    reservations final, are admin-only.
     """
-    db_order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
+    is_admin = current_user.role == UserRole.ADMIN
+    changes = order.dict(exclude_unset=True)
+    if not is_admin and (
+        "payment_status" in changes or changes.get("status") not in (None, OrderStatus.CANCELLED)
+    ):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    query = select(Order).options(selectinload(Order.items)).where(Order.id == order_id)
+    if not is_admin:
+        query = query.where(Order.user_id == current_user.id)
+    db_order = await db.scalar(query.with_for_update())
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    for key, value in order.dict(exclude_unset=True).items():
+    if not is_admin and db_order.status not in CUSTOMER_CANCELLABLE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail="Order cannot be cancelled in its current status"
+        )
+    
+    for key, value in changes.items():
         setattr(db_order, key, value)
     
-    db.commit()
-    db.refresh(db_order)
+    # Keep reserved stock in step with the order's lifecycle. Only admins
+    # can undo a committed sale.
+    if changes.get("status") == OrderStatus.CANCELLED:
+        await inventory.release_for_order(db, db_order.id, include_committed=is_admin)
+    elif changes.get("payment_status") == "paid" or changes.get("status") in FULFILMENT_STATUSES:
+        await inventory.commit_for_order(db, db_order.id)
+    
+    await db.commit()
+    await inventory.invalidate_cached_stock(db)
+    # updated_at is set by the database and has to be read back explicitly
+    await db.refresh(db_order, attribute_names=["updated_at"])
     return db_order
 
 @router.delete("/{order_id}")
 async def delete_order(
     order_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
-    Delete an order.
+    Delete a pending or processing order.
     """
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
+    # Items are loaded so the delete-orphan cascade can remove them
+    order = await db.scalar(
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+        .with_for_update()
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    db.delete(order)
-    db.commit()
+    if order.status not in CUSTOMER_CANCELLABLE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail="Order cannot be deleted in its current status"
+        )
+    
+    await inventory.release_for_order(db, order.id, include_committed=False)
+    await db.delete(order)
+    await db.commit()
+    await inventory.invalidate_cached_stock(db)
     return {"message": "Order deleted successfully"}
 
 @router.post("/{order_id}/cancel")
-def cancel_order(
-    order_id: str,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+async def cancel_order(
+    order_id: int,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
-    Cancel an order.
+    Cancel an order and return its reserved stock.
     """
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await db.scalar(
+        select(Order)
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+        .with_for_update()
+    )
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if order.status not in ["pending", "processing"]:
+    if order.status not in CUSTOMER_CANCELLABLE_STATUSES:
         raise HTTPException(
             status_code=400,
             detail="Order cannot be cancelled in its current status"
         )
     
-    order.status = "cancelled"
-    db.commit()
+    order.status = OrderStatus.CANCELLED
+    await inventory.release_for_order(db, order.id, include_committed=False)
+    await db.commit()
+    await inventory.invalidate_cached_stock(db)
     return {"message": "Order cancelled successfully"} 
\ No newline at end of file
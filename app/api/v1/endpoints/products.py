@@ -1,19 +1,26 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.api import deps
-from app.models.models import Product, ProductStatus, ProductImage
+from app.models.models import Product, ProductStatus, ProductImage, ProductRelated, FrequentlyBoughtTogether
 from app.models.models import User, UserRole
 from app.schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse,
     ProductImageCreate, ProductImageResponse
 )
 from app.services.storage import upload_file
+from app.services import catalog_cache, category_tree, product_counts, ratings, view_counter, search as product_search
 from app.utils.slugify import slugify
+from app.utils.pagination import CURSOR_PAGINATION, OFFSET_PAGINATION, paginate_keyset_async
+from app.utils.http_cache import PRIVATE_CACHE_CONTROL, conditional_json_response
 from datetime import datetime
 import logging
 import os
 from app.core.config import settings
+from app.core import replicas
+from app.core.principal import Principal
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -21,12 +28,69 @@ logger.setLevel(logging.DEBUG)
 
 router = APIRouter()
 
+def _invalidate_catalog(product: Optional[Product] = None) -> None:
+    """Drop derived catalog state after a product write."""
+    replicas.note_write()
+    product_counts.invalidate()
+    product_search.invalidate()
+    if product is not None:
+        catalog_cache.invalidate_product(product.id, product.slug)
+
+def _serialize_product_summary(product: Product) -> dict:
+    """Listing representation of a product (images must be eager-loaded)."""
+    # Get the featured image URL if it exists
+    featured_image_url = None
+    if product.featured_image:
+        featured_image_url = product.featured_image.url
+    
+    # Get product images
+    images = []
+    for image in product.images:
+        images.append({
+            "id": image.id,
+            "url": image.url,
+            "alt_text": image.alt_text,
+            "position": image.position
+        })
+    
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "stock": product.stock,
+        "status": product.status,
+        "slug": product.slug,
+        "featured_image_url": featured_image_url,
+        "created_at": product.created_at.isoformat() if product.created_at else None,
+        "updated_at": product.updated_at.isoformat() if product.updated_at else None,
+        "published_at": product.published_at.isoformat() if product.published_at else None,
+        "category_id": product.category_id,
+        "views_count": product.views_count,
+        "sales_count": product.sales_count,
+        "rating": product.rating,
+        "reviews_count": product.reviews_count,
+        "is_featured": product.is_featured,
+        "is_customizable": product.is_customizable,
+        "images": images,
+        "low_stock_threshold": product.low_stock_threshold or 10
+    }
+
+# Columns that can drive cursor pagination. They must be non-nullable so the
+# (sort value, id) keyset comparison is well defined.
+KEYSET_SORT_COLUMNS = {
+    "id", "created_at", "name", "price", "rating",
+    "views_count", "sales_count", "reviews_count",
+}
+
 @router.get("/", response_model=dict)
 async def get_products(
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     skip: int = 0,
     limit: int = 20,
     category_id: Optional[int] = None,
+    include_subcategories: bool = False,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     status: Optional[ProductStatus] = None,
@@ -34,178 +98,285 @@ async def get_products(
     search: Optional[str] = None,
     sort_by: Optional[str] = "created_at",
     sort_order: Optional[str] = "desc",
-    current_user: Optional[User] = Depends(deps.get_current_user_optional),
+    pagination: str = Query(OFFSET_PAGINATION, pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
+    current_user: Optional[Principal] = Depends(deps.get_current_user_optional),
 ):
     """
     Get products with filtering and sorting.
     If user is admin, include draft products.
+    
+    With `include_subcategories=true`, `category_id` matches products in
+    that category and all categories below it.
+    
+    With `pagination=cursor` the page is fetched with keyset pagination on
+    (sort_by, id): pass the returned `next_cursor` back as `cursor` to get
+    the following page. The total count is skipped in cursor mode unless
+    `include_total=true` is given; `include_total=false` also skips it in
+    offset mode. Totals are served from a short-lived cache keyed by the
+    filter signature (see app.services.product_counts).
+    
+    Responses carry an ETag and honour If-None-Match with a 304; admin
+    responses (which include drafts) are marked private.
     """
     try:
-        query = db.query(Product)
+        query = select(Product)
+        is_admin = bool(current_user and current_user.role == UserRole.ADMIN)
+        count_signature = product_counts.filter_signature(
+            published_only=not is_admin,
+            category_id=category_id,
+            include_subcategories=(category_id and include_subcategories) or None,
+            min_price=min_price,
+            max_price=max_price,
+            status=status if is_admin else None,
+            is_featured=is_featured,
+            search=search,
+        )
         
         # Base filters
-        if not current_user or current_user.role != UserRole.ADMIN:
+        if not is_admin:
             query = query.filter(Product.status == ProductStatus.PUBLISHED)
         
         # Apply filters
-        if category_id:
+        if category_id and include_subcategories:
+            query = query.filter(Product.category_id.in_(category_tree.subtree_ids(category_id)))
+        elif category_id:
             query = query.filter(Product.category_id == category_id)
         if min_price is not None:
             query = query.filter(Product.price >= min_price)
         if max_price is not None:
             query = query.filter(Product.price <= max_price)
-        if status and current_user and current_user.role == UserRole.ADMIN:
+        if status and is_admin:
             query = query.filter(Product.status == status)
         if is_featured is not None:
             query = query.filter(Product.is_featured == is_featured)
         if search:
-            search = f"%{search}%"
-            query = query.filter(
-                (Product.name.ilike(search)) |
-                (Product.description.ilike(search)) |
-                (Product.meta_title.ilike(search)) |
-                (Product.meta_description.ilike(search))
-            )
-        
-        # Apply sorting
-        sort_column = getattr(Product, sort_by, Product.created_at)
-        if sort_order == "desc":
-            sort_column = sort_column.desc()
-        query = query.order_by(sort_column)
-        
-        # Get total count for pagination
-        total = query.count()
+            # The search helpers work on a sync Session; run_sync drives them
+            # over the async connection without blocking the event loop.
+            search_clause = await db.run_sync(lambda session: product_search.search_filter(session, search))
+            query = query.filter(search_clause)
+        
+        use_cursor = pagination == CURSOR_PAGINATION
+        if include_total is None:
+            include_total = not use_cursor
+        
+        count_query = query
+        
+        # Images and the featured image are loaded in batch (one extra SELECT
+        # for all images on the page) so the number of round trips stays
+        # constant regardless of `limit`.
+        query = query.options(
+            joinedload(Product.featured_image),
+            selectinload(Product.images),
+        )
         
-        # Apply pagination
-        db_products = query.offset(skip).limit(limit).all()
+        next_cursor = None
+        if use_cursor:
+            if sort_by not in KEYSET_SORT_COLUMNS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Cursor pagination supports sort_by in: {', '.join(sorted(KEYSET_SORT_COLUMNS))}"
+                )
+            db_products, next_cursor = await paginate_keyset_async(
+                db,
+                query,
+                getattr(Product, sort_by),
+                Product.id,
+                sort_key=sort_by,
+                sort_order=sort_order,
+                limit=limit,
+                cursor=cursor,
+            )
+        else:
+            # Apply sorting
+            sort_column = getattr(Product, sort_by, Product.created_at)
+            if sort_order == "desc":
+                sort_column = sort_column.desc()
+            query = query.order_by(sort_column)
+            
+            # Apply pagination
+            db_products = (await db.scalars(query.offset(skip).limit(limit))).all()
+        
+        # Get total count for pagination. The page is fetched first so a short
+        # page can answer the count without a separate COUNT query.
+        total = None
+        if include_total:
+            total = await product_counts.resolve_total_async(
+                db,
+                count_query,
+                count_signature,
+                page_size=None if cursor else len(db_products),
+                limit=limit,
+                skip=0 if use_cursor else skip,
+            )
         
         # Convert to simplified dict to avoid relationship issues
-        products = []
-        for product in db_products:
-            # Get the featured image URL if it exists
-            featured_image_url = None
-            if product.featured_image:
-                featured_image_url = product.featured_image.url
-            
-            # Get product images
-            images = []
-            for image in product.images:
-                images.append({
-                    "id": image.id,
-                    "url": image.url,
-                    "alt_text": image.alt_text,
-                    "position": image.position
-                })
-            
-            # Create a simplified product dict
-            products.append({
-                "id": product.id,
-                "name": product.name,
-                "description": product.description,
-                "price": product.price,
-                "stock": product.stock,
-                "status": product.status,
-                "slug": product.slug,
-                "featured_image_url": featured_image_url,
-                "created_at": product.created_at.isoformat() if product.created_at else None,
-                "updated_at": product.updated_at.isoformat() if product.updated_at else None,
-                "published_at": product.published_at.isoformat() if product.published_at else None,
-                "category_id": product.category_id,
-                "views_count": product.views_count,
-                "sales_count": product.sales_count,
-                "rating": product.rating,
-                "reviews_count": product.reviews_count,
-                "is_featured": product.is_featured,
-                "is_customizable": product.is_customizable,
-                "images": images,
-                "low_stock_threshold": product.low_stock_threshold or 10
-            })
+        products = [_serialize_product_summary(product) for product in db_products]
         
-        return {
+        response = {
             "items": products,
             "total": total,
             "skip": skip,
             "limit": limit
         }
+        if use_cursor:
+            response["next_cursor"] = next_cursor
+        # No Last-Modified here: a product leaving the result set does not
+        # move max(updated_at), so only the body hash is a safe validator.
+        return conditional_json_response(
+            request,
+            response,
+            cache_control=PRIVATE_CACHE_CONTROL if is_admin else settings.CACHE_CONTROL_PRODUCT_LIST,
+            vary="Authorization",
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting products: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/search", response_model=dict)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(deps.get_read_db),
+):
+    """
+    Ranked full-text search over published products.
+    
+    Matches name, meta title, description and meta description (weighted in
+    that order); every word in `q` must match and words are prefix-matched.
+    """
+    try:
+        results, total = product_search.search_products(
+            db,
+            q,
+            skip=skip,
+            limit=limit,
+            options=(joinedload(Product.featured_image), selectinload(Product.images)),
+        )
+        items = []
+        for product, rank in results:
+            item = _serialize_product_summary(product)
+            item["rank"] = rank
+            items.append(item)
+        
+        return {
+            "items": items,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "query": q
+        }
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def _load_product_detail(db: Session, product_id_or_slug: str) -> Optional[dict]:
+    """Load and serialize a product for the detail endpoint; None if not found."""
+    query = db.query(Product).options(
+        joinedload(Product.featured_image),
+        joinedload(Product.category),
+        joinedload(Product.rating_stats),
+        selectinload(Product.images),
+    )
+    
+    # First try to parse the input as an integer (id)
+    try:
+        product_id = int(product_id_or_slug)
+        product = query.filter(Product.id == product_id).first()
+    except ValueError:
+        # If not an integer, treat as slug
+        product = query.filter(Product.slug == product_id_or_slug).first()
+        
+    if not product:
+        return None
+
+    # Get the featured image URL if it exists
+    featured_image_url = None
+    if product.featured_image:
+        featured_image_url = product.featured_image.url
+    
+    # Get all product images
+    images = []
+    for image in product.images:
+        images.append({
+            "id": image.id,
+            "url": image.url,
+            "alt_text": image.alt_text,
+            "position": image.position
+        })
+        
+    # Get category info if available
+    category = None
+    if product.category:
+        category = {
+            "id": product.category.id,
+            "name": product.category.name,
+            "slug": product.category.slug
+        }
+    
+    # Create simplified product response
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "stock": product.stock,
+        "status": product.status,
+        "slug": product.slug,
+        "featured_image_url": featured_image_url,
+        "images": images,
+        "created_at": product.created_at.isoformat() if product.created_at else None,
+        "updated_at": product.updated_at.isoformat() if product.updated_at else None,
+        "published_at": product.published_at.isoformat() if product.published_at else None,
+        "category": category,
+        "specifications": product.specifications,
+        "colors": product.colors,
+        "dimensions": product.dimensions,
+        "weight": product.weight,
+        "materials": product.materials,
+        "customization_options": product.customization_options,
+        "meta_title": product.meta_title,
+        "meta_description": product.meta_description,
+        "views_count": product.views_count,
+        "sales_count": product.sales_count,
+        "rating": product.rating,
+        "reviews_count": product.reviews_count,
+        "rating_histogram": product.rating_stats.histogram if product.rating_stats else ratings.empty_histogram(),
+        "is_featured": product.is_featured,
+        "is_customizable": product.is_customizable,
+        "low_stock_threshold": product.low_stock_threshold
+    }
+
 @router.get("/{product_id_or_slug}")
 def get_product(
+    request: Request,
     product_id_or_slug: str,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
 ):
     """
     Get a specific product by ID or slug.
+    Supports conditional requests via ETag and Last-Modified.
     """
     try:
-        # First try to parse the input as an integer (id)
-        try:
-            product_id = int(product_id_or_slug)
-            product = db.query(Product).filter(Product.id == product_id).first()
-        except ValueError:
-            # If not an integer, treat as slug
-            product = db.query(Product).filter(Product.slug == product_id_or_slug).first()
-            
-        if not product:
+        product = catalog_cache.get_product(
+            product_id_or_slug,
+            lambda: _load_product_detail(db, product_id_or_slug),
+        )
+        if product is None:
             raise HTTPException(status_code=404, detail="Product not found")
-
-        # Get the featured image URL if it exists
-        featured_image_url = None
-        if product.featured_image:
-            featured_image_url = product.featured_image.url
-        
-        # Get all product images
-        images = []
-        for image in product.images:
-            images.append({
-                "id": image.id,
-                "url": image.url,
-                "alt_text": image.alt_text,
-                "position": image.position
-            })
-            
-        # Get category info if available
-        category = None
-        if product.category:
-            category = {
-                "id": product.category.id,
-                "name": product.category.name,
-                "slug": product.category.slug
-            }
-        
-        # Create simplified product response
-        return {
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "stock": product.stock,
-            "status": product.status,
-            "slug": product.slug,
-            "featured_image_url": featured_image_url,
-            "images": images,
-            "created_at": product.created_at.isoformat() if product.created_at else None,
-            "updated_at": product.updated_at.isoformat() if product.updated_at else None,
-            "published_at": product.published_at.isoformat() if product.published_at else None,
-            "category": category,
-            "specifications": product.specifications,
-            "colors": product.colors,
-            "dimensions": product.dimensions,
-            "weight": product.weight,
-            "materials": product.materials,
-            "customization_options": product.customization_options,
-            "meta_title": product.meta_title,
-            "meta_description": product.meta_description,
-            "views_count": product.views_count,
-            "sales_count": product.sales_count,
-            "rating": product.rating,
-            "reviews_count": product.reviews_count,
-            "is_featured": product.is_featured,
-            "is_customizable": product.is_customizable,
-            "low_stock_threshold": product.low_stock_threshold
-        }
+        # Buffered in memory and written in batches by the view counter flush task
+        view_counter.record_view(product["id"])
+        last_modified = product["updated_at"] or product["created_at"]
+        return conditional_json_response(
+            request,
+            product,
+            cache_control=settings.CACHE_CONTROL_PRODUCT_DETAIL,
+            last_modified=datetime.fromisoformat(last_modified) if last_modified else None,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -217,7 +388,7 @@ async def create_product(
     request: Request,
     product: ProductCreate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Create a new product (admin/manager only).
@@ -273,6 +444,7 @@ async def create_product(
         db.add(db_product)
         db.commit()
         db.refresh(db_product)
+        _invalidate_catalog()
         
         logger.info(f"Product created successfully: ID={db_product.id}, Name={db_product.name}")
         return db_product
@@ -301,7 +473,7 @@ async def upload_product_image(
     is_featured: bool = False,
     alt_text: Optional[str] = None,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Upload a product image (admin only).
@@ -351,6 +523,7 @@ async def upload_product_image(
         
         db.commit()
         db.refresh(image)
+        _invalidate_catalog(product)
         
         logger.info(f"Image uploaded successfully for product {product_id}: image_id={image.id}, url={file_url}")
         return image
@@ -364,7 +537,7 @@ async def update_product(
     product_id: int,
     product: ProductUpdate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Update a product (admin/manager only).
@@ -408,13 +581,14 @@ async def update_product(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     
+    _invalidate_catalog(db_product)
     return db_product
 
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Delete a product (admin only).
@@ -428,6 +602,7 @@ async def delete_product(
     
     db.delete(db_product)
     db.commit()
+    _invalidate_catalog(db_product)
     
     return {"message": "Product deleted successfully"}
 
@@ -435,7 +610,7 @@ async def delete_product(
 async def publish_product(
     product_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Publish a product (admin/manager only).
@@ -451,6 +626,7 @@ async def publish_product(
     db_product.published_at = datetime.utcnow()
     
     db.commit()
+    _invalidate_catalog(db_product)
     
     return {"message": "Product published successfully"}
 
@@ -458,7 +634,7 @@ async def publish_product(
 async def archive_product(
     product_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Archive a product (admin/manager only).
@@ -473,91 +649,182 @@ async def archive_product(
     db_product.status = ProductStatus.ARCHIVED
     
     db.commit()
+    _invalidate_catalog(db_product)
     
     return {"message": "Product archived successfully"}
 
+def _serialize_related(prod: Product) -> dict:
+    """Simplified product dict to avoid relationship issues"""
+    # Get the featured image URL if it exists
+    featured_image_url = None
+    if prod.featured_image:
+        featured_image_url = prod.featured_image.url
+
+    return {
+        "id": prod.id,
+        "name": prod.name,
+        "description": prod.description,
+        "price": prod.price,
+        "stock": prod.stock,
+        "status": prod.status,
+        "slug": prod.slug,
+        "featured_image_url": featured_image_url,
+        "category_id": prod.category_id,
+        "rating": prod.rating,
+        "reviews_count": prod.reviews_count,
+        "is_featured": prod.is_featured,
+    }
+
+def _load_precomputed_related(db: Session, product_id_or_slug: str, limit: int) -> List[Product]:
+    """
+    Related products ranked by the background job, in one indexed lookup on
+    product_related (the slug is resolved in a subquery).
+    """
+    try:
+        source_id = int(product_id_or_slug)
+    except ValueError:
+        source_id = select(Product.id).where(Product.slug == product_id_or_slug).scalar_subquery()
+
+    return db.query(Product).join(
+        ProductRelated, ProductRelated.related_product_id == Product.id
+    ).filter(
+        ProductRelated.product_id == source_id,
+        Product.status == ProductStatus.PUBLISHED
+    ).order_by(
+        ProductRelated.rank
+    ).options(
+        joinedload(Product.featured_image)
+    ).limit(limit).all()
+
+def _load_related_products(db: Session, product_id_or_slug: str, limit: int) -> Optional[List[dict]]:
+    """Pick and serialize related products; None if the product does not exist."""
+    # Served from the precomputed ranking when it has enough products;
+    # new products (not ranked yet) and large limits fall through to the
+    # live query below
+    precomputed = _load_precomputed_related(db, product_id_or_slug, limit)
+    if len(precomputed) >= limit:
+        return [_serialize_related(prod) for prod in precomputed]
+
+    # First try to parse the input as an integer (id)
+    try:
+        product_id = int(product_id_or_slug)
+        product = db.query(Product).filter(Product.id == product_id).first()
+    except ValueError:
+        # If not an integer, treat as slug
+        product = db.query(Product).filter(Product.slug == product_id_or_slug).first()
+        
+    if not product:
+        return None
+
+    # Get products from the same category, excluding the current product
+    query = db.query(Product).filter(
+        Product.category_id == product.category_id,
+        Product.id != product.id,
+        Product.status == ProductStatus.PUBLISHED
+    )
+    
+    # Order by views or sales for better recommendations
+    query = query.order_by(Product.views_count.desc(), Product.sales_count.desc())
+    
+    # Apply limit (featured images are joined in to avoid a lazy load per row)
+    related_products = query.options(joinedload(Product.featured_image)).limit(limit).all()
+    
+    # If we don't have enough related products, get products from any category
+    if len(related_products) < limit:
+        additional_limit = limit - len(related_products)
+        additional_products = db.query(Product).filter(
+            Product.id != product.id,
+            Product.id.notin_([p.id for p in related_products]),
+            Product.status == ProductStatus.PUBLISHED
+        ).order_by(
+            Product.is_featured.desc(),
+            Product.views_count.desc()
+        ).options(
+            joinedload(Product.featured_image)
+        ).limit(additional_limit).all()
+        
+        related_products.extend(additional_products)
+    
+    return [_serialize_related(prod) for prod in related_products]
+
 @router.get("/{product_id_or_slug}/related", response_model=List[dict])
 def get_related_products(
     product_id_or_slug: str,
     limit: int = 4,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
 ):
     """
     Get products related to a specific product.
     """
     try:
-        # First try to parse the input as an integer (id)
-        try:
-            product_id = int(product_id_or_slug)
-            product = db.query(Product).filter(Product.id == product_id).first()
-        except ValueError:
-            # If not an integer, treat as slug
-            product = db.query(Product).filter(Product.slug == product_id_or_slug).first()
-            
-        if not product:
+        related = catalog_cache.get_related(
+            product_id_or_slug,
+            limit,
+            lambda: _load_related_products(db, product_id_or_slug, limit),
+        )
+        if related is None:
             raise HTTPException(status_code=404, detail="Product not found")
+        return related
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting related products: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-        # Get products from the same category, excluding the current product
-        query = db.query(Product).filter(
-            Product.category_id == product.category_id,
-            Product.id != product.id,
-            Product.status == ProductStatus.PUBLISHED
+def _load_bought_together(db: Session, product_id_or_slug: str, limit: int) -> Optional[List[dict]]:
+    """Frequently bought together products, best first; None if the product does not exist."""
+    try:
+        source_id = int(product_id_or_slug)
+    except ValueError:
+        source_id = select(Product.id).where(Product.slug == product_id_or_slug).scalar_subquery()
+
+    products = db.query(Product).join(
+        FrequentlyBoughtTogether, FrequentlyBoughtTogether.related_product_id == Product.id
+    ).filter(
+        FrequentlyBoughtTogether.product_id == source_id,
+        Product.status == ProductStatus.PUBLISHED
+    ).order_by(
+        FrequentlyBoughtTogether.rank
+    ).options(
+        joinedload(Product.featured_image)
+    ).limit(limit).all()
+
+    if not products and db.query(Product.id).filter(Product.id == source_id).first() is None:
+        return None
+    return [_serialize_related(prod) for prod in products]
+
+@router.get("/{product_id_or_slug}/frequently-bought-together", response_model=List[dict])
+def get_frequently_bought_together(
+    product_id_or_slug: str,
+    limit: int = Query(4, ge=1, le=50),
+    db: Session = Depends(deps.get_read_db),
+):
+    """
+    Get products often ordered together with a specific product.
+
+    Ranked from order history by the co-purchase background job; empty
+    until the product has been bought together with others often enough.
+    """
+    try:
+        products = catalog_cache.get_bought_together(
+            product_id_or_slug,
+            limit,
+            lambda: _load_bought_together(db, product_id_or_slug, limit),
         )
-        
-        # Order by views or sales for better recommendations
-        query = query.order_by(Product.views_count.desc(), Product.sales_count.desc())
-        
-        # Apply limit
-        related_products = query.limit(limit).all()
-        
-        # If we don't have enough related products, get products from any category
-        if len(related_products) < limit:
-            additional_limit = limit - len(related_products)
-            additional_products = db.query(Product).filter(
-                Product.id != product.id,
-                Product.id.notin_([p.id for p in related_products]),
-                Product.status == ProductStatus.PUBLISHED
-            ).order_by(
-                Product.is_featured.desc(),
-                Product.views_count.desc()
-            ).limit(additional_limit).all()
-            
-            related_products.extend(additional_products)
-        
-        # Convert to simplified dict to avoid relationship issues
-        result = []
-        for prod in related_products:
-            # Get the featured image URL if it exists
-            featured_image_url = None
-            if prod.featured_image:
-                featured_image_url = prod.featured_image.url
-            
-            # Create a simplified product dict
-            result.append({
-                "id": prod.id,
-                "name": prod.name,
-                "description": prod.description,
-                "price": prod.price,
-                "stock": prod.stock,
-                "status": prod.status,
-                "slug": prod.slug,
-                "featured_image_url": featured_image_url,
-                "category_id": prod.category_id,
-                "rating": prod.rating,
-                "reviews_count": prod.reviews_count,
-                "is_featured": prod.is_featured,
-            })
-        
-        return result
+        if products is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return products
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting related products: {str(e)}", exc_info=True)
+        logger.error(f"Error getting frequently bought together products: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/create-simple", response_model=dict)
 async def create_simple_product(
     product_data: dict,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Create a new product with simplified data (admin only).
@@ -614,6 +881,7 @@ async def create_simple_product(
         db.add(db_product)
         db.commit()
         db.refresh(db_product)
+        _invalidate_catalog()
         
         logger.info(f"Simple product created successfully: ID={db_product.id}, Name={db_product.name}")
         
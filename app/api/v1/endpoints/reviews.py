@@ -1,20 +1,28 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.models.models import User, Review, Product
+from app.core import replicas
+from app.models.models import Review, Product
 from app.schemas.review import ReviewCreate, ReviewResponse
+from app.services import catalog_cache, ratings
+from app.utils.pagination import CURSOR_PAGINATION, OFFSET_PAGINATION, paginate_keyset
+from app.core.principal import Principal
 
 router = APIRouter()
 
 @router.get("/{product_slug}/reviews", response_model=List[ReviewResponse])
 async def get_product_reviews(
+    response: Response,
     product_slug: str = Path(..., description="The product slug to get reviews for"),
     skip: int = Query(0, description="Number of reviews to skip"),
     limit: int = Query(20, description="Number of reviews to return"),
-    db: Session = Depends(deps.get_db),
-    current_user: Optional[User] = Depends(deps.get_current_user_optional),
+    pagination: str = Query(OFFSET_PAGINATION, pattern="^(offset|cursor)$", description="offset or cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    include_total: bool = Query(False, description="Return the total number of reviews in X-Total-Count"),
+    db: Session = Depends(deps.get_read_db),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_optional),
 ):
     """
     Get reviews for a specific product by slug
@@ -25,7 +33,26 @@ async def get_product_reviews(
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Then get the reviews
-    reviews = db.query(Review).filter(Review.product_id == product.id).order_by(Review.created_at.desc()).offset(skip).limit(limit).all()
+    query = db.query(Review).filter(Review.product_id == product.id)
+    
+    if include_total:
+        response.headers["X-Total-Count"] = str(query.count())
+    
+    if pagination == CURSOR_PAGINATION:
+        reviews, next_cursor = paginate_keyset(
+            query,
+            Review.created_at,
+            Review.id,
+            sort_key="created_at",
+            sort_order="desc",
+            limit=limit,
+            cursor=cursor,
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return reviews
+    
+    reviews = query.order_by(Review.created_at.desc()).offset(skip).limit(limit).all()
     
     return reviews
 
@@ -34,7 +61,7 @@ async def create_product_review(
     review_in: ReviewCreate,
     product_slug: str = Path(..., description="The product slug to create a review for"),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Create a new review for a product
@@ -64,16 +91,12 @@ async def create_product_review(
     
     db.add(db_review)
     
-    # Update product rating and reviews count
-    product_reviews = db.query(Review).filter(Review.product_id == product.id).all()
-    total_rating = sum(review.rating for review in product_reviews) + review_in.rating
-    total_reviews = len(product_reviews) + 1
-    
-    product.rating = round(total_rating / total_reviews, 1)
-    product.reviews_count = total_reviews
+    # Update the running rating totals, product rating and reviews count
+    ratings.record_rating(db, product.id, review_in.rating)
     
-    db.add(product)
     db.commit()
+    replicas.note_write()
+    catalog_cache.invalidate_product(product.id, product.slug)
     db.refresh(db_review)
     
     return db_review 
\ No newline at end of file
@@ -5,7 +5,7 @@ from app.core.deps import get_current_active_user, get_current_active_superuser,
 from app.crud import crud_shipping
 from app.schemas.shipping import Shipping, ShippingCreate, ShippingUpdate
 from app.schemas.user import UserResponse
-from app.models.models import User
+from app.core.principal import Principal
 
 router = APIRouter()
 
@@ -14,7 +14,7 @@ def read_shipping(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_superuser),
+    current_user: Principal = Depends(get_current_active_superuser),
 ) -> Any:
     """
     Retrieve shipping records.
@@ -27,7 +27,7 @@ def create_shipping(
     *,
     db: Session = Depends(get_db),
     shipping_in: ShippingCreate,
-    current_user: User = Depends(get_current_active_superuser),
+    current_user: Principal = Depends(get_current_active_superuser),
 ) -> Any:
     """
     Create new shipping record.
@@ -39,7 +39,7 @@ def create_shipping(
 def read_shipping(
     shipping_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
     """
     Get shipping record by ID.
@@ -58,7 +58,7 @@ def update_shipping(
     db: Session = Depends(get_db),
     shipping_id: int,
     shipping_in: ShippingUpdate,
-    current_user: User = Depends(get_current_active_superuser),
+    current_user: Principal = Depends(get_current_active_superuser),
 ) -> Any:
     """
     Update shipping record.
@@ -77,7 +77,7 @@ def delete_shipping(
     *,
     db: Session = Depends(get_db),
     shipping_id: int,
-    current_user: User = Depends(get_current_active_superuser),
+    current_user: Principal = Depends(get_current_active_superuser),
 ) -> Any:
     """
     Delete shipping record.
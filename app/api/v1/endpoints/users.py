@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api import deps
 from app.core.config import settings
+from app.core.principal import Principal, invalidate_principal
 
 router = APIRouter()
 
@@ -13,7 +14,7 @@ def read_users(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve users.
@@ -41,30 +42,38 @@ def create_user(
 
 @router.get("/me", response_model=schemas.UserResponse)
 def read_user_me(
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Get current user.
     """
-    return current_user
+    user = crud.user.get(db, id=current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.put("/me", response_model=schemas.UserResponse)
 def update_user_me(
     *,
     db: Session = Depends(deps.get_db),
     user_update: schemas.UserUpdate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Update own user.
     """
-    user = crud.user.update(db, db_obj=current_user, obj_in=user_update)
+    user = crud.user.get(db, id=current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user = crud.user.update(db, db_obj=user, obj_in=user_update)
+    invalidate_principal(user.id, current_user.email, user.email)
     return user
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
 def read_user_by_id(
     user_id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
@@ -76,7 +85,7 @@ def read_user_by_id(
             status_code=404,
             detail="User not found",
         )
-    if user.id != current_user.id and not current_user.is_superuser:
+    if user.id != current_user.id and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
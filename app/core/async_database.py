@@ -0,0 +1,56 @@
+from typing import AsyncGenerator, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from app.core.config import settings
+from app.core.database import engine_options, register_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Async driver used for each sync driver found in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Derive the async driver URL from a sync DATABASE_URL.
+
+    postgresql[+psycopg2]:// becomes postgresql+asyncpg:// and sqlite://
+    becomes sqlite+aiosqlite://; URLs already naming an async driver are
+    returned unchanged.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS or parsed.drivername in ASYNC_DRIVERS.values():
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: Optional[str] = None, name: str = "primary_async") -> AsyncEngine:
+    """Create an async engine with the same pool settings as the sync engines."""
+    url = to_async_url(url or settings.DATABASE_URL)
+    engine = create_async_engine(url, **engine_options(url, name, is_async=True))
+    register_pool(name, engine.sync_engine.pool)
+    return engine
+
+
+# Create async database engine
+async_engine = create_async_db_engine()
+
+# Objects stay usable after commit: handlers serialize them once the
+# transaction is done, and lazy refreshes are not possible on AsyncSession.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
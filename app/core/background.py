@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+TaskFunc = Callable[[], Union[Awaitable[Any], Any]]
+
+
+class PeriodicTask:
+    """
+    Runs a job every `interval_seconds` on the application's event loop.
+
+    Coroutine functions are awaited; plain functions run in a worker thread
+    so blocking database work does not stall requests. A failing run is
+    logged and the task carries on at the next interval.
+    """
+
+    def __init__(self, name: str, interval_seconds: float, func: TaskFunc, initial_delay_seconds: float = 0.0):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.initial_delay_seconds = initial_delay_seconds
+        self.runs = 0
+        self.failures = 0
+        self.last_started_at: Optional[datetime] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run_once(self) -> Any:
+        self.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(self.func):
+                result = await self.func()
+            else:
+                result = await asyncio.to_thread(self.func)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.exception(f"Background task {self.name} failed")
+            return None
+        finally:
+            self.runs += 1
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.last_result = result
+        self.last_error = None
+        return result
+
+    async def _loop(self) -> None:
+        if await self._wait(self.initial_delay_seconds):
+            return
+        while True:
+            await self.run_once()
+            if await self._wait(self.interval_seconds):
+                return
+
+    async def _wait(self, seconds: float) -> bool:
+        """Sleep for `seconds`; returns True if the task was asked to stop."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name=f"periodic:{self.name}")
+        logger.info(f"Started background task {self.name} (every {self.interval_seconds}s)")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let the current run finish (up to `timeout`), then stop."""
+        if not self.running:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.warning(f"Background task {self.name} did not stop in {timeout}s; cancelled")
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "running": self.running,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result if isinstance(self.last_result, (int, float, str, dict, type(None))) else repr(self.last_result),
+            "last_error": self.last_error,
+        }
+
+
+_tasks: Dict[str, PeriodicTask] = {}
+
+
+def register_periodic_task(
+    name: str, interval_seconds: float, func: TaskFunc, initial_delay_seconds: float = 0.0
+) -> PeriodicTask:
+    """Register a job to be started with the application; re-registering a name replaces it."""
+    task = PeriodicTask(name, interval_seconds, func, initial_delay_seconds)
+    _tasks[name] = task
+    return task
+
+
+def get_periodic_tasks() -> List[PeriodicTask]:
+    return list(_tasks.values())
+
+
+async def start_background_tasks() -> None:
+    for task in _tasks.values():
+        task.start()
+
+
+async def stop_background_tasks() -> None:
+    await asyncio.gather(*(task.stop() for task in _tasks.values()))
+
+
+def background_task_stats() -> List[Dict[str, Any]]:
+    return [task.stats() for task in _tasks.values()]
@@ -0,0 +1,374 @@
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+from app.core.config import settings
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by LRUTTLCache.get on a miss, so cached None values are
+# distinguishable from absent keys.
+MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Bounded, thread-safe in-process cache with per-entry expiry.
+
+    Entries are evicted least-recently-used first once `max_entries` is
+    reached, and expire `ttl_seconds` after being set. Hit, miss and
+    eviction counters are kept so the cache can be sized from real traffic.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, name: str = "cache"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def _json_default(value: Any) -> Any:
+    """json.dumps hook for the non-JSON types found in response dicts."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+def loads(payload: Union[str, bytes]) -> Any:
+    return json.loads(payload)
+
+
+class CacheBackend:
+    """
+    Minimal key/value interface the shared caches are written against.
+
+    Values are opaque strings (JSON produced by `dumps`), so in-memory and
+    Redis backends return identical data to callers.
+    """
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        """Set `key` only if it does not exist; returns whether it was set."""
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process backend built on LRUTTLCache."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = LRUTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds, name="shared")
+        # Counters live outside the LRU: evicting a namespace version would
+        # resurrect entries written under an older one.
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        if key in self._counters:
+            return str(self._counters[key])
+        value = self._cache.get(key)
+        return None if value is MISSING else value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl_seconds)
+
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        with self._lock:
+            if self._cache.get(key) is not MISSING:
+                return False
+            self._cache.set(key, value, ttl_seconds)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self._cache.stats()}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend shared by every worker through Redis.
+
+    Accepts an existing client so tests can pass an in-process fake; a
+    Redis outage degrades to cache misses instead of failing requests.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any = None, url: Optional[str] = None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.client = client
+        self.errors = 0
+
+    def _call(self, operation: str, default: Any, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return getattr(self.client, operation)(*args, **kwargs)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache {operation} failed: {str(e)}")
+            return default
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._call("get", None, key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        if ttl_seconds:
+            self._call("set", None, key, value, px=int(ttl_seconds * 1000))
+        else:
+            self._call("set", None, key, value)
+
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        return bool(self._call("set", False, key, value, nx=True, px=int(ttl_seconds * 1000)))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._call("delete", None, *keys)
+
+    def incr(self, key: str) -> int:
+        return int(self._call("incr", 0, key) or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "errors": self.errors}
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_cache_backend(kind: Optional[str] = None, client: Any = None) -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND ("memory" or "redis")."""
+    kind = (kind or settings.CACHE_BACKEND).lower()
+    if kind == "redis":
+        return RedisCacheBackend(client=client)
+    if kind != "memory":
+        logger.warning(f"Unknown CACHE_BACKEND {kind!r}; using in-memory cache")
+    return MemoryCacheBackend(
+        max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS,
+    )
+
+
+def get_cache_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+    return _backend
+
+
+def set_cache_backend(backend: Optional[CacheBackend]) -> None:
+    """Swap the process-wide backend (e.g. a fake Redis in tests); None resets it."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# Locks shared by the keys of a VersionedCache namespace for in-process
+# stampede protection
+LOCAL_LOCK_STRIPES = 64
+
+
+class VersionedCache:
+    """
+    A namespace of JSON-serialized entries on the shared cache backend.
+
+    Keys embed a namespace version stored in the backend, so
+    invalidate_all() is a single INCR that orphans every entry of the
+    namespace on every worker; orphaned entries simply age out by TTL.
+
+    get_or_set() protects against stampedes: concurrent misses for the same
+    key in one process share one load, and across processes only the
+    holder of a short-lived backend lock loads while others wait for its
+    result (falling back to loading themselves after CACHE_LOCK_WAIT_SECONDS).
+    get_or_set() may block while waiting, so call it from sync code or a
+    worker thread, never directly on the event loop.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float, backend: Optional[CacheBackend] = None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend
+        # A fixed set of striped locks rather than one per key, so arbitrary
+        # keys (e.g. slugs from URLs) cannot grow memory. Reentrant in case
+        # a loader fills another key that hashes to the same stripe.
+        self._local_locks = [threading.RLock() for _ in range(LOCAL_LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def _version_key(self) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.namespace}:version"
+
+    def _key(self, key: str) -> str:
+        version = self.backend.get(self._version_key()) or "0"
+        return f"{settings.CACHE_KEY_PREFIX}:{self.namespace}:v{version}:{key}"
+
+    def get(self, key: str) -> Any:
+        payload = self.backend.get(self._key(key))
+        if payload is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return loads(payload)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.backend.set(self._key(key), dumps(value), ttl)
+
+    def delete(self, *keys: str) -> None:
+        self.backend.delete(*[self._key(key) for key in keys])
+
+    def invalidate_all(self) -> None:
+        self.backend.incr(self._version_key())
+
+    def _local_lock(self, key: str) -> threading.RLock:
+        return self._local_locks[hash(key) % LOCAL_LOCK_STRIPES]
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl_seconds: Optional[float] = None) -> Any:
+        """
+        Return the cached value for `key`, calling `loader` once on a miss.
+
+        A loader result of None is returned but not cached.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._local_lock(key):
+            # Another thread may have filled the entry while we waited
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+
+            lock_key = f"{self._key(key)}:lock"
+            acquired = self.backend.add(lock_key, "1", settings.CACHE_LOCK_TIMEOUT_SECONDS)
+            if not acquired:
+                deadline = time.monotonic() + settings.CACHE_LOCK_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self.get(key)
+                    if value is not MISSING:
+                        return value
+                logger.debug(f"Cache lock wait timed out for {self.namespace}:{key}")
+
+            try:
+                self.loads += 1
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl_seconds)
+                return value
+            finally:
+                if acquired:
+                    self.backend.delete(lock_key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
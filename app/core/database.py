@@ -1,17 +1,191 @@
-from sqlalchemy import create_engine
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from sqlalchemy import create_engine, exc as sa_exc
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class PoolMetrics:
+    """
+    Checkout wait times for one connection pool.
+
+    Totals cover the life of the process; percentiles are computed over the
+    most recent checkouts so they reflect current load.
+    """
+
+    def __init__(self, name: str, window: int = 1024):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait_ms += wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                self._recent.append(wait_ms)
+            if wait_ms >= settings.DB_POOL_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+
+    def snapshot(self, pool: Optional[Any] = None) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            data = {
+                "name": self.name,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "p50_wait_ms": round(recent[len(recent) // 2], 3) if recent else 0.0,
+                "p99_wait_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))], 3) if recent else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            data.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        return data
+
+
+_pool_metrics: Dict[str, PoolMetrics] = {}
+_pools: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+
+
+def register_pool(name: str, pool: Any) -> None:
+    """Include a pool in pool_stats() (e.g. the sync side of an async engine)."""
+    _pools[name] = pool
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    with _registry_lock:
+        if name not in _pool_metrics:
+            _pool_metrics[name] = PoolMetrics(name)
+        return _pool_metrics[name]
+
+
+class _CheckoutTimingMixin:
+    """Times how long each checkout waits for a connection (`_do_get`)."""
+
+    def _do_get(self):
+        metrics = get_pool_metrics(self._orig_logging_name or "default")
+        # Keep the registry pointing at the live pool (dispose() recreates it)
+        register_pool(metrics.name, self)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+            logger.warning(f"Connection pool '{metrics.name}' exhausted: checkout timed out")
+            raise
+        metrics.record((time.perf_counter() - started) * 1000)
+        return connection
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _split(budget: int, share: float) -> Tuple[int, int]:
+    """Split `budget` into (sync, async) parts, `share` of it going to async."""
+    async_part = min(budget, max(0, round(budget * share)))
+    return budget - async_part, async_part
+
+
+def pool_budget(is_async: bool) -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) of one engine. The sync and async engines of
+    a database share DB_POOL_SIZE and DB_MAX_OVERFLOW instead of each
+    getting the full amount; each keeps at least one pooled connection.
+    """
+    share = min(max(settings.DB_ASYNC_POOL_SHARE, 0.0), 1.0)
+    index = 1 if is_async else 0
+    pool_size = _split(settings.DB_POOL_SIZE, share)[index]
+    max_overflow = _split(settings.DB_MAX_OVERFLOW, share)[index]
+    if pool_size < 1:
+        pool_size = 1
+        max_overflow = max(0, max_overflow - 1)
+    return pool_size, max_overflow
+
+
+def engine_options(url: str, name: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Keyword arguments for create_engine()/create_async_engine().
+
+    Pool sizing (the engine's part of the per-database budget, see
+    pool_budget), recycling, the statement timeout and SQL echo all come
+    from settings, so every engine in the process is configured the same way.
+    """
+    parsed = make_url(url)
+    options: Dict[str, Any] = {
+        "pool_pre_ping": True,
+        "echo": settings.DB_ECHO,
+        "pool_logging_name": name,
+    }
+    # In-memory SQLite lives in a single connection; leave its pool alone
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+
+    pool_size, max_overflow = pool_budget(is_async)
+    options.update({
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    })
+
+    if parsed.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        if is_async:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def create_db_engine(url: Optional[str] = None, name: str = "primary") -> Engine:
+    """Create a sync engine configured from settings."""
+    url = url or settings.DATABASE_URL
+    engine = create_engine(url, **engine_options(url, name))
+    register_pool(name, engine.pool)
+    return engine
+
+
+def pool_stats() -> list:
+    """Checkout metrics and current utilisation for every engine's pool."""
+    return [get_pool_metrics(name).snapshot(pool) for name, pool in sorted(_pools.items())]
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+engine = create_db_engine()
 
 # Create sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -37,4 +211,4 @@ def init_db():
         logger.error(f"Error initializing database: {e}")
         raise
 
-# Add any additional database configuration here 
\ No newline at end of file
+# Add any additional database configuration here
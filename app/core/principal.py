@@ -0,0 +1,76 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+from app.core.cache import MISSING, VersionedCache
+from app.core.config import settings
+from app.models.models import User, UserRole
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The authenticated caller, as needed for authorization checks.
+
+    Returned by the auth dependencies instead of the User row so a request
+    can be authorized without a database round trip. Handlers that need
+    the full user (profile endpoints, updates) load it explicitly.
+    """
+
+    id: int
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    role: UserRole
+    is_active: bool
+
+    @property
+    def full_name(self) -> str:
+        if self.first_name and self.last_name:
+            return f"{self.first_name} {self.last_name}"
+        return self.first_name or self.last_name or ""
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=user.role,
+            is_active=user.is_active,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["role"] = self.role.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Principal":
+        return cls(**{**data, "role": UserRole(data["role"])})
+
+
+# Keyed on the token subject ("sub"), which is a user id or, for older
+# tokens, an email address
+principal_cache = VersionedCache("principal", settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def get_cached_principal(subject: str) -> Optional[Principal]:
+    data = principal_cache.get(f"sub:{subject}")
+    return None if data is MISSING else Principal.from_dict(data)
+
+
+def cache_principal(subject: str, principal: Principal) -> None:
+    principal_cache.set(f"sub:{subject}", principal.to_dict())
+
+
+def invalidate_principal(user_id: int, *emails: Optional[str]) -> None:
+    """
+    Drop cached principals for a user; call after changing role, status,
+    name or email. Pass the old and new email so email-subject tokens are
+    covered too.
+    """
+    keys = {f"sub:{user_id}"} | {f"sub:{email}" for email in emails if email}
+    principal_cache.delete(*keys)
@@ -0,0 +1,197 @@
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Generator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import get_cache_backend
+from app.core.config import settings
+from app.core.database import SessionLocal, create_db_engine
+from app.core.async_database import AsyncSessionLocal, create_async_db_engine
+import itertools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared marker of a recent catalog write; see ReplicaRouter
+RECENT_WRITE_KEY = f"{settings.CACHE_KEY_PREFIX}:replicas:recent_write"
+
+
+class ReadOnlySession(Session):
+    """Session bound to a replica; flushing is refused so writes cannot land there."""
+
+
+class ReadOnlyAsyncSession(AsyncSession):
+    sync_session_class = ReadOnlySession
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _refuse_flush(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("Attempted to write through a read-replica session")
+
+
+@dataclass
+class Replica:
+    name: str
+    url: str
+    engine: Engine
+    async_engine: AsyncEngine
+    session_factory: sessionmaker
+    async_session_factory: async_sessionmaker
+    down_until: float = 0.0
+    failures: int = 0
+    last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
+@dataclass
+class ReplicaRouter:
+    """
+    Round-robin over configured read replicas with failure cooldown.
+
+    A replica whose connection check fails is skipped for
+    DB_REPLICA_COOLDOWN_SECONDS; when no replica is usable, reads go to the
+    primary. For DB_REPLICA_MAX_LAG_SECONDS after a catalog write reads also
+    stay on the primary, so a lagging replica cannot repopulate caches with
+    pre-write data. The write is recorded in this process and, since the
+    caches are shared, in the cache backend (a key that expires after the
+    lag window) so other workers see it too. With the memory backend, or
+    while Redis is unreachable, the guard only covers the writing process.
+    """
+
+    replicas: List[Replica] = field(default_factory=list)
+    _cycle: Optional[itertools.cycle] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _last_write: float = 0.0
+
+    def __post_init__(self):
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+
+    def candidates(self) -> List[Replica]:
+        """Healthy replicas in round-robin order, or [] to use the primary."""
+        if not self.replicas:
+            return []
+        if self.recent_write():
+            return []
+        with self._lock:
+            start = next(self._cycle)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if replica.healthy]
+
+    def mark_down(self, replica: Replica, error: Exception) -> None:
+        replica.down_until = time.monotonic() + settings.DB_REPLICA_COOLDOWN_SECONDS
+        replica.failures += 1
+        replica.last_error = str(error)
+        logger.warning(
+            f"Read replica {replica.name} unavailable, using other replicas/primary "
+            f"for {settings.DB_REPLICA_COOLDOWN_SECONDS}s: {error}"
+        )
+
+    def recent_write(self) -> bool:
+        """Whether any worker wrote the catalog within DB_REPLICA_MAX_LAG_SECONDS."""
+        if time.monotonic() - self._last_write < settings.DB_REPLICA_MAX_LAG_SECONDS:
+            return True
+        return get_cache_backend().get(RECENT_WRITE_KEY) is not None
+
+    def note_write(self) -> None:
+        self._last_write = time.monotonic()
+        if self.replicas:
+            get_cache_backend().set(RECENT_WRITE_KEY, "1", settings.DB_REPLICA_MAX_LAG_SECONDS)
+
+    def status(self) -> List[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "retry_in_seconds": round(max(replica.down_until - now, 0.0), 1),
+                "failures": replica.failures,
+                "last_error": replica.last_error,
+            }
+            for replica in self.replicas
+        ]
+
+
+def _build_router() -> ReplicaRouter:
+    urls = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    replicas = []
+    for index, url in enumerate(urls, start=1):
+        name = f"replica{index}"
+        engine = create_db_engine(url, name=name)
+        async_engine = create_async_db_engine(url, name=f"{name}_async")
+        replicas.append(Replica(
+            name=name,
+            url=url,
+            engine=engine,
+            async_engine=async_engine,
+            session_factory=sessionmaker(
+                autocommit=False, autoflush=False, bind=engine, class_=ReadOnlySession
+            ),
+            async_session_factory=async_sessionmaker(
+                bind=async_engine, class_=ReadOnlyAsyncSession, autoflush=False, expire_on_commit=False
+            ),
+        ))
+    if replicas:
+        logger.info(f"Routing catalog reads to {len(replicas)} read replica(s)")
+    return ReplicaRouter(replicas=replicas)
+
+
+router = _build_router()
+
+
+def note_write() -> None:
+    """Record a catalog write; see ReplicaRouter."""
+    router.note_write()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Session on a healthy read replica, falling back to the primary."""
+    for replica in router.candidates():
+        db = replica.session_factory()
+        try:
+            # Check out a connection now so a dead replica is detected here
+            # rather than halfway through the request
+            db.connection()
+        except Exception as e:
+            db.close()
+            router.mark_down(replica, e)
+            continue
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async counterpart of get_read_db."""
+    # candidates() may read the shared cache backend
+    for replica in await run_in_threadpool(router.candidates):
+        db = replica.async_session_factory()
+        try:
+            await db.connection()
+        except Exception as e:
+            await db.close()
+            router.mark_down(replica, e)
+            continue
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
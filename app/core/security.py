@@ -1,10 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Callable, Optional, Tuple, TypeVar, Union
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+import asyncio
+import threading
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# min_rounds makes needs_update()/verify_and_update() flag hashes created
+# with a lower BCRYPT_ROUNDS, so raising the cost upgrades users as they log in
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the
+# event loop responsive without the pickling overhead of a process pool
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+class PasswordHashingBusy(HTTPException):
+    """Raised when PASSWORD_HASH_MAX_PENDING hash/verify calls are already in flight."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts right now. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def _run_hashing(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a bcrypt call on the hashing executor.
+
+    Fails fast with PasswordHashingBusy instead of queueing without bound,
+    so a login storm sheds load rather than stacking up requests.
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = _hash_executor.submit(func, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # Release on completion rather than when the awaiting request finishes,
+    # so cancelled requests don't leak slots while their hash still runs
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -40,6 +91,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash when the stored one is outdated."""
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
 def create_email_verification_token(email: str) -> str:
     expire = datetime.utcnow() + timedelta(hours=24)
     to_encode = {"exp": expire, "sub": email, "type": "email_verification"}
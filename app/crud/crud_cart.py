@@ -1,16 +1,47 @@
-from typing import Any, Dict, Optional, Union, List
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple, Union, List
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from app.crud.base import CRUDBase
-from app.models.models import Cart, CartItem
+from app.models.models import Cart, CartItem, Product
 from app.schemas.cart import CartCreate, CartUpdate, CartItemCreate, CartItemUpdate
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
 class CRUDCart(CRUDBase[Cart, CartCreate, CartUpdate]):
     def get_by_user(self, db: Session, *, user_id: int) -> Optional[Cart]:
         return db.query(Cart).options(joinedload(Cart.items).joinedload(CartItem.product)).filter(Cart.user_id == user_id).first()
 
+    def get_cart_by_user_id(self, db: Session, user_id: int) -> Optional[Cart]:
+        """The user's cart row only, without items."""
+        return db.query(Cart).filter(Cart.user_id == user_id).first()
+
+    def get_cart_view(self, db: Session, user_id: int) -> Optional[Cart]:
+        """
+        The user's cart for display: items, their products (with images,
+        category and artist) and customizations are loaded in one query.
+        """
+        return db.query(Cart).options(
+            joinedload(Cart.items).options(
+                joinedload(CartItem.product).options(
+                    joinedload(Product.featured_image),
+                    joinedload(Product.images),
+                    joinedload(Product.category),
+                    joinedload(Product.artist),
+                ),
+                joinedload(CartItem.customization),
+            )
+        ).filter(Cart.user_id == user_id).populate_existing().first()
+
     def create_cart(self, db: Session, user_id: int) -> Cart:
         db_cart = Cart(user_id=user_id)
         db.add(db_cart)
@@ -18,6 +49,18 @@ class CRUDCart(CRUDBase[Cart, CartCreate, CartUpdate]):
         db.refresh(db_cart)
         return db_cart
 
+    def get_or_create_cart_id(self, db: Session, user_id: int) -> int:
+        """Id of the user's cart, creating the cart on first use."""
+        cart_id = db.scalar(select(Cart.id).where(Cart.user_id == user_id))
+        if cart_id is not None:
+            return cart_id
+        try:
+            return self.create_cart(db, user_id=user_id).id
+        except IntegrityError:
+            # Created by a concurrent request (carts.user_id is unique)
+            db.rollback()
+            return db.scalar(select(Cart.id).where(Cart.user_id == user_id))
+
     def remove_cart(self, db: Session, cart_id: int) -> bool:
         db_cart = db.query(Cart).filter(Cart.id == cart_id).first()
         if db_cart:
@@ -39,33 +82,76 @@ class CRUDCartItem:
             
         return query.first()
 
-    def add_item_to_cart(self, db: Session, cart_id: int, item: CartItemCreate) -> CartItem:
-        """Adds an item to the cart or updates quantity if it exists."""
-        # Check if the exact item (product + customization) already exists
-        db_item = self.get_cart_item(db, cart_id, item.product_id, item.product_customization_id)
+    def add_items(self, db: Session, cart_id: int, items: List[CartItemCreate]) -> List[int]:
+        """
+        Adds items to the cart in a single statement: each product/customization
+        line is inserted, or its quantity incremented if the cart already has it
+        (INSERT ... ON CONFLICT DO UPDATE against the unique line index), so
+        concurrent adds cannot create duplicate lines. Returns the ids of the
+        affected lines. Does not commit.
+        """
+        # Repeated lines in one request are merged; ON CONFLICT can't touch a row twice
+        quantities: Dict[Tuple[int, Optional[int]], int] = defaultdict(int)
+        for item in items:
+            quantities[(item.product_id, item.product_customization_id)] += item.quantity
 
-        if db_item:
-            # Update quantity
-            db_item.quantity += item.quantity
-            logger.info(f"Updated quantity for CartItem {db_item.id} to {db_item.quantity}")
-        else:
-            # Create new cart item
-            db_item = CartItem(
-                cart_id=cart_id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                product_customization_id=item.product_customization_id
-            )
-            db.add(db_item)
-            logger.info(f"Added new CartItem for product {item.product_id} (Customization: {item.product_customization_id})")
-        
+        table = CartItem.__table__
+        upsert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if upsert is not None:
+            statement = upsert(CartItem).values([
+                {
+                    "cart_id": cart_id,
+                    "product_id": product_id,
+                    "product_customization_id": customization_id,
+                    "quantity": quantity,
+                }
+                for (product_id, customization_id), quantity in quantities.items()
+            ])
+            statement = statement.on_conflict_do_update(
+                # The literal must not be a bound parameter, or the target won't match the index
+                index_elements=[
+                    table.c.cart_id,
+                    table.c.product_id,
+                    func.coalesce(table.c.product_customization_id, literal_column("0")),
+                ],
+                set_={"quantity": table.c.quantity + statement.excluded.quantity, "updated_at": func.now()},
+            ).returning(table.c.id)
+            return list(db.execute(statement).scalars())
+
+        # Generic fallback: increment existing lines and insert the others
+        item_ids = []
+        for (product_id, customization_id), quantity in quantities.items():
+            db_item = self.get_cart_item(db, cart_id, product_id, customization_id)
+            if db_item:
+                db_item.quantity += quantity
+            else:
+                db_item = CartItem(
+                    cart_id=cart_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    product_customization_id=customization_id
+                )
+                db.add(db_item)
+            db.flush()
+            item_ids.append(db_item.id)
+        return item_ids
+
+    def add_item_to_cart(self, db: Session, cart_id: int, item: CartItemCreate) -> int:
+        """Adds an item to the cart or updates quantity if it exists. Returns the cart item id."""
+        item_id = self.add_items(db, cart_id, [item])[0]
         db.commit()
-        db.refresh(db_item)
-        return db_item
+        logger.info(f"Added {item.quantity} of product {item.product_id} (Customization: {item.product_customization_id}) to CartItem {item_id}")
+        return item_id
+
+    def get_user_cart_item(self, db: Session, user_id: int, cart_item_id: int) -> Optional[CartItem]:
+        """A cart item, only if it is in the given user's cart."""
+        return db.query(CartItem).join(Cart, Cart.id == CartItem.cart_id).filter(
+            CartItem.id == cart_item_id,
+            Cart.user_id == user_id
+        ).first()
 
-    def update_cart_item(self, db: Session, cart_item_id: int, item_update: CartItemUpdate) -> Optional[CartItem]:
+    def update_cart_item(self, db: Session, db_item: CartItem, item_update: CartItemUpdate) -> CartItem:
         """Updates a specific cart item (e.g., quantity)."""
-        db_item = db.query(CartItem).filter(CartItem.id == cart_item_id).first()
         if db_item:
             if item_update.quantity is not None:
                 db_item.quantity = item_update.quantity
@@ -74,27 +160,40 @@ class CRUDCartItem:
             # If needed, add logic here.
             # if item_update.product_customization_id is not None:
             #     db_item.product_customization_id = item_update.product_customization_id
+            logger.info(f"Updated CartItem {db_item.id}")
                 
             db.commit()
-            db.refresh(db_item)
-            logger.info(f"Updated CartItem {db_item.id}")
         return db_item
 
-    def remove_cart_item(self, db: Session, cart_item_id: int) -> bool:
-        """Removes an item from the cart by its ID."""
-        db_item = db.query(CartItem).filter(CartItem.id == cart_item_id).first()
-        if db_item:
-            db.delete(db_item)
-            db.commit()
-            logger.info(f"Removed CartItem {db_item.id}")
-            return True
-        return False
+    def remove_cart_item(self, db: Session, cart_item_id: int, user_id: Optional[int] = None) -> bool:
+        """
+        Removes an item from the cart by its ID, with a single DELETE.
+        With `user_id`, only an item in that user's cart is removed.
+        """
+        query = db.query(CartItem).filter(CartItem.id == cart_item_id)
+        if user_id is not None:
+            query = query.filter(CartItem.cart_id.in_(select(Cart.id).where(Cart.user_id == user_id)))
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"Removed CartItem {cart_item_id}")
+        return bool(deleted)
 
-    def clear_cart(self, db: Session, cart_id: int) -> int:
-        """Removes all items from a specific cart. Returns the number of items removed."""
-        num_deleted = db.query(CartItem).filter(CartItem.cart_id == cart_id).delete()
+    def clear_cart(self, db: Session, cart_id: Optional[int] = None, user_id: Optional[int] = None) -> int:
+        """
+        Removes all items from a cart, given by its ID or by its owner.
+        Returns the number of items removed.
+        """
+        if cart_id is None and user_id is None:
+            raise ValueError("clear_cart needs a cart_id or a user_id")
+        query = db.query(CartItem)
+        if cart_id is not None:
+            query = query.filter(CartItem.cart_id == cart_id)
+        if user_id is not None:
+            query = query.filter(CartItem.cart_id.in_(select(Cart.id).where(Cart.user_id == user_id)))
+        num_deleted = query.delete(synchronize_session=False)
         db.commit()
-        logger.info(f"Cleared {num_deleted} items from Cart ID {cart_id}")
+        logger.info(f"Cleared {num_deleted} items from cart (cart {cart_id}, user {user_id})")
         return num_deleted
 
 cart = CRUDCart(Cart)
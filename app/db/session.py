@@ -1,6 +1,5 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+# The engine and session factory live in app.core.database so each process
+# has a single connection pool; this module re-exports them for older imports.
+from app.core.database import engine, SessionLocal
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) 
\ No newline at end of file
+__all__ = ["engine", "SessionLocal"]
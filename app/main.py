@@ -22,6 +22,15 @@ from app.db.base import Base  # noqa: F401
 from app.api.v1 import api_router
 from app.db.init_db import init_db
 from app.db.seed import seed_db
+from app.core.background import register_periodic_task, start_background_tasks, stop_background_tasks
+from app.services.email_outbox import drain_outbox
+from app.services.inventory import sweep_expired
+from app.services.ratings import reconcile_rating_stats
+from app.services.related_products import rebuild_related_products
+from app.services.co_purchases import update_co_purchases
+from app.services.cleanup import run_cleanup
+from app.services import view_counter
+import asyncio
 import os
 import sys
 import logging
@@ -64,6 +73,8 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"], # Allow all methods
         allow_headers=["*"], # Allow all headers
+        # Response headers the storefront has to read (pagination, caching, guest cart)
+        expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "X-Cart-Token"],
     )
 else:
     logger.warning("BACKEND_CORS_ORIGINS not configured. CORS middleware not added.")
@@ -128,6 +139,42 @@ async def startup_event():
             logger.info("Database seeded successfully!")
         except Exception as e:
             logger.error(f"Error seeding database: {e}")
+    
+    if settings.BACKGROUND_TASKS_ENABLED:
+        register_periodic_task("email_outbox", settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS, drain_outbox)
+        register_periodic_task("inventory_sweeper", settings.INVENTORY_SWEEP_INTERVAL_SECONDS, sweep_expired)
+        register_periodic_task(
+            "rating_reconciliation",
+            settings.RATING_RECONCILE_INTERVAL_SECONDS,
+            reconcile_rating_stats,
+            initial_delay_seconds=60,
+        )
+        register_periodic_task("view_counter_flush", settings.VIEW_COUNTER_FLUSH_INTERVAL_SECONDS, view_counter.flush)
+        register_periodic_task(
+            "related_products",
+            settings.RELATED_PRODUCTS_REBUILD_INTERVAL_SECONDS,
+            rebuild_related_products,
+            initial_delay_seconds=30,
+        )
+        register_periodic_task(
+            "co_purchases",
+            settings.CO_PURCHASE_INTERVAL_SECONDS,
+            update_co_purchases,
+            initial_delay_seconds=45,
+        )
+        register_periodic_task(
+            "stale_cleanup",
+            settings.CLEANUP_INTERVAL_SECONDS,
+            run_cleanup,
+            initial_delay_seconds=120,
+        )
+        await start_background_tasks()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_background_tasks()
+    # Write out views counted since the last flush
+    await asyncio.to_thread(view_counter.flush)
 
 @app.get("/seed")
 def run_seed_db():
@@ -1,6 +1,8 @@
-from typing import List
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum, JSON
+from typing import List, Optional, Tuple
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum, JSON, Index
+from sqlalchemy import event, literal, select, update
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import func
 from datetime import datetime
 from app.db.base_class import Base
@@ -90,16 +92,75 @@ class Category(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # Materialized path of ancestor ids including this category, e.g. "/1/4/9/",
+    # and its depth (0 for top-level). Kept in sync by the listeners below, so
+    # a subtree is everything whose path starts with the category's path.
+    path = Column(String(255), nullable=True)
+    depth = Column(Integer, default=0, nullable=False)
     
     # Relationships
     parent = relationship("Category", remote_side=[id], backref="children")
     products = relationship("Product", back_populates="category", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_categories_path", "path", postgresql_ops={"path": "varchar_pattern_ops"}),
+    )
     
     def __init__(self, **kwargs):
         if 'name' in kwargs and 'slug' not in kwargs:
             kwargs['slug'] = slugify(kwargs['name'])
         super().__init__(**kwargs)
 
+def _category_path_prefix(connection, parent_id: Optional[int]) -> Tuple[str, int]:
+    """Path prefix and depth for a child of `parent_id`."""
+    if parent_id is None:
+        return "/", 0
+    parent = connection.execute(
+        select(Category.path, Category.depth).where(Category.id == parent_id)
+    ).first()
+    if parent is None or parent.path is None:
+        raise ValueError(f"Parent category {parent_id} has no path")
+    return parent.path, parent.depth + 1
+
+@event.listens_for(Category, "after_insert")
+def _set_category_path(mapper, connection, target):
+    prefix, depth = _category_path_prefix(connection, target.parent_id)
+    path = f"{prefix}{target.id}/"
+    connection.execute(
+        update(Category.__table__).where(Category.__table__.c.id == target.id).values(path=path, depth=depth)
+    )
+    set_committed_value(target, "path", path)
+    set_committed_value(target, "depth", depth)
+
+@event.listens_for(Category, "after_update")
+def _move_category_subtree(mapper, connection, target):
+    table = Category.__table__
+    prefix, depth = _category_path_prefix(connection, target.parent_id)
+    path = f"{prefix}{target.id}/"
+    # Read from the row, the instance's copy may be expired
+    old_path, old_depth = connection.execute(
+        select(table.c.path, table.c.depth).where(table.c.id == target.id)
+    ).one()
+    if path == old_path:
+        return
+
+    if old_path is None:
+        connection.execute(update(table).where(table.c.id == target.id).values(path=path, depth=depth))
+    else:
+        if prefix.startswith(old_path):
+            raise ValueError("A category cannot be moved under one of its own subcategories")
+        # Rewrite the prefix of the category and all of its descendants
+        connection.execute(
+            update(table)
+            .where(table.c.path.like(f"{old_path}%"))
+            .values(
+                path=literal(path) + func.substr(table.c.path, len(old_path) + 1),
+                depth=table.c.depth + (depth - (old_depth or 0)),
+            )
+        )
+    set_committed_value(target, "path", path)
+    set_committed_value(target, "depth", depth)
+
 class ProductImage(Base):
     __tablename__ = "product_images"
 
@@ -122,7 +183,7 @@ class Product(Base):
     description = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     artist_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     status = Column(Enum(ProductStatus), nullable=False, default=ProductStatus.DRAFT)
     
@@ -172,6 +233,9 @@ class Product(Base):
     
     # Customization relationship
     customizations = relationship("ProductCustomization", back_populates="product", cascade="all, delete-orphan")
+    
+    # Running rating totals and star histogram, see ProductRatingStats
+    rating_stats = relationship("ProductRatingStats", uselist=False, back_populates="product", passive_deletes=True)
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -189,6 +253,87 @@ class Review(Base):
     user = relationship("User", back_populates="reviews")
     product = relationship("Product", back_populates="reviews")
 
+class ProductRatingStats(Base):
+    """
+    Running review totals per product, updated in the same transaction as
+    each review so the average never needs a scan over all reviews.
+    Product.rating and Product.reviews_count are derived from this row.
+    """
+    __tablename__ = "product_rating_stats"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_count = Column(Integer, nullable=False, default=0, server_default='0')
+    stars_1 = Column(Integer, nullable=False, default=0, server_default='0')
+    stars_2 = Column(Integer, nullable=False, default=0, server_default='0')
+    stars_3 = Column(Integer, nullable=False, default=0, server_default='0')
+    stars_4 = Column(Integer, nullable=False, default=0, server_default='0')
+    stars_5 = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    product = relationship("Product", back_populates="rating_stats")
+
+    @property
+    def histogram(self) -> dict:
+        return {str(stars): getattr(self, f"stars_{stars}") for stars in range(1, 6)}
+
+class ProductRelated(Base):
+    """
+    Precomputed related products, ranked per product by the related
+    products job (app.services.related_products). The primary key doubles
+    as the index the endpoint reads in rank order.
+    """
+    __tablename__ = "product_related"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    related_product = relationship("Product", foreign_keys=[related_product_id])
+
+class ProductCoPurchase(Base):
+    """
+    Sparse product co-occurrence counts built from order items by the
+    co-purchase job (app.services.co_purchases).
+
+    Each pair is stored in both directions so a product's row is a
+    primary key prefix scan. The diagonal (product_id == other_product_id)
+    holds the number of orders containing the product.
+    """
+    __tablename__ = "product_co_purchases"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    other_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders_count = Column(Integer, nullable=False)
+
+class FrequentlyBoughtTogether(Base):
+    """Top co-purchased products per product, ranked by the co-purchase job."""
+    __tablename__ = "frequently_bought_together"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    orders_count = Column(Integer, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    related_product = relationship("Product", foreign_keys=[related_product_id])
+
+class JobState(Base):
+    """Progress of incremental background jobs, one row per job."""
+    __tablename__ = "job_state"
+
+    name = Column(String(100), primary_key=True)
+    # Highest source row id processed so far (keyset watermark)
+    last_id = Column(Integer, default=0, nullable=False)
+    processed_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Cart(Base):
     __tablename__ = "carts"
 
@@ -199,7 +344,7 @@ class Cart(Base):
 
     # Relationships
     user = relationship("User", back_populates="cart")
-    items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
+    items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan", order_by="CartItem.id")
 
 class CartItem(Base):
     __tablename__ = "cart_items"
@@ -209,7 +354,7 @@ class CartItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
     # Link to the specific customization instead of storing JSON blob here
-    product_customization_id = Column(Integer, ForeignKey("product_customizations.id"), nullable=True) 
+    product_customization_id = Column(Integer, ForeignKey("product_customizations.id"), nullable=True, index=True) 
     # Keep customization JSON for non-saved or simpler cases if needed, or remove later
     # customization = Column(JSON) 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -220,6 +365,17 @@ class CartItem(Base):
     product = relationship("Product", back_populates="cart_items")
     customization = relationship("ProductCustomization", back_populates="cart_item") # New relationship
 
+    __table_args__ = (
+        # One line per product/customization in a cart. NULL customizations
+        # are folded to 0 so uncustomized lines are unique too; adding to
+        # the cart upserts against this index.
+        Index(
+            "uq_cart_items_cart_product_customization",
+            cart_id, product_id, func.coalesce(product_customization_id, 0),
+            unique=True,
+        ),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -254,7 +410,7 @@ class OrderItem(Base):
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False) # Price at the time of order
     # Link to the specific customization
-    product_customization_id = Column(Integer, ForeignKey("product_customizations.id"), nullable=True)
+    product_customization_id = Column(Integer, ForeignKey("product_customizations.id"), nullable=True, index=True)
     # Keep customization JSON for non-saved or simpler cases if needed, or remove later
     # customization = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -328,4 +484,66 @@ class ProductCustomization(Base):
     # Relationships back to cart/order items using this customization
     # Using uselist=False because one customization instance should belong to only one cart item or order item
     cart_item = relationship("CartItem", back_populates="customization", uselist=False) 
-    order_item = relationship("OrderItem", back_populates="customization", uselist=False) 
\ No newline at end of file
+    order_item = relationship("OrderItem", back_populates="customization", uselist=False) 
+
+class EmailOutboxStatus(str, PyEnum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class EmailOutbox(Base):
+    """
+    Emails waiting to be delivered by the outbox worker.
+
+    Rows are added in the same transaction as the change that triggers the
+    email, so a message is queued exactly when that change is committed.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String(320), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_body = Column(Text, nullable=False)
+    status = Column(Enum(EmailOutboxStatus), default=EmailOutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+class ReservationStatus(str, PyEnum):
+    ACTIVE = "active"
+    COMMITTED = "committed"
+    RELEASED = "released"
+    EXPIRED = "expired"
+
+class InventoryReservation(Base):
+    """
+    Stock held for an order between checkout and payment.
+
+    Product.stock is decremented when the reservation is made; releasing
+    or expiring it puts the quantity back, committing it (payment or
+    fulfilment) makes the sale final. See app.services.inventory.
+    """
+    __tablename__ = "inventory_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=True, index=True)
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus), default=ReservationStatus.ACTIVE, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    product = relationship("Product")
+    order = relationship("Order")
+
+    __table_args__ = (
+        Index("ix_inventory_reservations_status_expires_at", "status", "expires_at"),
+    )
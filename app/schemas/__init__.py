@@ -5,8 +5,11 @@ from .product import (
     ProductImageBase, ProductImageCreate, ProductImageResponse,
     ProductStatus
 )
-from .category import CategoryBase, CategoryCreate, CategoryUpdate, CategoryResponse
-from .cart import CartCreate, CartRead, CartItemBase, CartItemCreate, CartItemUpdate, CartItemRead
+from .category import CategoryBase, CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeNode
+from .cart import (
+    CartCreate, CartRead, CartItemBase, CartItemCreate, CartItemBatchCreate, CartItemUpdate, CartItemRead,
+    GuestCartItemCreate, GuestCartItemBatchCreate, GuestCartItemRead, GuestCartRead,
+)
 from .order import OrderCreate, OrderUpdate, OrderResponse, OrderItemCreate, OrderItemResponse
 from .address import AddressCreate, AddressUpdate, AddressResponse
 from .review import ReviewCreate, ReviewResponse
@@ -42,12 +45,18 @@ __all__ = [
     "CategoryCreate",
     "CategoryUpdate",
     "CategoryResponse",
+    "CategoryTreeNode",
     "CartCreate",
     "CartRead",
     "CartItemBase",
     "CartItemCreate",
+    "CartItemBatchCreate",
     "CartItemUpdate",
     "CartItemRead",
+    "GuestCartItemCreate",
+    "GuestCartItemBatchCreate",
+    "GuestCartItemRead",
+    "GuestCartRead",
     "OrderCreate",
     "OrderUpdate",
     "OrderResponse",
@@ -1,5 +1,5 @@
 from typing import Dict, Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from datetime import datetime
 from .product import ProductResponse  # Corrected: Import ProductResponse instead of ProductRead
 from .customization import ProductCustomizationRead # Import the new customization schema
@@ -12,6 +12,9 @@ class CartItemBase(BaseModel):
 class CartItemCreate(CartItemBase):
     pass
 
+class CartItemBatchCreate(BaseModel):
+    items: List[CartItemCreate] = Field(..., min_length=1, max_length=100)
+
 class CartItemUpdate(BaseModel):
     quantity: Optional[int] = Field(None, gt=0)
     product_customization_id: Optional[int] = None # Allow updating customization link if needed
@@ -23,6 +26,12 @@ class CartItemRead(CartItemBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    @computed_field
+    @property
+    def line_total(self) -> float:
+        """Current product price times quantity"""
+        return round(self.product.price * self.quantity, 2)
+
     class Config:
         from_attributes = True # Renamed from orm_mode
 
@@ -57,5 +66,49 @@ class CartRead(CartBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    # Totals are computed here so the storefront doesn't have to add up items
+    @computed_field
+    @property
+    def subtotal(self) -> float:
+        return round(sum(item.line_total for item in self.items), 2)
+
+    @computed_field
+    @property
+    def total_items(self) -> int:
+        return sum(item.quantity for item in self.items)
+
     class Config:
-        from_attributes = True # Renamed from orm_mode 
\ No newline at end of file
+        from_attributes = True # Renamed from orm_mode 
+
+# Guest carts live outside the database, keyed by the X-Cart-Token header.
+# Customizations belong to user accounts, so guest lines are plain products.
+class GuestCartItemCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+class GuestCartItemBatchCreate(BaseModel):
+    items: List[GuestCartItemCreate] = Field(..., min_length=1, max_length=100)
+
+class GuestCartItemRead(BaseModel):
+    product_id: int
+    quantity: int
+    product: ProductResponse
+
+    @computed_field
+    @property
+    def line_total(self) -> float:
+        return round(self.product.price * self.quantity, 2)
+
+class GuestCartRead(BaseModel):
+    token: Optional[str] = None
+    items: List[GuestCartItemRead] = []
+
+    @computed_field
+    @property
+    def subtotal(self) -> float:
+        return round(sum(item.line_total for item in self.items), 2)
+
+    @computed_field
+    @property
+    def total_items(self) -> int:
+        return sum(item.quantity for item in self.items)
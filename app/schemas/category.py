@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -9,6 +9,10 @@ class CategoryBase(BaseModel):
     parent_id: Optional[int] = None
     is_active: bool = True
 
+    class Config:
+        # Embedded in product responses built from ORM objects
+        from_attributes = True
+
 
 class CategoryCreate(CategoryBase):
     pass
@@ -24,8 +28,22 @@ class CategoryUpdate(BaseModel):
 class CategoryResponse(CategoryBase):
     id: int
     slug: str
+    path: Optional[str] = None
+    depth: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class CategoryTreeNode(BaseModel):
+    id: int
+    name: str
+    slug: str
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+    is_active: bool = True
+    parent_id: Optional[int] = None
+    depth: int = 0
+    children: List["CategoryTreeNode"] = []
@@ -1,7 +1,16 @@
 from typing import Any, Dict, Optional, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.security import get_password_hash, verify_password, create_email_verification_token
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_and_update_password_async,
+    create_email_verification_token,
+    pwd_context,
+)
 from app.models.models import User
+from app.core.principal import invalidate_principal
 from app.schemas.user import UserCreate, UserUpdate
 from datetime import datetime, timedelta
 
@@ -11,7 +20,10 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
-def create_user(db: Session, user_in: UserCreate) -> User:
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email).limit(1))
+
+def _build_user(user_in: UserCreate, hashed_password: str) -> User:
     # Split full_name into first_name and last_name
     name_parts = user_in.full_name.split(' ', 1)
     first_name = name_parts[0]
@@ -19,7 +31,7 @@ def create_user(db: Session, user_in: UserCreate) -> User:
     
     user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         first_name=first_name,
         last_name=last_name,
         user_type=user_in.user_type,
@@ -32,12 +44,24 @@ def create_user(db: Session, user_in: UserCreate) -> User:
         business_registration_number=user_in.business_registration_number,
         business_address=user_in.business_address,
     )
+    return user
+
+def create_user(db: Session, user_in: UserCreate) -> User:
+    user = _build_user(user_in, get_password_hash(user_in.password))
     db.add(user)
     db.commit()
     db.refresh(user)
     return user
 
+async def create_user_async(db: AsyncSession, user_in: UserCreate) -> User:
+    user = _build_user(user_in, await get_password_hash_async(user_in.password))
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
 def update_user(db: Session, user: User, user_in: UserUpdate) -> User:
+    old_email = user.email
     update_data = user_in.dict(exclude_unset=True)
     if "password" in update_data:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
@@ -46,14 +70,37 @@ def update_user(db: Session, user: User, user_in: UserUpdate) -> User:
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_principal(user.id, old_email, user.email)
     return user
 
 def authenticate(db: Session, email: str, password: str) -> Optional[User]:
     user = get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = pwd_context.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    return user
+
+async def authenticate_async(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """
+    Check credentials without blocking the event loop.
+
+    bcrypt runs on the hashing executor; a stored hash with an outdated
+    cost is replaced with one using the current BCRYPT_ROUNDS.
+    """
+    user = await get_user_by_email_async(db, email=email)
+    if not user:
+        return None
+    valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def verify_email_token(db: Session, token: str) -> Optional[User]:
@@ -0,0 +1,110 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.core.cache import MISSING, VersionedCache, get_cache_backend
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Product detail responses, stored under both "id:<id>" and "slug:<slug>"
+products = VersionedCache("product", settings.CATALOG_CACHE_TTL_SECONDS)
+
+# Category listings keyed by their query parameters
+categories = VersionedCache("categories", settings.CATALOG_CACHE_TTL_SECONDS)
+
+# Related product lists keyed by product id or slug and limit
+related = VersionedCache("related_products", settings.CATALOG_CACHE_TTL_SECONDS)
+
+# Frequently bought together lists keyed by product id or slug and limit
+bought_together = VersionedCache("bought_together", settings.CATALOG_CACHE_TTL_SECONDS)
+
+# Shipping rate quotes keyed by zone and remote-area flag
+shipping_rates = VersionedCache("shipping_rates", settings.SHIPPING_RATE_CACHE_TTL_SECONDS)
+
+
+def _product_key(product_id_or_slug: Any) -> str:
+    """Cache key for a product looked up by numeric id or by slug."""
+    try:
+        return f"id:{int(product_id_or_slug)}"
+    except (TypeError, ValueError):
+        return f"slug:{product_id_or_slug}"
+
+
+def get_product(product_id_or_slug: Any, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Return a product detail response, loading it on a miss.
+
+    A freshly loaded product is also stored under its other key (slug or
+    id), so either lookup is served by the next request.
+    """
+    key = _product_key(product_id_or_slug)
+
+    def load():
+        product = loader()
+        if product is not None:
+            aliases = {f"id:{product['id']}"}
+            if product.get("slug"):
+                aliases.add(f"slug:{product['slug']}")
+            for alias in aliases - {key}:
+                products.set(alias, product)
+        return product
+
+    return products.get_or_set(key, load)
+
+
+def invalidate_product(product_id: int, slug: Optional[str] = None) -> None:
+    """
+    Drop a product from the cache after it was written.
+
+    Related and frequently bought together lists embed other products, so
+    they are invalidated as well.
+    """
+    slugs = {slug}
+    cached = products.get(f"id:{product_id}")
+    if cached is not MISSING and cached:
+        slugs.add(cached.get("slug"))
+    products.delete(f"id:{product_id}", *[f"slug:{old_slug}" for old_slug in slugs if old_slug])
+    related.invalidate_all()
+    bought_together.invalidate_all()
+
+
+def invalidate_products(product_ids: Iterable[int]) -> None:
+    """invalidate_product for several products, e.g. after a stock change; the lists are dropped once."""
+    keys = []
+    for product_id in product_ids:
+        keys.append(f"id:{product_id}")
+        cached = products.get(f"id:{product_id}")
+        if cached is not MISSING and cached and cached.get("slug"):
+            keys.append(f"slug:{cached['slug']}")
+    if not keys:
+        return
+    products.delete(*keys)
+    related.invalidate_all()
+    bought_together.invalidate_all()
+
+
+def get_categories(key: str, loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    return categories.get_or_set(key, loader)
+
+
+def invalidate_categories() -> None:
+    """Drop cached category listings; product details embed the category too."""
+    categories.invalidate_all()
+    products.invalidate_all()
+
+
+def get_related(product_id_or_slug: Any, limit: int,
+                loader: Callable[[], Optional[List[Dict[str, Any]]]]) -> Optional[List[Dict[str, Any]]]:
+    return related.get_or_set(f"{_product_key(product_id_or_slug)}:{limit}", loader)
+
+
+def get_bought_together(product_id_or_slug: Any, limit: int,
+                        loader: Callable[[], Optional[List[Dict[str, Any]]]]) -> Optional[List[Dict[str, Any]]]:
+    return bought_together.get_or_set(f"{_product_key(product_id_or_slug)}:{limit}", loader)
+
+
+def stats() -> Dict[str, Any]:
+    """Backend counters plus hit/miss counters for every catalog namespace."""
+    return {
+        "backend": get_cache_backend().stats(),
+        "namespaces": [cache.stats() for cache in (products, categories, related, bought_together, shipping_rates)],
+    }
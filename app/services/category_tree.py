@@ -0,0 +1,79 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import Select
+from app.models.models import Category
+
+
+def subtree_ids(category_id: int) -> Select:
+    """
+    SELECT of the ids of a category and all of its descendants.
+
+    A prefix match on the indexed materialized path, so it can be used as
+    an IN subquery to filter products by a whole branch in one query.
+    """
+    root = aliased(Category)
+    root_path = select(root.path).where(root.id == category_id).scalar_subquery()
+    return select(Category.id).where(Category.path.like(root_path + "%"))
+
+
+def _node(category: Category) -> Dict[str, Any]:
+    return {
+        "id": category.id,
+        "name": category.name,
+        "slug": category.slug,
+        "description": category.description,
+        "image_url": category.image_url,
+        "is_active": category.is_active,
+        "parent_id": category.parent_id,
+        "depth": category.depth,
+        "children": [],
+    }
+
+
+def load_tree(db: Session, include_inactive: bool = False) -> List[Dict[str, Any]]:
+    """
+    The whole category hierarchy as nested nodes, from a single query.
+
+    Rows come back ordered by depth, so every parent is placed before its
+    children. Inactive categories are left out together with everything
+    below them unless `include_inactive` is set.
+    """
+    categories = db.query(Category).order_by(Category.depth, Category.name).all()
+
+    nodes: Dict[int, Dict[str, Any]] = {}
+    roots = []
+    for category in categories:
+        if not include_inactive and not category.is_active:
+            continue
+        node = _node(category)
+        if category.parent_id is None:
+            roots.append(node)
+        elif category.parent_id in nodes:
+            nodes[category.parent_id]["children"].append(node)
+        else:
+            # Parent is hidden (inactive), so is its branch
+            continue
+        nodes[category.id] = node
+    return roots
+
+
+def check_parent(db: Session, category: Optional[Category], parent_id: Optional[int]) -> None:
+    """Raise ValueError unless `parent_id` can become the parent of `category`."""
+    if parent_id is None:
+        return
+    parent = db.query(Category).filter(Category.id == parent_id).first()
+    if parent is None:
+        raise ValueError("Parent category not found")
+    if category is not None and category.path and parent.path and parent.path.startswith(category.path):
+        raise ValueError("A category cannot be moved under itself or one of its subcategories")
+
+
+def detach_children(db: Session, category: Category) -> None:
+    """
+    Move a category's children up to its own parent, before the category
+    is deleted; the path listeners rewrite each moved branch.
+    """
+    for child in list(category.children):
+        child.parent = category.parent
+    db.flush()
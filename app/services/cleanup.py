@@ -0,0 +1,279 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import and_, delete, exists, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Cart, CartItem, OrderItem, ProductCustomization
+import local_s3
+import json
+import os
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Where upload_customization_image_data stores rendered designs and AI images
+DESIGN_BUCKET = "okyke-files"
+DESIGN_PREFIX = "products/custom_designs/"
+_DESIGN_KEY = re.compile(re.escape(DESIGN_PREFIX) + r"[^\s\"'?#)]+")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _pause(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def _stale_cart(cutoff: datetime):
+    """Carts with no cart or item activity since `cutoff`."""
+    return and_(
+        func.coalesce(Cart.updated_at, Cart.created_at) < cutoff,
+        ~exists().where(
+            CartItem.cart_id == Cart.id,
+            func.coalesce(CartItem.updated_at, CartItem.created_at) >= cutoff,
+        ),
+    )
+
+
+def _orphaned_customization(cutoff: datetime):
+    """Customizations created before `cutoff` that no cart or order item uses."""
+    return and_(
+        ProductCustomization.created_at < cutoff,
+        ~exists().where(CartItem.product_customization_id == ProductCustomization.id),
+        ~exists().where(OrderItem.product_customization_id == ProductCustomization.id),
+    )
+
+
+def _design_key(url: Optional[str]) -> Optional[str]:
+    match = _DESIGN_KEY.search(url or "")
+    return match.group(0) if match else None
+
+
+def _design_path(key: str) -> str:
+    return os.path.join(local_s3.LOCAL_STORAGE_DIR, DESIGN_BUCKET, *key.split("/"))
+
+
+def _remove_file(path: str, metrics: Dict[str, Any]) -> None:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        metrics["file_errors"] += 1
+        logger.warning(f"Could not delete design file {path}: {str(e)}")
+        return
+    metrics["files"] += 1
+    metrics["bytes"] += size
+
+
+def delete_stale_carts(
+    db: Session, metrics: Dict[str, Any], dry_run: bool, batch_size: int, pause_seconds: float
+) -> None:
+    """
+    Delete carts (and their items) abandoned for CLEANUP_CART_MAX_AGE_DAYS,
+    walking carts in id order one batch per transaction. Deletes re-check
+    staleness, so a cart that gets an item mid-run is kept.
+    """
+    cutoff = _utcnow() - timedelta(days=settings.CLEANUP_CART_MAX_AGE_DAYS)
+    last_id = 0
+    while True:
+        cart_ids = list(db.scalars(
+            select(Cart.id).where(Cart.id > last_id, _stale_cart(cutoff)).order_by(Cart.id).limit(batch_size)
+        ))
+        if not cart_ids:
+            break
+        last_id = cart_ids[-1]
+        metrics["batches"] += 1
+
+        if dry_run:
+            metrics["carts"] += len(cart_ids)
+            metrics["cart_items"] += db.scalar(
+                select(func.count(CartItem.id)).where(CartItem.cart_id.in_(cart_ids))
+            )
+            db.rollback()
+        else:
+            stale_ids = select(Cart.id).where(Cart.id.in_(cart_ids), _stale_cart(cutoff))
+            metrics["cart_items"] += db.execute(
+                delete(CartItem).where(CartItem.cart_id.in_(stale_ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            metrics["carts"] += db.execute(
+                delete(Cart)
+                .where(Cart.id.in_(cart_ids), ~exists().where(CartItem.cart_id == Cart.id))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+
+        if len(cart_ids) < batch_size:
+            break
+        _pause(pause_seconds)
+
+
+def delete_orphaned_customizations(
+    db: Session, metrics: Dict[str, Any], dry_run: bool, batch_size: int, pause_seconds: float
+) -> None:
+    """
+    Delete customizations older than CLEANUP_CUSTOMIZATION_MAX_AGE_DAYS that
+    no cart or order item references, then their rendered images. Files are
+    only removed after the rows are committed, and not while another
+    customization still points at them.
+    """
+    cutoff = _utcnow() - timedelta(days=settings.CLEANUP_CUSTOMIZATION_MAX_AGE_DAYS)
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(ProductCustomization.id, ProductCustomization.rendered_image_url)
+            .where(ProductCustomization.id > last_id, _orphaned_customization(cutoff))
+            .order_by(ProductCustomization.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        metrics["batches"] += 1
+        ids = [row.id for row in rows]
+
+        if dry_run:
+            metrics["customizations"] += len(rows)
+            db.rollback()
+        else:
+            db.execute(
+                delete(ProductCustomization)
+                .where(ProductCustomization.id.in_(ids), _orphaned_customization(cutoff))
+                .execution_options(synchronize_session=False)
+            )
+            # Rows that gained a reference since they were selected are kept
+            kept = set(db.scalars(select(ProductCustomization.id).where(ProductCustomization.id.in_(ids))))
+            db.commit()
+            deleted = [row for row in rows if row.id not in kept]
+            metrics["customizations"] += len(deleted)
+
+            urls = {row.rendered_image_url for row in deleted if _design_key(row.rendered_image_url)}
+            if urls:
+                shared = set(db.scalars(
+                    select(ProductCustomization.rendered_image_url)
+                    .where(ProductCustomization.rendered_image_url.in_(urls))
+                ))
+                db.rollback()
+                for url in urls - shared:
+                    _remove_file(_design_path(_design_key(url)), metrics)
+
+        if len(rows) < batch_size:
+            break
+        _pause(pause_seconds)
+
+
+def _referenced_design_keys(db: Session) -> Set[str]:
+    """Design file keys used by any customization, as its image or inside its canvas."""
+    keys = set()
+    rows = db.execute(
+        select(ProductCustomization.rendered_image_url, ProductCustomization.canvas_state)
+        .execution_options(yield_per=1000)
+    )
+    for rendered_image_url, canvas_state in rows:
+        key = _design_key(rendered_image_url)
+        if key:
+            keys.add(key)
+        if canvas_state:
+            text = canvas_state if isinstance(canvas_state, str) else json.dumps(canvas_state)
+            keys.update(_DESIGN_KEY.findall(text))
+    db.rollback()
+    return keys
+
+
+def delete_unreferenced_design_files(
+    db: Session, metrics: Dict[str, Any], dry_run: bool, batch_size: int, pause_seconds: float
+) -> None:
+    """
+    Delete design files (e.g. AI images that were never saved into a
+    customization) that no customization references, once they are older
+    than CLEANUP_CUSTOMIZATION_MAX_AGE_DAYS.
+    """
+    root = _design_path(DESIGN_PREFIX.rstrip("/"))
+    if not os.path.isdir(root):
+        return
+    bucket_dir = os.path.join(local_s3.LOCAL_STORAGE_DIR, DESIGN_BUCKET)
+    cutoff = time.time() - settings.CLEANUP_CUSTOMIZATION_MAX_AGE_DAYS * 86400
+    referenced = _referenced_design_keys(db)
+
+    batch: List[str] = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            key = os.path.relpath(path, bucket_dir).replace(os.sep, "/")
+            try:
+                if key in referenced or os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            batch.append(path)
+            if len(batch) >= batch_size:
+                _delete_file_batch(batch, metrics, dry_run)
+                batch = []
+                _pause(pause_seconds)
+    if batch:
+        _delete_file_batch(batch, metrics, dry_run)
+
+
+def _delete_file_batch(paths: List[str], metrics: Dict[str, Any], dry_run: bool) -> None:
+    metrics["batches"] += 1
+    if dry_run:
+        metrics["files"] += len(paths)
+        metrics["bytes"] += sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        return
+    for path in paths:
+        _remove_file(path, metrics)
+
+
+def run_cleanup(
+    dry_run: bool = False,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    include_files: bool = True,
+) -> Dict[str, Any]:
+    """
+    Delete abandoned carts, orphaned customizations and unreferenced design
+    files in bounded batches. With `dry_run` nothing is deleted and the
+    counts are what would be. Returns the run's metrics.
+
+    Runs as a periodic background task (CLEANUP_INTERVAL_SECONDS); see
+    scripts/cleanup_stale_rows.py for manual runs.
+    """
+    batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+    pause_seconds = settings.CLEANUP_BATCH_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    metrics = {
+        "dry_run": dry_run,
+        "carts": 0,
+        "cart_items": 0,
+        "customizations": 0,
+        "files": 0,
+        "bytes": 0,
+        "file_errors": 0,
+        "batches": 0,
+    }
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        # Carts go first: the customizations they held become orphans in the same run
+        delete_stale_carts(db, metrics, dry_run, batch_size, pause_seconds)
+        delete_orphaned_customizations(db, metrics, dry_run, batch_size, pause_seconds)
+        if include_files:
+            delete_unreferenced_design_files(db, metrics, dry_run, batch_size, pause_seconds)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    metrics["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+    logger.info(
+        f"Cleanup{' (dry run)' if dry_run else ''}: {metrics['carts']} cart(s) with {metrics['cart_items']} item(s), "
+        f"{metrics['customizations']} customization(s), {metrics['files']} file(s) ({metrics['bytes']} bytes) "
+        f"in {metrics['batches']} batch(es), {metrics['duration_seconds']}s"
+    )
+    return metrics
@@ -0,0 +1,278 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import (
+    FrequentlyBoughtTogether, JobState, Order, OrderItem, OrderStatus, ProductCoPurchase,
+)
+from app.services import catalog_cache
+from app.services.job_state import lock_job_state
+import heapq
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "co_purchases"
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Rows per multi-row INSERT / products re-ranked per query
+WRITE_BATCH_SIZE = 1000
+RANK_BATCH_SIZE = 500
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def cosine(pair_count: int, count_a: int, count_b: int, total_orders: int) -> float:
+    return pair_count / math.sqrt(count_a * count_b)
+
+
+def lift(pair_count: int, count_a: int, count_b: int, total_orders: int) -> float:
+    return pair_count * total_orders / (count_a * count_b)
+
+
+SCORES = {"cosine": cosine, "lift": lift}
+
+
+def _add_counts(db: Session, increments: Dict[Tuple[int, int], int]) -> None:
+    """Add pair increments to product_co_purchases. Does not commit."""
+    rows = [
+        {"product_id": a, "other_product_id": b, "orders_count": n}
+        for (a, b), n in sorted(increments.items())
+    ]
+    table = ProductCoPurchase.__table__
+    upsert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        batch = rows[start:start + WRITE_BATCH_SIZE]
+        if upsert is not None:
+            statement = upsert(ProductCoPurchase).values(batch)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.product_id, table.c.other_product_id],
+                set_={"orders_count": table.c.orders_count + statement.excluded.orders_count},
+            ))
+            continue
+
+        # Generic fallback: increment, and create the rows that were missing
+        for row in batch:
+            incremented = db.execute(
+                update(ProductCoPurchase)
+                .where(
+                    ProductCoPurchase.product_id == row["product_id"],
+                    ProductCoPurchase.other_product_id == row["other_product_id"],
+                )
+                .values(orders_count=ProductCoPurchase.orders_count + row["orders_count"])
+                .execution_options(synchronize_session=False)
+            )
+            if incremented.rowcount == 0:
+                db.execute(insert(ProductCoPurchase), [row])
+
+
+def _baskets(db: Session, order_ids: List[int]) -> Iterable[List[int]]:
+    """Distinct product ids of each (non-cancelled) order, one order at a time."""
+    rows = db.execute(
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(OrderItem.order_id.in_(order_ids), Order.status != OrderStatus.CANCELLED)
+        .order_by(OrderItem.order_id, OrderItem.id)
+    )
+    current_order, basket = None, []
+    for order_id, product_id in rows:
+        if order_id != current_order:
+            if basket:
+                yield basket
+            current_order, basket = order_id, []
+        if product_id not in basket and len(basket) < settings.CO_PURCHASE_MAX_BASKET_PRODUCTS:
+            basket.append(product_id)
+    if basket:
+        yield basket
+
+
+def _count_chunk(db: Session, state: JobState, chunk_size: int) -> Optional[Set[int]]:
+    """
+    Count the next chunk of orders after the watermark into the pair table
+    and advance the watermark. Returns the products whose counts changed,
+    or None when there are no settled orders left. Does not commit.
+    """
+    settled_before = _utcnow() - timedelta(seconds=settings.CO_PURCHASE_SETTLE_SECONDS)
+    order_ids = db.scalars(
+        select(Order.id)
+        .where(Order.id > state.last_id, Order.created_at <= settled_before)
+        .order_by(Order.id)
+        .limit(chunk_size)
+    ).all()
+    if not order_ids:
+        return None
+
+    increments: Dict[Tuple[int, int], int] = defaultdict(int)
+    touched: Set[int] = set()
+    baskets = 0
+    for basket in _baskets(db, order_ids):
+        baskets += 1
+        touched.update(basket)
+        # Both directions, plus the diagonal (orders containing the product)
+        for a in basket:
+            for b in basket:
+                increments[(a, b)] += 1
+        if len(increments) >= settings.CO_PURCHASE_MAX_PENDING_PAIRS:
+            _add_counts(db, increments)
+            increments.clear()
+    _add_counts(db, increments)
+
+    state.last_id = order_ids[-1]
+    state.processed_count += baskets
+    return touched
+
+
+def rank_products(db: Session, product_ids: Iterable[int], total_orders: int) -> int:
+    """
+    Recompute the frequently bought together list of the given products
+    from the pair counts. Returns the number of rows written. Does not commit.
+    """
+    score = SCORES.get(settings.CO_PURCHASE_SCORE, cosine)
+    pair = aliased(ProductCoPurchase)
+    own = aliased(ProductCoPurchase)
+    other = aliased(ProductCoPurchase)
+    product_ids = sorted(product_ids)
+    written = 0
+
+    for start in range(0, len(product_ids), RANK_BATCH_SIZE):
+        batch = product_ids[start:start + RANK_BATCH_SIZE]
+        rows = db.execute(
+            select(pair.product_id, pair.other_product_id, pair.orders_count, own.orders_count, other.orders_count)
+            .join(own, and_(own.product_id == pair.product_id, own.other_product_id == pair.product_id))
+            .join(other, and_(other.product_id == pair.other_product_id, other.other_product_id == pair.other_product_id))
+            .where(
+                pair.product_id.in_(batch),
+                pair.other_product_id != pair.product_id,
+                pair.orders_count >= settings.CO_PURCHASE_MIN_SUPPORT,
+            )
+        )
+        candidates: Dict[int, List[Tuple[float, int, int]]] = defaultdict(list)
+        for product_id, other_id, pair_count, own_count, other_count in rows:
+            candidates[product_id].append(
+                (score(pair_count, own_count, other_count, total_orders), pair_count, other_id)
+            )
+
+        db.execute(
+            delete(FrequentlyBoughtTogether)
+            .where(FrequentlyBoughtTogether.product_id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        top = [
+            {
+                "product_id": product_id,
+                "rank": rank,
+                "related_product_id": other_id,
+                "score": round(value, 6),
+                "orders_count": pair_count,
+            }
+            for product_id, scored in candidates.items()
+            for rank, (value, pair_count, other_id) in enumerate(
+                heapq.nlargest(settings.CO_PURCHASE_TOP_K, scored), start=1
+            )
+        ]
+        if top:
+            db.execute(insert(FrequentlyBoughtTogether), top)
+        written += len(top)
+    return written
+
+
+def update_co_purchases(chunk_size: Optional[int] = None, max_chunks: Optional[int] = None) -> int:
+    """
+    Fold orders placed since the last run into the co-purchase counts and
+    re-rank the products they contain.
+
+    Orders are streamed in chunks of CO_PURCHASE_CHUNK_ORDERS by id after
+    the watermark in job_state; each chunk's counts, re-ranking and new
+    watermark are committed together, so an interrupted run resumes where
+    it stopped without double counting. Memory is bounded by the chunk
+    and CO_PURCHASE_MAX_PENDING_PAIRS. Orders cancelled before they are
+    counted are skipped; later cancellations are not subtracted.
+
+    Returns the number of orders counted. Runs as a periodic background
+    task (CO_PURCHASE_INTERVAL_SECONDS).
+    """
+    chunk_size = chunk_size or settings.CO_PURCHASE_CHUNK_ORDERS
+    started = time.perf_counter()
+    counted = chunks = 0
+    db = SessionLocal()
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            state = lock_job_state(db, JOB_NAME)
+            if state is None:
+                logger.info("Co-purchase job is already running in another worker")
+                break
+            processed_before = state.processed_count
+            touched = _count_chunk(db, state, chunk_size)
+            if touched is None:
+                db.rollback()
+                break
+            rank_products(db, touched, state.processed_count)
+            counted += state.processed_count - processed_before
+            db.commit()
+            chunks += 1
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if chunks:
+        catalog_cache.bought_together.invalidate_all()
+        logger.info(f"Counted co-purchases of {counted} order(s) in {chunks} chunk(s) in {time.perf_counter() - started:.1f}s")
+    return counted
+
+
+def rerank_all() -> int:
+    """
+    Re-rank every product from the current counts. Incremental runs only
+    re-rank products in new orders, so other products' scores drift as
+    the totals they are normalized by change. Returns rows written.
+    """
+    db = SessionLocal()
+    try:
+        state = lock_job_state(db, JOB_NAME)
+        if state is None:
+            raise RuntimeError("Co-purchase job is running in another worker")
+        product_ids = db.scalars(
+            select(ProductCoPurchase.product_id)
+            .where(ProductCoPurchase.product_id == ProductCoPurchase.other_product_id)
+        ).all()
+        db.execute(delete(FrequentlyBoughtTogether))
+        written = rank_products(db, product_ids, state.processed_count)
+        db.commit()
+    finally:
+        db.close()
+    catalog_cache.bought_together.invalidate_all()
+    return written
+
+
+def reset_co_purchases() -> None:
+    """Drop all counts and rankings and rewind the watermark, for a full rebuild."""
+    db = SessionLocal()
+    try:
+        state = lock_job_state(db, JOB_NAME)
+        if state is None:
+            raise RuntimeError("Co-purchase job is running in another worker")
+        db.execute(delete(FrequentlyBoughtTogether))
+        db.execute(delete(ProductCoPurchase))
+        state.last_id = 0
+        state.processed_count = 0
+        db.commit()
+    finally:
+        db.close()
+    catalog_cache.bought_together.invalidate_all()
+
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import List, Optional
+from sqlalchemy import select, update
+from app.core.async_database import AsyncSessionLocal
+from app.core.config import settings
+from app.models.models import EmailOutbox, EmailOutboxStatus
+import aiosmtplib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base, ... capped at the max."""
+    seconds = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def build_message(row: EmailOutbox) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = row.recipient
+    message["Subject"] = row.subject
+    message.set_content(row.html_body, subtype="html")
+    return message
+
+
+async def claim_batch(batch_size: int) -> List[EmailOutbox]:
+    """
+    Claim up to `batch_size` due emails.
+
+    Claimed rows get their attempt counted and next_attempt_at pushed out
+    by EMAIL_OUTBOX_LEASE_SECONDS before the SMTP work starts, so no
+    transaction is held open while talking to the mail server and a
+    crashed worker's rows are retried once the lease runs out. SKIP LOCKED
+    lets several workers drain the table concurrently on PostgreSQL.
+    """
+    now = _utcnow()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(
+            select(EmailOutbox)
+            .where(
+                EmailOutbox.status == EmailOutboxStatus.PENDING,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        await db.commit()
+    return list(rows)
+
+
+async def _open_connection() -> aiosmtplib.SMTP:
+    smtp = aiosmtplib.SMTP(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        use_tls=settings.MAIL_SSL_TLS,
+        start_tls=settings.MAIL_STARTTLS,
+        validate_certs=settings.VALIDATE_CERTS,
+    )
+    await smtp.connect()
+    if settings.USE_CREDENTIALS:
+        await smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD.get_secret_value())
+    return smtp
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies (unknown mailbox, rejected content) will not succeed on retry
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+
+
+async def _record_results(sent: List[int], failed: List[tuple]) -> None:
+    now = _utcnow()
+    async with AsyncSessionLocal() as db:
+        if sent:
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(sent))
+                .values(status=EmailOutboxStatus.SENT, sent_at=now, last_error=None)
+            )
+        for row, error in failed:
+            give_up = _is_permanent(error) or row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == row.id)
+                .values(
+                    status=EmailOutboxStatus.FAILED if give_up else EmailOutboxStatus.PENDING,
+                    next_attempt_at=now + retry_delay(row.attempts),
+                    last_error=str(error)[:2000],
+                )
+            )
+            if give_up:
+                logger.error(f"Giving up on email {row.id} to {row.recipient} after {row.attempts} attempt(s): {error}")
+        await db.commit()
+
+
+async def deliver_pending_emails(batch_size: Optional[int] = None) -> int:
+    """
+    Send one batch of due emails over a single SMTP connection.
+
+    Returns the number sent. Failures are rescheduled with exponential
+    backoff and marked failed after EMAIL_OUTBOX_MAX_ATTEMPTS attempts or
+    a permanent (5xx) rejection.
+    """
+    rows = await claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    sent: List[int] = []
+    failed: List[tuple] = []
+    try:
+        smtp = await _open_connection()
+    except Exception as e:
+        logger.warning(f"Email outbox could not connect to {settings.MAIL_SERVER}:{settings.MAIL_PORT}: {e}")
+        await _record_results([], [(row, e) for row in rows])
+        return 0
+
+    try:
+        for index, row in enumerate(rows):
+            try:
+                await smtp.send_message(build_message(row))
+                sent.append(row.id)
+            except aiosmtplib.SMTPServerDisconnected as e:
+                # The connection is gone: reschedule the rest of the batch
+                # instead of trying each remaining message on it
+                failed.extend((pending, e) for pending in rows[index:])
+                break
+            except Exception as e:
+                failed.append((row, e))
+    finally:
+        try:
+            await smtp.quit()
+        except Exception:
+            pass
+        await _record_results(sent, failed)
+
+    logger.info(f"Email outbox: sent {len(sent)}, failed {len(failed)}")
+    return len(sent)
+
+
+async def drain_outbox() -> int:
+    """Send batches until nothing is due; used as the periodic worker job."""
+    total = 0
+    while True:
+        sent = await deliver_pending_emails()
+        total += sent
+        if sent < settings.EMAIL_OUTBOX_BATCH_SIZE:
+            return total
@@ -0,0 +1,328 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from sqlalchemy import select
+from app.core.cache import LRUTTLCache, MISSING
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud.crud_cart import cart as crud_cart, cart_item as crud_cart_item
+from app.models.models import Product
+from app.schemas.cart import CartItemCreate
+import re
+import secrets
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tokens are generated by new_token(); anything else is rejected before it
+# reaches a store key
+_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+# Attempts at a Redis WATCH/MULTI transaction before giving up when the
+# cart keeps changing underneath it
+TRANSACTION_RETRIES = 5
+
+
+class GuestCartUnavailable(Exception):
+    """The guest cart store could not be reached."""
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(24)
+
+
+def is_valid_token(token: Optional[str]) -> bool:
+    return bool(token) and bool(_TOKEN_PATTERN.match(token))
+
+
+class GuestCartStore:
+    """
+    Anonymous carts keyed by a client-held token.
+
+    A cart is a map of product id to quantity (customizations belong to
+    user accounts, so guests can only add plain products). Every write
+    pushes the cart's expiry GUEST_CART_TTL_SECONDS into the future.
+    Mirrors the CRUDCartItem operations without touching the database.
+    """
+
+    name = "base"
+
+    def get_items(self, token: str) -> Dict[int, int]:
+        raise NotImplementedError
+
+    def add_items(self, token: str, quantities: Dict[int, int], check_size: bool = True) -> Dict[int, int]:
+        """
+        Increment the given products' quantities; returns the whole cart.
+        The size check and the increments are atomic.
+        """
+        raise NotImplementedError
+
+    def take_items(self, token: str) -> Dict[int, int]:
+        """
+        Remove the cart and return its items in one atomic step, so of two
+        concurrent callers only one gets them.
+        """
+        raise NotImplementedError
+
+    def update_item(self, token: str, product_id: int, quantity: int) -> bool:
+        """Set a product's quantity; False if it isn't in the cart."""
+        raise NotImplementedError
+
+    def remove_item(self, token: str, product_id: int) -> bool:
+        raise NotImplementedError
+
+    def clear(self, token: str) -> None:
+        raise NotImplementedError
+
+    def _check_size(self, current: Iterable[int], quantities: Dict[int, int]) -> None:
+        if len(set(current) | set(quantities)) > settings.GUEST_CART_MAX_ITEMS:
+            raise ValueError(f"A guest cart can hold at most {settings.GUEST_CART_MAX_ITEMS} products")
+
+
+class MemoryGuestCartStore(GuestCartStore):
+    """Per-process store; carts are lost on restart and not shared between workers."""
+
+    name = "memory"
+
+    def __init__(self, max_carts: int, ttl_seconds: float):
+        self._carts = LRUTTLCache(max_entries=max_carts, ttl_seconds=ttl_seconds, name="guest_carts")
+        self._lock = threading.Lock()
+
+    def _get(self, token: str) -> Dict[int, int]:
+        items = self._carts.get(token)
+        return {} if items is MISSING else dict(items)
+
+    def get_items(self, token: str) -> Dict[int, int]:
+        return self._get(token)
+
+    def add_items(self, token: str, quantities: Dict[int, int], check_size: bool = True) -> Dict[int, int]:
+        with self._lock:
+            items = self._get(token)
+            if check_size:
+                self._check_size(items, quantities)
+            for product_id, quantity in quantities.items():
+                items[product_id] = items.get(product_id, 0) + quantity
+            self._carts.set(token, items)
+            return dict(items)
+
+    def take_items(self, token: str) -> Dict[int, int]:
+        with self._lock:
+            items = self._get(token)
+            self._carts.delete(token)
+            return items
+
+    def update_item(self, token: str, product_id: int, quantity: int) -> bool:
+        with self._lock:
+            items = self._get(token)
+            if product_id not in items:
+                return False
+            items[product_id] = quantity
+            self._carts.set(token, items)
+            return True
+
+    def remove_item(self, token: str, product_id: int) -> bool:
+        with self._lock:
+            items = self._get(token)
+            if items.pop(product_id, None) is None:
+                return False
+            self._carts.set(token, items)
+            return True
+
+    def clear(self, token: str) -> None:
+        self._carts.delete(token)
+
+
+class RedisGuestCartStore(GuestCartStore):
+    """
+    One Redis hash per cart (field = product id, value = quantity), so adds
+    are HINCRBY. Writes that depend on what is already in the cart run as
+    WATCH/MULTI transactions, retried when the cart changes in between;
+    everything else is a single pipelined round trip.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds or settings.GUEST_CART_TTL_SECONDS)
+
+    def _key(self, token: str) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:guest_cart:{token}"
+
+    def _execute(self, operation: str, pipeline: Any) -> List[Any]:
+        try:
+            return pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Guest cart {operation} failed: {str(e)}")
+            raise GuestCartUnavailable(str(e)) from e
+
+    @staticmethod
+    def _decode(fields: Dict[Any, Any]) -> Dict[int, int]:
+        return {int(product_id): int(quantity) for product_id, quantity in (fields or {}).items()}
+
+    def _transaction(self, operation: str, key: str, queue: Callable[[Any], Any]) -> Optional[List[Any]]:
+        """
+        Run `queue(pipeline)` with `key` watched: it reads the cart
+        (commands run immediately), then calls pipeline.multi() and queues
+        the writes, or returns False to write nothing. Returns the
+        transaction's results, or None when nothing was written.
+        """
+        from redis.exceptions import WatchError
+
+        for _ in range(TRANSACTION_RETRIES):
+            try:
+                with self.client.pipeline() as pipeline:
+                    pipeline.watch(key)
+                    if queue(pipeline) is False:
+                        return None
+                    return pipeline.execute()
+            except WatchError:
+                continue
+            except ValueError:
+                raise
+            except Exception as e:
+                logger.warning(f"Guest cart {operation} failed: {str(e)}")
+                raise GuestCartUnavailable(str(e)) from e
+        logger.warning(f"Guest cart {operation} gave up after {TRANSACTION_RETRIES} conflicting writes")
+        raise GuestCartUnavailable("The cart is being changed concurrently")
+
+    def get_items(self, token: str) -> Dict[int, int]:
+        key = self._key(token)
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(key)
+        pipeline.expire(key, self.ttl_seconds)
+        fields, _ = self._execute("read", pipeline)
+        return self._decode(fields)
+
+    def add_items(self, token: str, quantities: Dict[int, int], check_size: bool = True) -> Dict[int, int]:
+        key = self._key(token)
+
+        def queue(pipeline: Any) -> None:
+            if check_size:
+                self._check_size((int(product_id) for product_id in pipeline.hkeys(key)), quantities)
+            pipeline.multi()
+            for product_id, quantity in quantities.items():
+                pipeline.hincrby(key, str(product_id), quantity)
+            pipeline.expire(key, self.ttl_seconds)
+            pipeline.hgetall(key)
+
+        return self._decode(self._transaction("add", key, queue)[-1])
+
+    def take_items(self, token: str) -> Dict[int, int]:
+        key = self._key(token)
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hgetall(key)
+        pipeline.delete(key)
+        fields, _ = self._execute("take", pipeline)
+        return self._decode(fields)
+
+    def update_item(self, token: str, product_id: int, quantity: int) -> bool:
+        key = self._key(token)
+
+        def queue(pipeline: Any) -> Optional[bool]:
+            if not pipeline.hexists(key, str(product_id)):
+                return False
+            pipeline.multi()
+            pipeline.hset(key, str(product_id), quantity)
+            pipeline.expire(key, self.ttl_seconds)
+            return None
+
+        return self._transaction("update", key, queue) is not None
+
+    def remove_item(self, token: str, product_id: int) -> bool:
+        key = self._key(token)
+        pipeline = self.client.pipeline()
+        pipeline.hdel(key, str(product_id))
+        pipeline.expire(key, self.ttl_seconds)
+        removed, _ = self._execute("remove", pipeline)
+        return bool(removed)
+
+    def clear(self, token: str) -> None:
+        pipeline = self.client.pipeline()
+        pipeline.delete(self._key(token))
+        self._execute("clear", pipeline)
+
+
+_store: Optional[GuestCartStore] = None
+_store_lock = threading.Lock()
+
+
+def create_store(kind: Optional[str] = None, client: Any = None) -> GuestCartStore:
+    """Build the store selected by GUEST_CART_BACKEND ("memory" or "redis")."""
+    kind = (kind or settings.GUEST_CART_BACKEND).lower()
+    if kind == "redis":
+        return RedisGuestCartStore(client=client)
+    if kind != "memory":
+        logger.warning(f"Unknown GUEST_CART_BACKEND {kind!r}; using in-memory guest carts")
+    return MemoryGuestCartStore(
+        max_carts=settings.GUEST_CART_MEMORY_MAX_CARTS,
+        ttl_seconds=settings.GUEST_CART_TTL_SECONDS,
+    )
+
+
+def get_store() -> GuestCartStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def set_store(store: Optional[GuestCartStore]) -> None:
+    """Swap the process-wide store (e.g. a fake Redis in tests); None resets it."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def _put_back(store: GuestCartStore, token: str, items: Dict[int, int]) -> None:
+    """Return the items of a failed merge to the guest cart (adding to anything added since)."""
+    try:
+        store.add_items(token, items, check_size=False)
+    except Exception as e:
+        logger.warning(f"Could not restore guest cart after a failed merge: {str(e)}")
+
+
+def merge_into_user_cart(user_id: int, token: str) -> int:
+    """
+    Move a guest cart into the user's persistent cart: every line is added
+    with one batched upsert (quantities add up with lines already in the
+    cart). Products deleted since they were added are skipped. Returns the
+    number of lines merged.
+
+    The guest cart is taken out of the store before merging, so a login
+    and a /cart/merge racing on the same token merge it only once; if the
+    merge fails the items are put back for a retry.
+    """
+    if not is_valid_token(token):
+        return 0
+    store = get_store()
+    items = store.take_items(token)
+    if not items:
+        return 0
+
+    db = SessionLocal()
+    try:
+        existing = set(db.scalars(select(Product.id).where(Product.id.in_(items))))
+        lines = [
+            CartItemCreate(product_id=product_id, quantity=quantity)
+            for product_id, quantity in items.items()
+            if product_id in existing and quantity > 0
+        ]
+        if lines:
+            cart_id = crud_cart.get_or_create_cart_id(db, user_id=user_id)
+            crud_cart_item.add_items(db, cart_id=cart_id, items=lines)
+            db.commit()
+    except Exception:
+        db.rollback()
+        _put_back(store, token, items)
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Merged {len(lines)} guest cart line(s) into the cart of user {user_id}")
+    return len(lines)
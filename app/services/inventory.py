@@ -0,0 +1,224 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core import replicas
+from app.core.async_database import AsyncSessionLocal
+from app.core.config import settings
+from app.models.models import InventoryReservation, Product, ReservationStatus
+from app.services import catalog_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Session.info key collecting the products whose stock changed
+_CHANGED_PRODUCTS = "inventory_changed_products"
+
+
+class InsufficientStockError(Exception):
+    """Raised by reserve() when some products do not have enough stock."""
+
+    def __init__(self, product_ids: List[int]):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for products: {product_ids}")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _sum_quantities(rows: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    totals: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in rows:
+        totals[product_id] += quantity
+    return dict(totals)
+
+
+def _note_changed(db: AsyncSession, product_ids: Iterable[int]) -> None:
+    db.info.setdefault(_CHANGED_PRODUCTS, set()).update(product_ids)
+
+
+async def invalidate_cached_stock(db: AsyncSession) -> None:
+    """
+    Drop the cached details of products whose stock or sales count this
+    session changed. Call after committing the session. The cache may be
+    Redis, so this runs in the threadpool.
+    """
+    product_ids = db.info.pop(_CHANGED_PRODUCTS, None)
+    if product_ids:
+        await run_in_threadpool(_invalidate_products, product_ids)
+
+
+def _invalidate_products(product_ids: Iterable[int]) -> None:
+    replicas.note_write()
+    catalog_cache.invalidate_products(product_ids)
+
+
+async def _adjust_products(db: AsyncSession, quantities: Dict[int, int], stock_sign: int, sales_sign: int = 0) -> None:
+    """Add `quantities` (times the signs) to stock and sales_count in one UPDATE."""
+    if not quantities:
+        return
+    _note_changed(db, quantities)
+    amount = case(quantities, value=Product.id)
+    values = {}
+    if stock_sign:
+        values["stock"] = Product.stock + stock_sign * amount
+    if sales_sign:
+        values["sales_count"] = Product.sales_count + sales_sign * amount
+    await db.execute(
+        update(Product)
+        .where(Product.id.in_(quantities))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reserve(db: AsyncSession, order_id: int, quantities: Dict[int, int]) -> None:
+    """
+    Take stock for an order and record the reservations.
+
+    All products are decremented with one conditional UPDATE that only
+    matches rows with enough stock, so the check and decrement happen
+    under the same row lock and concurrent checkouts cannot oversell.
+    Raises InsufficientStockError (nothing is reserved) if any product is
+    short; the caller's transaction should then be rolled back.
+    Does not commit; call invalidate_cached_stock() after committing.
+    """
+    amount = case(quantities, value=Product.id)
+    updated = (await db.execute(
+        update(Product)
+        .where(Product.id.in_(quantities), Product.stock >= amount)
+        .values(stock=Product.stock - amount)
+        .returning(Product.id, Product.name, Product.stock, Product.low_stock_threshold)
+        .execution_options(synchronize_session=False)
+    )).all()
+
+    short = sorted(set(quantities) - {row.id for row in updated})
+    if short:
+        raise InsufficientStockError(short)
+    _note_changed(db, quantities)
+
+    for row in updated:
+        if row.stock <= row.low_stock_threshold:
+            logger.warning(
+                f"Low stock: product {row.id} ({row.name}) has {row.stock} left "
+                f"(threshold {row.low_stock_threshold})"
+            )
+
+    expires_at = _utcnow() + timedelta(minutes=settings.INVENTORY_RESERVATION_TTL_MINUTES)
+    await db.execute(
+        insert(InventoryReservation),
+        [
+            {
+                "product_id": product_id,
+                "order_id": order_id,
+                "quantity": quantity,
+                "status": ReservationStatus.ACTIVE,
+                "expires_at": expires_at,
+            }
+            for product_id, quantity in quantities.items()
+        ],
+    )
+
+
+async def commit_for_order(db: AsyncSession, order_id: int) -> int:
+    """
+    Make an order's reservations final (payment received or order being
+    fulfilled) and count the sale. Reservations the sweeper expired in the
+    meantime take their stock again, since the sale goes ahead; stock can
+    then go negative, which is logged. Returns the number of units
+    committed. Does not commit; call invalidate_cached_stock() after
+    committing.
+    """
+    committed = 0
+    for from_status, stock_sign in ((ReservationStatus.ACTIVE, 0), (ReservationStatus.EXPIRED, -1)):
+        rows = (await db.execute(
+            update(InventoryReservation)
+            .where(InventoryReservation.order_id == order_id, InventoryReservation.status == from_status)
+            .values(status=ReservationStatus.COMMITTED, updated_at=_utcnow())
+            .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+            .execution_options(synchronize_session=False)
+        )).all()
+        quantities = _sum_quantities(rows)
+        await _adjust_products(db, quantities, stock_sign=stock_sign, sales_sign=1)
+        if stock_sign and quantities:
+            oversold = (await db.execute(
+                select(Product.id, Product.stock).where(Product.id.in_(quantities), Product.stock < 0)
+            )).all()
+            for row in oversold:
+                logger.warning(f"Oversold: product {row.id} has {row.stock} in stock after order {order_id} was paid late")
+        committed += sum(quantities.values())
+    return committed
+
+
+async def release_for_order(
+    db: AsyncSession,
+    order_id: int,
+    status: ReservationStatus = ReservationStatus.RELEASED,
+    include_committed: bool = True,
+) -> int:
+    """
+    Return an order's reserved stock, e.g. when it is cancelled or deleted.
+
+    Active reservations give their stock back; committed ones also undo
+    the sale count, unless `include_committed` is False (customer-facing
+    cancellations must never restock a paid or fulfilled sale). The status
+    filter makes this safe to run twice or concurrently with the sweeper.
+    Returns the number of units released. Does not commit; call
+    invalidate_cached_stock() after committing.
+    """
+    transitions = [(ReservationStatus.ACTIVE, 0)]
+    if include_committed:
+        transitions.append((ReservationStatus.COMMITTED, -1))
+    released = 0
+    for from_status, sales_sign in transitions:
+        rows = (await db.execute(
+            update(InventoryReservation)
+            .where(InventoryReservation.order_id == order_id, InventoryReservation.status == from_status)
+            .values(status=status, updated_at=_utcnow())
+            .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+            .execution_options(synchronize_session=False)
+        )).all()
+        quantities = _sum_quantities(rows)
+        await _adjust_products(db, quantities, stock_sign=1, sales_sign=sales_sign)
+        released += sum(quantities.values())
+    return released
+
+
+async def sweep_expired(batch_size: Optional[int] = None) -> int:
+    """
+    Release active reservations past their expiry, returning their stock.
+    Returns the number of reservations expired.
+
+    Orders are left as they are: payment is only confirmed by an admin, so
+    an order whose hold expired can still be paid, and commit_for_order
+    then takes the stock again.
+
+    Runs as a periodic background task (INVENTORY_SWEEP_INTERVAL_SECONDS).
+    """
+    batch_size = batch_size or settings.INVENTORY_SWEEP_BATCH_SIZE
+    now = _utcnow()
+    async with AsyncSessionLocal() as db:
+        expired_ids = select(InventoryReservation.id).where(
+            InventoryReservation.status == ReservationStatus.ACTIVE,
+            InventoryReservation.expires_at <= now,
+        ).limit(batch_size).scalar_subquery()
+        rows = (await db.execute(
+            update(InventoryReservation)
+            .where(InventoryReservation.id.in_(expired_ids), InventoryReservation.status == ReservationStatus.ACTIVE)
+            .values(status=ReservationStatus.EXPIRED, updated_at=now)
+            .returning(InventoryReservation.order_id, InventoryReservation.product_id, InventoryReservation.quantity)
+            .execution_options(synchronize_session=False)
+        )).all()
+        if not rows:
+            return 0
+
+        await _adjust_products(db, _sum_quantities((row.product_id, row.quantity) for row in rows), stock_sign=1)
+        await db.commit()
+        await invalidate_cached_stock(db)
+
+    order_ids = {row.order_id for row in rows if row.order_id is not None}
+    logger.info(f"Released {len(rows)} expired reservation(s) for {len(order_ids)} order(s)")
+    return len(rows)
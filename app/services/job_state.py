@@ -0,0 +1,26 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import JobState
+
+
+def lock_job_state(db: Session, name: str) -> Optional[JobState]:
+    """
+    Lock the job's state row for this transaction, creating it on first
+    use; None if another worker holds it (that worker is already running
+    the job). The lock is released when the transaction ends, so callers
+    do all of the job's writes before committing.
+    """
+    if db.get(JobState, name) is None:
+        db.add(JobState(name=name, last_id=0, processed_count=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    return db.scalars(
+        select(JobState)
+        .where(JobState.name == name)
+        .with_for_update(skip_locked=True)
+        .execution_options(populate_existing=True)
+    ).first()
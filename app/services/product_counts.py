@@ -0,0 +1,115 @@
+from typing import Any, Optional, Tuple
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import MISSING, VersionedCache, dumps
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCountCache:
+    """
+    Product listing totals keyed by a normalized filter signature.
+
+    Totals live in the shared cache backend under the "product_counts"
+    namespace, so invalidate() (a version bump) drops them in every worker
+    at once, not only in the one that wrote the product.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._cache = VersionedCache("product_counts", ttl_seconds)
+
+    @staticmethod
+    def _key(signature: Tuple) -> str:
+        return dumps(signature)
+
+    def get(self, signature: Tuple) -> Optional[int]:
+        total = self._cache.get(self._key(signature))
+        return None if total is MISSING else total
+
+    def set(self, signature: Tuple, total: int) -> None:
+        self._cache.set(self._key(signature), total)
+
+    def invalidate(self) -> None:
+        self._cache.invalidate_all()
+
+
+count_cache = ProductCountCache(ttl_seconds=settings.PRODUCT_COUNT_CACHE_TTL_SECONDS)
+
+
+def filter_signature(**filters: Any) -> Tuple:
+    """
+    Normalize listing filters into a hashable cache key.
+
+    Search terms are case-folded (the search filter is case-insensitive),
+    enums are reduced to their values and unset filters are dropped, so
+    equivalent requests share one cached total.
+    """
+    normalized = []
+    for name in sorted(filters):
+        value = filters[name]
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.lower()
+            if not value:
+                continue
+        elif hasattr(value, "value"):
+            value = value.value
+        elif isinstance(value, float):
+            value = round(value, 2)
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+def _known_total(signature: Tuple, page_size: Optional[int], limit: Optional[int], skip: int) -> Optional[int]:
+    """Total derivable from the page itself or the cache, or None if a COUNT is needed."""
+    if page_size is not None and page_size < limit and (page_size > 0 or skip == 0):
+        total = skip + page_size
+        count_cache.set(signature, total)
+        return total
+    return count_cache.get(signature)
+
+
+def resolve_total(query, signature: Tuple, page_size: Optional[int] = None,
+                  limit: Optional[int] = None, skip: int = 0) -> int:
+    """
+    Return the total number of rows matched by `query`.
+
+    1. A short page (fewer rows than `limit`) starting at offset `skip` means
+       the result set ends on this page, so the total is known exactly
+       without a COUNT. Pass page_size=None when the page position is not
+       an offset (e.g. a cursor page) to skip this shortcut.
+    2. Otherwise a cached total for the same filter signature is reused.
+    3. Only on a miss is the COUNT query run, and its result cached.
+    """
+    total = _known_total(signature, page_size, limit, skip)
+    if total is not None:
+        return total
+
+    total = query.count()
+    count_cache.set(signature, total)
+    return total
+
+
+async def resolve_total_async(db, statement, signature: Tuple, page_size: Optional[int] = None,
+                              limit: Optional[int] = None, skip: int = 0) -> int:
+    """
+    resolve_total() for a select() statement executed on an AsyncSession.
+    The count cache may be Redis, so its calls run in the threadpool.
+    """
+    total = await run_in_threadpool(_known_total, signature, page_size, limit, skip)
+    if total is not None:
+        return total
+
+    total = await db.scalar(select(func.count()).select_from(statement.order_by(None).subquery()))
+    await run_in_threadpool(count_cache.set, signature, total)
+    return total
+
+
+def invalidate() -> None:
+    """Drop cached totals; called from every endpoint that writes products."""
+    count_cache.invalidate()
+    logger.debug("Product count cache invalidated")
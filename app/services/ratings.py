@@ -0,0 +1,221 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, exists, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import Product, ProductRatingStats, Review
+from app.services import catalog_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAR_COLUMNS = {stars: f"stars_{stars}" for stars in range(1, 6)}
+
+# Products reconciled per transaction
+RECONCILE_BATCH_SIZE = 500
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def empty_histogram() -> Dict[str, int]:
+    return {str(stars): 0 for stars in STAR_COLUMNS}
+
+
+def average(rating_sum: int, rating_count: int) -> float:
+    return round(rating_sum / rating_count, 1) if rating_count else 0.0
+
+
+def _upsert_stats(db: Session, product_id: int, rating: int) -> Tuple[int, int]:
+    """Add one rating to the product's stats row; returns the new (sum, count)."""
+    star_column = STAR_COLUMNS[rating]
+    table = ProductRatingStats.__table__
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+
+    if insert is not None:
+        statement = insert(ProductRatingStats).values(
+            product_id=product_id, rating_sum=rating, rating_count=1, **{star_column: 1}
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.product_id],
+            set_={
+                "rating_sum": table.c.rating_sum + rating,
+                "rating_count": table.c.rating_count + 1,
+                star_column: table.c[star_column] + 1,
+                "updated_at": func.now(),
+            },
+        ).returning(table.c.rating_sum, table.c.rating_count)
+        return tuple(db.execute(statement).one())
+
+    # Generic fallback: increment, and create the row if there was none
+    increment = (
+        update(ProductRatingStats)
+        .where(ProductRatingStats.product_id == product_id)
+        .values(
+            rating_sum=ProductRatingStats.rating_sum + rating,
+            rating_count=ProductRatingStats.rating_count + 1,
+            **{star_column: table.c[star_column] + 1},
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(increment).rowcount == 0:
+        db.add(ProductRatingStats(
+            product_id=product_id, rating_sum=rating, rating_count=1,
+            **{column: int(stars == rating) for stars, column in STAR_COLUMNS.items()},
+        ))
+        db.flush()
+    stats = db.get(ProductRatingStats, product_id, populate_existing=True)
+    return stats.rating_sum, stats.rating_count
+
+
+def record_rating(db: Session, product_id: int, rating: int) -> None:
+    """
+    Fold a new review's rating into the product's running totals.
+
+    The stats row is updated with a single atomic upsert, so concurrent
+    reviews serialize on that row instead of each recomputing the average
+    from every review. Product.rating and reviews_count are then set from
+    the returned totals. Does not commit.
+    """
+    rating_sum, rating_count = _upsert_stats(db, product_id, rating)
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(rating=average(rating_sum, rating_count), reviews_count=rating_count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _ensure_stats_rows(db: Session, product_ids: List[int]) -> None:
+    """Create empty stats rows for reviewed products that have none, so they can be locked."""
+    missing = db.scalars(
+        select(Review.product_id)
+        .where(
+            Review.product_id.in_(product_ids),
+            ~exists().where(ProductRatingStats.product_id == Review.product_id),
+        )
+        .distinct()
+    ).all()
+    if not missing:
+        return
+    rows = [{"product_id": product_id} for product_id in missing]
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        db.execute(insert(ProductRatingStats).values(rows).on_conflict_do_nothing(
+            index_elements=[ProductRatingStats.__table__.c.product_id]
+        ))
+    else:
+        db.add_all(ProductRatingStats(**row) for row in rows)
+        db.flush()
+
+
+def _reconcile_batch(db: Session, product_ids: List[int]) -> List[Tuple[int, str]]:
+    """
+    Reconcile the given products; returns (id, slug) of those corrected.
+    Does not commit.
+
+    The batch's stats rows are locked before the reviews are aggregated.
+    record_rating() upserts the same row first, so a review committed
+    before the lock is counted here, and one still in flight waits and
+    adds itself on top of the corrected totals.
+    """
+    _ensure_stats_rows(db, product_ids)
+    stored = {
+        stats.product_id: stats
+        for stats in db.scalars(
+            select(ProductRatingStats)
+            .where(ProductRatingStats.product_id.in_(product_ids))
+            .order_by(ProductRatingStats.product_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    }
+    if not stored:
+        return []
+    actual = {
+        row.product_id: row
+        for row in db.execute(
+            select(
+                Review.product_id,
+                func.sum(Review.rating).label("rating_sum"),
+                func.count(Review.id).label("rating_count"),
+                *(
+                    func.sum(case((Review.rating == stars, 1), else_=0)).label(column)
+                    for stars, column in STAR_COLUMNS.items()
+                ),
+            )
+            .where(Review.product_id.in_(stored))
+            .group_by(Review.product_id)
+        )
+    }
+    products = db.execute(
+        select(Product.id, Product.slug, Product.rating, Product.reviews_count).where(Product.id.in_(stored))
+    ).all()
+
+    fixed = []
+    for product in products:
+        row = actual.get(product.id)
+        expected = {
+            "rating_sum": int(row.rating_sum) if row else 0,
+            "rating_count": int(row.rating_count) if row else 0,
+            **{column: int(getattr(row, column)) if row else 0 for column in STAR_COLUMNS.values()},
+        }
+        stats = stored[product.id]
+        stats_drifted = any(getattr(stats, key) != value for key, value in expected.items())
+        for key, value in expected.items():
+            setattr(stats, key, value)
+
+        rating = average(expected["rating_sum"], expected["rating_count"])
+        if stats_drifted or product.rating != rating or product.reviews_count != expected["rating_count"]:
+            db.execute(
+                update(Product)
+                .where(Product.id == product.id)
+                .values(rating=rating, reviews_count=expected["rating_count"])
+                .execution_options(synchronize_session=False)
+            )
+            fixed.append((product.id, product.slug))
+    return fixed
+
+
+def reconcile_rating_stats(db: Optional[Session] = None, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """
+    Recompute every product's rating totals from the reviews table and fix
+    any stats rows, Product.rating or reviews_count that have drifted
+    (e.g. reviews deleted directly in the database).
+
+    Products are walked in id order, `batch_size` per transaction, so
+    memory stays bounded and stats rows are only locked briefly.
+    Returns the number of products corrected. Runs as a periodic
+    background task (RATING_RECONCILE_INTERVAL_SECONDS).
+    """
+    owns_session = db is None
+    db = db or SessionLocal()
+    fixed: List[Tuple[int, str]] = []
+    try:
+        last_id = 0
+        while True:
+            product_ids = db.scalars(
+                select(Product.id).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+            ).all()
+            if not product_ids:
+                break
+            last_id = product_ids[-1]
+            fixed.extend(_reconcile_batch(db, product_ids))
+            db.commit()
+            if len(product_ids) < batch_size:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    for product_id, slug in fixed:
+        catalog_cache.invalidate_product(product_id, slug)
+    if fixed:
+        logger.warning(f"Rating reconciliation corrected {len(fixed)} product(s)")
+    return len(fixed)
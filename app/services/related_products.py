@@ -0,0 +1,196 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import FrequentlyBoughtTogether, Product, ProductRelated, ProductStatus
+from app.services import catalog_cache
+from app.services.job_state import lock_job_state
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "related_products"
+
+# Score weights. Being bought together counts most, then sharing the
+# category, then shared materials/colors; popularity only breaks ties.
+CO_PURCHASE_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.0
+ATTRIBUTE_WEIGHT = 1.0
+POPULARITY_WEIGHT = 0.1
+
+# Candidates taken from each category or shared attribute (most popular
+# first), so large categories don't make the job quadratic
+CANDIDATES_PER_GROUP = 50
+
+# Products whose co-purchases are looked up per query / rows per INSERT
+RANK_BATCH_SIZE = 500
+WRITE_BATCH_SIZE = 1000
+
+
+def _attribute_tokens(materials, colors) -> Set[str]:
+    """Normalized material and color names, e.g. {"material:oak", "color:red"}."""
+    tokens = set()
+    for material in materials or []:
+        tokens.add(f"material:{str(material).strip().lower()}")
+    for color in colors or []:
+        name = (color.get("name") or color.get("value")) if isinstance(color, dict) else color
+        if name:
+            tokens.add(f"color:{str(name).strip().lower()}")
+    return tokens
+
+
+def _bought_together(db: Session, product_ids: List[int]) -> Dict[int, Dict[int, int]]:
+    """
+    The given products' frequently bought together lists (at most
+    CO_PURCHASE_TOP_K each, precomputed by the co-purchase job) as
+    {product_id: {other_product_id: orders}}.
+    """
+    counts: Dict[int, Dict[int, int]] = defaultdict(dict)
+    rows = db.execute(
+        select(
+            FrequentlyBoughtTogether.product_id,
+            FrequentlyBoughtTogether.related_product_id,
+            FrequentlyBoughtTogether.orders_count,
+        ).where(FrequentlyBoughtTogether.product_id.in_(product_ids))
+    )
+    for product_id, other_id, orders_count in rows:
+        counts[product_id][other_id] = orders_count
+    return counts
+
+
+def compute_related(db: Session, top_n: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+    """
+    Rank up to `top_n` related published products for every product.
+
+    Yields (product_id, [(related_product_id, score), ...]) best first.
+    Co-purchase counts are read from the frequently bought together
+    lists one batch of products at a time, so memory does not grow with
+    the pair table.
+    """
+    products = db.execute(
+        select(
+            Product.id, Product.category_id, Product.status, Product.materials, Product.colors,
+            Product.views_count, Product.sales_count, Product.is_featured,
+        )
+    ).all()
+    # Same order the live endpoint used: featured, then most viewed
+    published = sorted(
+        (p for p in products if p.status == ProductStatus.PUBLISHED),
+        key=lambda p: (p.is_featured, p.views_count, p.sales_count),
+        reverse=True,
+    )
+
+    def popularity_of(p) -> float:
+        return math.log1p(p.views_count + 5 * p.sales_count)
+
+    max_popularity = max((popularity_of(p) for p in published), default=0.0) or 1.0
+    popularity = {p.id: POPULARITY_WEIGHT * popularity_of(p) / max_popularity for p in published}
+    category_of = {p.id: p.category_id for p in published}
+
+    by_category: Dict[int, List[int]] = defaultdict(list)
+    by_attribute: Dict[str, List[int]] = defaultdict(list)
+    attributes: Dict[int, Set[str]] = {}
+    for p in published:
+        by_category[p.category_id].append(p.id)
+        attributes[p.id] = _attribute_tokens(p.materials, p.colors)
+        for token in attributes[p.id]:
+            by_attribute[token].append(p.id)
+
+    fallback = [p.id for p in published[:top_n + 1]]
+
+    for start in range(0, len(products), RANK_BATCH_SIZE):
+        batch = products[start:start + RANK_BATCH_SIZE]
+        bought_together = _bought_together(db, [product.id for product in batch])
+        for product in batch:
+            tokens = attributes.get(product.id)
+            if tokens is None:
+                tokens = _attribute_tokens(product.materials, product.colors)
+            bought_with = {q: n for q, n in bought_together.get(product.id, {}).items() if q in popularity}
+
+            candidates: Set[int] = set(by_category.get(product.category_id, [])[:CANDIDATES_PER_GROUP])
+            candidates.update(bought_with)
+            for token in tokens:
+                candidates.update(by_attribute[token][:CANDIDATES_PER_GROUP])
+            candidates.discard(product.id)
+
+            max_bought = math.log1p(max(bought_with.values(), default=0)) or 1.0
+            scored = []
+            for candidate in candidates:
+                score = popularity[candidate]
+                if product.category_id is not None and category_of[candidate] == product.category_id:
+                    score += CATEGORY_WEIGHT
+                if candidate in bought_with:
+                    score += CO_PURCHASE_WEIGHT * math.log1p(bought_with[candidate]) / max_bought
+                if tokens:
+                    shared = tokens & attributes[candidate]
+                    if shared:
+                        score += ATTRIBUTE_WEIGHT * len(shared) / len(tokens | attributes[candidate])
+                scored.append((candidate, score))
+            scored.sort(key=lambda item: item[1], reverse=True)
+            scored = scored[:top_n]
+
+            # Top up short lists with the most popular products overall
+            chosen = {candidate for candidate, _ in scored}
+            for candidate in fallback:
+                if len(scored) >= top_n:
+                    break
+                if candidate != product.id and candidate not in chosen:
+                    scored.append((candidate, popularity[candidate]))
+            yield product.id, scored
+
+
+def rebuild_related_products(db: Optional[Session] = None) -> int:
+    """
+    Recompute the product_related table from scratch.
+
+    All rows are replaced in one transaction, so readers see either the
+    previous ranking or the new one. The job's job_state row is locked for
+    that transaction, so when every worker runs the task only one rebuilds
+    at a time and the others skip. Returns the number of products ranked
+    (0 when skipped). Runs as a periodic background task
+    (RELATED_PRODUCTS_REBUILD_INTERVAL_SECONDS).
+    """
+    started = time.perf_counter()
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        state = lock_job_state(db, JOB_NAME)
+        if state is None:
+            logger.info("Related products are already being rebuilt in another worker")
+            db.rollback()
+            return 0
+        db.execute(delete(ProductRelated))
+        ranked_products = written = 0
+        rows = []
+        for product_id, ranked in compute_related(db, settings.RELATED_PRODUCTS_TOP_N):
+            ranked_products += 1
+            rows.extend(
+                {"product_id": product_id, "rank": rank, "related_product_id": related_id, "score": round(score, 6)}
+                for rank, (related_id, score) in enumerate(ranked, start=1)
+            )
+            if len(rows) >= WRITE_BATCH_SIZE:
+                db.execute(insert(ProductRelated), rows)
+                written += len(rows)
+                rows = []
+        if rows:
+            db.execute(insert(ProductRelated), rows)
+            written += len(rows)
+        state.processed_count = ranked_products
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    catalog_cache.related.invalidate_all()
+    logger.info(
+        f"Ranked related products for {ranked_products} product(s) ({written} rows) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return ranked_products
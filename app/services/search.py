@@ -0,0 +1,235 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left
+from sqlalchemy import func, inspect, literal_column
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app.models.models import Product, ProductStatus
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration used by the products.search_vector trigger
+TS_CONFIG = "english"
+
+# Field weights mirroring PostgreSQL's default ts_rank weights for the
+# A/B/C/D labels assigned by the search_vector trigger.
+FIELD_WEIGHTS = {
+    "name": 1.0,
+    "meta_title": 0.4,
+    "description": 0.2,
+    "meta_description": 0.1,
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# How long a search_vector column check is trusted before re-inspecting
+FULLTEXT_CHECK_TTL_SECONDS = 300
+
+# Database URL -> (search_vector present, monotonic time of the check)
+_fulltext_available: Dict[str, Tuple[bool, float]] = {}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens."""
+    if not text:
+        return []
+    return [token.lower() for token in _TOKEN_RE.findall(text)]
+
+
+def build_tsquery(search: str) -> Optional[str]:
+    """
+    Turn free text into a to_tsquery() expression.
+
+    Every word must match and each word is prefix-matched, so partial input
+    from the search box ("cott") still finds "cotton". Only \\w tokens are
+    kept, which keeps tsquery operators in user input from reaching SQL.
+    """
+    tokens = tokenize(search)
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def uses_fulltext(db: Session) -> bool:
+    """
+    Whether the products.search_vector column can be used on this database.
+
+    Requires PostgreSQL with the search migration applied. The answer is
+    cached per database URL for FULLTEXT_CHECK_TTL_SECONDS, so applying or
+    rolling back the migration takes effect without a restart.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.url)
+    cached = _fulltext_available.get(key)
+    if cached is not None and time.monotonic() - cached[1] < FULLTEXT_CHECK_TTL_SECONDS:
+        return cached[0]
+
+    columns = {column["name"] for column in inspect(bind).get_columns("products")}
+    available = "search_vector" in columns
+    if not available and (cached is None or cached[0]):
+        logger.warning("products.search_vector missing; falling back to in-memory search index")
+    _fulltext_available[key] = (available, time.monotonic())
+    return available
+
+
+def forget_fulltext_check(db: Session) -> None:
+    """Drop the cached column check so the next search re-inspects the database."""
+    _fulltext_available.pop(str(db.get_bind().url), None)
+
+
+class InMemorySearchIndex:
+    """
+    Inverted index over product text fields.
+
+    Used when PostgreSQL full-text search is unavailable (e.g. SQLite-backed
+    tests). Postings map token -> {product_id: weighted term frequency}; a
+    query matches products containing every word (each prefix-matched, as
+    in build_tsquery) and results are ranked by summed weight.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._sorted_tokens: List[str] = []
+        self._published: Dict[int, bool] = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built = False
+
+    def _ensure_built(self, db: Session) -> None:
+        with self._lock:
+            if self._built:
+                return
+            rows = db.query(
+                Product.id,
+                Product.status,
+                Product.name,
+                Product.meta_title,
+                Product.description,
+                Product.meta_description,
+            ).all()
+            postings: Dict[str, Dict[int, float]] = {}
+            published: Dict[int, bool] = {}
+            for row in rows:
+                published[row.id] = row.status == ProductStatus.PUBLISHED
+                for field, weight in FIELD_WEIGHTS.items():
+                    for token in tokenize(getattr(row, field)):
+                        doc_scores = postings.setdefault(token, {})
+                        doc_scores[row.id] = doc_scores.get(row.id, 0.0) + weight
+            self._postings = postings
+            self._sorted_tokens = sorted(postings)
+            self._published = published
+            self._built = True
+            logger.debug(f"Built in-memory search index over {len(rows)} products")
+
+    def _prefix_postings(self, prefix: str) -> Dict[int, float]:
+        """Merge postings of every indexed token starting with `prefix`."""
+        merged: Dict[int, float] = {}
+        start = bisect_left(self._sorted_tokens, prefix)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            for product_id, score in self._postings[token].items():
+                merged[product_id] = merged.get(product_id, 0.0) + score
+        return merged
+
+    def search(self, db: Session, search: str, published_only: bool = True) -> List[Tuple[int, float]]:
+        """Return (product_id, score) pairs, best match first."""
+        self._ensure_built(db)
+        tokens = tokenize(search)
+        if not tokens:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+        for token in tokens:
+            token_scores = self._prefix_postings(token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    product_id: score + token_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in token_scores
+                }
+            if not scores:
+                return []
+
+        results = [
+            (product_id, score)
+            for product_id, score in scores.items()
+            if not published_only or self._published.get(product_id)
+        ]
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+
+fallback_index = InMemorySearchIndex()
+
+
+def invalidate() -> None:
+    """Mark the fallback index stale; called from every endpoint that writes products."""
+    fallback_index.invalidate()
+
+
+def _vector_column():
+    return literal_column("products.search_vector")
+
+
+def search_filter(db: Session, search: str):
+    """
+    Return a WHERE clause restricting products to those matching `search`.
+
+    Uses the GIN-indexed tsvector on PostgreSQL and the in-memory index
+    otherwise.
+    """
+    tsquery = build_tsquery(search)
+    if tsquery is None:
+        return Product.id.is_(None)
+    if uses_fulltext(db):
+        return _vector_column().op("@@")(func.to_tsquery(TS_CONFIG, tsquery))
+    matching_ids = [product_id for product_id, _ in fallback_index.search(db, search, published_only=False)]
+    return Product.id.in_(matching_ids)
+
+
+def search_products(db: Session, search: str, skip: int = 0, limit: int = 20,
+                    published_only: bool = True, options: Iterable = ()) -> Tuple[List[Tuple[Product, float]], int]:
+    """
+    Run a ranked product search.
+
+    Returns ([(product, rank), ...], total) ordered by rank, best first.
+    """
+    tsquery = build_tsquery(search)
+    if tsquery is None:
+        return [], 0
+
+    if uses_fulltext(db):
+        ts_query = func.to_tsquery(TS_CONFIG, tsquery)
+        rank = func.ts_rank_cd(_vector_column(), ts_query).label("rank")
+        query = db.query(Product, rank).filter(_vector_column().op("@@")(ts_query))
+        if published_only:
+            query = query.filter(Product.status == ProductStatus.PUBLISHED)
+        try:
+            total = query.count()
+            rows = query.options(*options).order_by(rank.desc(), Product.id).offset(skip).limit(limit).all()
+        except DBAPIError:
+            # e.g. the column was dropped since the last check
+            forget_fulltext_check(db)
+            raise
+        return [(product, float(score)) for product, score in rows], total
+
+    ranked = fallback_index.search(db, search, published_only=published_only)
+    page = ranked[skip:skip + limit]
+    if not page:
+        return [], len(ranked)
+    products = {
+        product.id: product
+        for product in db.query(Product).options(*options).filter(Product.id.in_([pid for pid, _ in page])).all()
+    }
+    return [(products[pid], score) for pid, score in page if pid in products], len(ranked)
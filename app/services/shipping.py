@@ -1,5 +1,7 @@
 from typing import List, Dict
+from starlette.concurrency import run_in_threadpool
 from app.schemas.shipping import ShippingRate
+from app.services.catalog_cache import shipping_rates as shipping_rate_cache
 
 # Define shipping zones and their base rates
 SHIPPING_ZONES: Dict[str, Dict[str, float]] = {
@@ -117,12 +119,22 @@ async def calculate_shipping_rates(country: str, postal_code: str) -> List[Shipp
     # Get the shipping zone for the country
     zone = get_shipping_zone(country)
     
+    # Rates only depend on the zone and the surcharge, so quotes are shared
+    # across all postal codes in the same bucket
+    distance_surcharge = calculate_distance_surcharge(postal_code)
+    # get_or_set may wait on another worker's load (and talks to Redis), so
+    # it runs in a thread rather than on the event loop
+    return await run_in_threadpool(
+        shipping_rate_cache.get_or_set,
+        f"{zone}:{distance_surcharge:.2f}",
+        lambda: _build_shipping_rates(zone, distance_surcharge),
+    )
+
+def _build_shipping_rates(zone: str, distance_surcharge: float) -> List[ShippingRate]:
+    """Build the rate list for a zone with the given surcharge applied."""
     # Get base rates for the zone
     zone_rates = SHIPPING_ZONES.get(zone, SHIPPING_ZONES["US"])
     
-    # Calculate surcharges
-    distance_surcharge = calculate_distance_surcharge(postal_code)
-    
     # Generate shipping rates
     rates = []
     for service, base_rate in zone_rates.items():
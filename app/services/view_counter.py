@@ -0,0 +1,138 @@
+from typing import Any, Dict, Optional
+from sqlalchemy import Integer, case, column, update, values
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Product
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Per-process buffer of product view increments.
+
+    record() only touches an in-memory dict, so counting a view costs the
+    read path nothing; flush() writes all buffered increments with one
+    UPDATE per batch. Views buffered since the last flush are lost if the
+    process dies, so VIEW_COUNTER_FLUSH_INTERVAL_SECONDS bounds the loss.
+    At most VIEW_COUNTER_MAX_PENDING_PRODUCTS distinct products are held;
+    views of further products are dropped (and counted) rather than
+    letting the buffer grow while the database is unavailable.
+    """
+
+    def __init__(self, max_pending_products: int, batch_size: int):
+        self.max_pending_products = max_pending_products
+        self.batch_size = batch_size
+        self._pending: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def record(self, product_id: int, views: int = 1) -> None:
+        with self._lock:
+            if product_id not in self._pending and len(self._pending) >= self.max_pending_products:
+                self.dropped += views
+                return
+            self._pending[product_id] = self._pending.get(product_id, 0) + views
+            self.recorded += views
+
+    def _requeue(self, increments: Dict[int, int]) -> None:
+        """Put back increments from a failed flush, within the buffer limit."""
+        with self._lock:
+            for product_id, views in increments.items():
+                if product_id not in self._pending and len(self._pending) >= self.max_pending_products:
+                    self.dropped += views
+                    continue
+                self._pending[product_id] = self._pending.get(product_id, 0) + views
+
+    @staticmethod
+    def _increment_statement(dialect: str, batch: Dict[int, int]):
+        # updated_at is pinned so view counts don't count as product
+        # modifications (it drives Last-Modified on product detail)
+        if dialect == "postgresql":
+            increments = values(
+                column("product_id", Integer), column("views", Integer), name="view_increments"
+            ).data(sorted(batch.items()))
+            return (
+                update(Product)
+                .where(Product.id == increments.c.product_id)
+                .values(views_count=Product.views_count + increments.c.views, updated_at=Product.updated_at)
+            )
+        # Other dialects may not accept a VALUES list with column aliases
+        return (
+            update(Product)
+            .where(Product.id.in_(batch))
+            .values(views_count=Product.views_count + case(batch, value=Product.id), updated_at=Product.updated_at)
+        )
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """Write buffered increments; returns the number of views written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        owns_session = db is None
+        db = db or SessionLocal()
+        items = sorted(pending.items())
+        written = 0
+        try:
+            dialect = db.get_bind().dialect.name
+            for start in range(0, len(items), self.batch_size):
+                batch = dict(items[start:start + self.batch_size])
+                db.execute(
+                    self._increment_statement(dialect, batch).execution_options(synchronize_session=False)
+                )
+                db.commit()
+                written += sum(batch.values())
+                # Committed batches must not be requeued if a later one fails
+                for product_id in batch:
+                    pending.pop(product_id)
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            logger.warning(f"View count flush failed, keeping {sum(pending.values())} views for the next attempt: {e}")
+            self._requeue(pending)
+        finally:
+            if owns_session:
+                db.close()
+
+        self.flushed += written
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending_products = len(self._pending)
+            pending_views = sum(self._pending.values())
+        return {
+            "pending_products": pending_products,
+            "pending_views": pending_views,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+view_counter = ViewCounter(
+    max_pending_products=settings.VIEW_COUNTER_MAX_PENDING_PRODUCTS,
+    batch_size=settings.VIEW_COUNTER_FLUSH_BATCH_SIZE,
+)
+
+
+def record_view(product_id: int) -> None:
+    if settings.VIEW_COUNTER_ENABLED:
+        view_counter.record(product_id)
+
+
+def flush() -> int:
+    return view_counter.flush()
+
+
+def stats() -> Dict[str, Any]:
+    return view_counter.stats()
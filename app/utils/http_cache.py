@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import json
+
+# Responses that depend on the caller (e.g. admins also see drafts) must not
+# be stored by shared caches.
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def render_json(content: Any) -> bytes:
+    """Serialize content exactly like fastapi.responses.JSONResponse does."""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag (RFC 7232 3.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    return _strip_weak(etag) in {_strip_weak(tag) for tag in if_none_match.split(",")}
+
+
+def _to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate the request's validators.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    no ETag validator was sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _to_utc(last_modified) <= _to_utc(since)
+    return False
+
+
+def conditional_json_response(
+    request: Request,
+    content: Any,
+    cache_control: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Build a JSON response carrying ETag/Last-Modified/Cache-Control headers.
+
+    The body is serialized once: its hash is the ETag, and the same bytes are
+    sent on a miss. When the client's validators still match, an empty 304
+    with the same headers is returned instead.
+    """
+    body = render_json(content)
+    headers = {"ETag": make_etag(body)}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_to_utc(last_modified), usegmt=True)
+    if vary:
+        headers["Vary"] = vary
+
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
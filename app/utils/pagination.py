@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Pagination modes accepted by the listing endpoints
+OFFSET_PAGINATION = "offset"
+CURSOR_PAGINATION = "cursor"
+
+
+def encode_cursor(sort_key: str, sort_order: str, values: Sequence[Any]) -> str:
+    """
+    Build an opaque cursor for keyset pagination.
+
+    The cursor carries the sort key, direction and the values of the last row
+    on the page (sort column value + id) so the next page can start right
+    after it without an OFFSET.
+    """
+    payload = {
+        "k": sort_key,
+        "o": sort_order,
+        "v": [_encode_value(value) for value in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str, sort_order: str) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises a 400 if the cursor is malformed or was issued for a different
+    sort order than the current request.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(value) for value in payload["v"]]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    if payload.get("k") != sort_key or payload.get("o") != sort_order:
+        raise HTTPException(
+            status_code=400,
+            detail="Pagination cursor does not match the requested sort order",
+        )
+    return values
+
+
+def keyset_filter(sort_column, id_column, values: Sequence[Any], descending: bool):
+    """
+    Return the WHERE clause selecting rows strictly after the cursor position.
+
+    Rows are ordered by (sort_column, id) in the same direction, so the next
+    page is everything "after" (last_value, last_id) in that order.
+    """
+    last_value, last_id = values
+    if descending:
+        return or_(
+            sort_column < last_value,
+            and_(sort_column == last_value, id_column < last_id),
+        )
+    return or_(
+        sort_column > last_value,
+        and_(sort_column == last_value, id_column > last_id),
+    )
+
+
+def keyset_order_by(sort_column, id_column, descending: bool) -> Tuple:
+    """Order by the sort column with id as a unique tie-breaker."""
+    if descending:
+        return sort_column.desc(), id_column.desc()
+    return sort_column.asc(), id_column.asc()
+
+
+def _keyset_query(query, sort_column, id_column, sort_key: str, sort_order: str,
+                  limit: int, cursor: Optional[str] = None):
+    """Add the cursor filter, ordering and limit+1 to a Query or select()."""
+    descending = sort_order == "desc"
+    if cursor:
+        values = decode_cursor(cursor, sort_key, sort_order)
+        query = query.filter(keyset_filter(sort_column, id_column, values, descending))
+
+    query = query.order_by(*keyset_order_by(sort_column, id_column, descending))
+    return query.limit(limit + 1)
+
+
+def _keyset_page(rows: List[Any], sort_column, id_column, sort_key: str, sort_order: str, limit: int):
+    """Trim the extra row and build the next cursor from the last row kept."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            sort_key,
+            sort_order,
+            [getattr(last, sort_column.key), getattr(last, id_column.key)],
+        )
+    return rows, next_cursor
+
+
+def paginate_keyset(query, sort_column, id_column, sort_key: str, sort_order: str,
+                    limit: int, cursor: Optional[str] = None):
+    """
+    Apply keyset pagination to a query.
+
+    Fetches one extra row to know whether another page exists and returns
+    the page rows together with the cursor for the next page (None on the
+    last page).
+    """
+    query = _keyset_query(query, sort_column, id_column, sort_key, sort_order, limit, cursor)
+    return _keyset_page(query.all(), sort_column, id_column, sort_key, sort_order, limit)
+
+
+async def paginate_keyset_async(db, statement, sort_column, id_column, sort_key: str,
+                                sort_order: str, limit: int, cursor: Optional[str] = None):
+    """paginate_keyset() for a select() statement executed on an AsyncSession."""
+    statement = _keyset_query(statement, sort_column, id_column, sort_key, sort_order, limit, cursor)
+    rows = list((await db.scalars(statement)).all())
+    return _keyset_page(rows, sort_column, id_column, sort_key, sort_order, limit)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if hasattr(value, "value"):  # Enum members
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import os
-import shutil
+import asyncio
+import hashlib
+import inspect
 import uuid
 import traceback
 from pathlib import Path
@@ -10,6 +12,8 @@ import re
 import base64
 import io
 from datetime import datetime
+import aiofiles
+import aiofiles.os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,6 +24,26 @@ logger.setLevel(logging.DEBUG)  # Set to DEBUG for more detailed logs
 LOCAL_STORAGE_DIR = "/Users/bo/Desktop/AI stuff/okyke_ecomm_v4/backend/local_s3_storage"
 BASE_URL = "http://127.0.0.1:8888/local_s3"  # Base URL for accessing the files
 
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Largest accepted upload, in bytes
+MAX_UPLOAD_SIZE = int(os.getenv("LOCAL_S3_MAX_UPLOAD_SIZE", str(20 * 1024 * 1024)))
+
+
+class UploadTooLarge(ValueError):
+    """The uploaded file is larger than the allowed maximum"""
+
+
+async def _read_chunk(file_obj, size):
+    """Read up to `size` bytes without blocking the event loop"""
+    read = file_obj.read
+    if inspect.iscoroutinefunction(read):
+        return await read(size)
+    if isinstance(file_obj, io.BytesIO):
+        # Already in memory, nothing to block on
+        return read(size)
+    return await asyncio.to_thread(read, size)
+
 class LocalS3Client:
     """Simulates AWS S3 client with local file storage"""
     
@@ -33,120 +57,67 @@ class LocalS3Client:
         os.makedirs(self.storage_dir, exist_ok=True)
         logger.info(f"Local S3 storage initialized at: {self.storage_dir}")
     
-    async def upload_fileobj(self, file_obj, bucket_name, key, **kwargs):
+    async def upload_fileobj(self, file_obj, bucket_name, key, max_size=None, **kwargs):
         """
-        Simulates S3's upload_fileobj by copying file to local storage
+        Simulates S3's upload_fileobj by streaming the file to local storage
+        
+        The file is copied in UPLOAD_CHUNK_SIZE chunks into a temporary file
+        that is renamed into place once complete, so readers never see a
+        partial object. Blocking reads and all disk writes run off the event
+        loop. Size and SHA-256 are computed while copying.
         
         Args:
-            file_obj: The file object to upload
+            file_obj: The file object to upload (an UploadFile, or any object with read())
             bucket_name: Simulated bucket name (becomes a subdirectory)
             key: The file key/path within the bucket
+            max_size: Largest accepted size in bytes (default MAX_UPLOAD_SIZE)
             **kwargs: Extra arguments (ignored for compatibility)
+        
+        Returns:
+            dict: key, size and sha256 of the stored object
+        
+        Raises:
+            UploadTooLarge: if the file is larger than max_size; nothing is stored
         """
-        # Create bucket directory if it doesn't exist
-        bucket_dir = os.path.join(self.storage_dir, bucket_name)
-        os.makedirs(bucket_dir, exist_ok=True)
+        max_size = MAX_UPLOAD_SIZE if max_size is None else max_size
+        
+        # Reject early when the size is already known (e.g. multipart uploads)
+        declared_size = getattr(file_obj, "size", None)
+        if isinstance(declared_size, int) and declared_size > max_size:
+            raise UploadTooLarge(f"File is larger than the {max_size} byte limit")
         
-        # Create subdirectories in the key path if necessary
-        key_parts = key.split('/')
-        key_path = os.path.join(bucket_dir, *key_parts)
-        key_dir = os.path.dirname(key_path)
+        key_path = os.path.join(self.storage_dir, bucket_name, *key.split('/'))
+        await aiofiles.os.makedirs(os.path.dirname(key_path), exist_ok=True)
+        temp_path = f"{key_path}.{uuid.uuid4().hex}.part"
         
-        logger.info(f"Ensuring directory exists: {key_dir}")
-        os.makedirs(key_dir, exist_ok=True)
+        if hasattr(file_obj, 'seek'):
+            seek = file_obj.seek(0)
+            if inspect.isawaitable(seek):
+                await seek
         
-        # Write the file
+        checksum = hashlib.sha256()
+        size = 0
         try:
-            # Make sure the key directory exists
-            os.makedirs(os.path.dirname(key_path), exist_ok=True)
-            
-            # Check file object type and properties
-            logger.debug(f"File object type: {type(file_obj)}")
-            logger.debug(f"File object attributes: {dir(file_obj)}")
-            
-            # Dump file object content for debugging
-            if hasattr(file_obj, 'read'):
-                try:
-                    # Get current position
-                    if hasattr(file_obj, 'tell'):
-                        current_pos = file_obj.tell()
-                        logger.debug(f"Current file position before read: {current_pos}")
-                    
-                    # Read a small sample for debugging
-                    if hasattr(file_obj, 'seek'):
-                        file_obj.seek(0)
-                        sample = file_obj.read(100)  # Read first 100 bytes for debug
-                        logger.debug(f"File sample (first 100 bytes): {sample}")
-                        file_obj.seek(0)  # Reset to beginning
-                except Exception as e:
-                    logger.error(f"Error inspecting file object: {str(e)}")
-            
-            with open(key_path, "wb") as dest_file:
-                # Get current position
-                current_pos = 0
-                if hasattr(file_obj, 'tell'):
-                    try:
-                        current_pos = file_obj.tell()
-                        logger.debug(f"Current file position: {current_pos}")
-                    except Exception as e:
-                        logger.error(f"Error getting file position: {str(e)}")
-                
-                # Seek to the beginning of the file if possible
-                if hasattr(file_obj, 'seek'):
-                    try:
-                        file_obj.seek(0)
-                        logger.debug("Successfully seeked to beginning of file")
-                    except Exception as e:
-                        logger.error(f"Error seeking file: {str(e)}")
-                
-                # Try different methods of copying based on file_obj type
-                try:
-                    if hasattr(file_obj, 'read'):
-                        # Get file content as bytes
-                        content = file_obj.read()
-                        logger.debug(f"Read {len(content)} bytes from file")
-                        
-                        # Write content to destination
-                        dest_file.write(content)
-                        logger.debug(f"Wrote {len(content)} bytes to {key_path}")
-                    else:
-                        # Fallback - try copyfileobj
-                        logger.debug("Using shutil.copyfileobj for file copy")
-                        shutil.copyfileobj(file_obj, dest_file)
-                except Exception as e:
-                    logger.error(f"Error copying file content: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    raise e
-                
-                # Try to return to original position
-                if hasattr(file_obj, 'seek'):
-                    try:
-                        file_obj.seek(current_pos)
-                        logger.debug(f"Returned to position {current_pos}")
-                    except Exception as e:
-                        logger.error(f"Error returning to original position: {str(e)}")
-            
-            file_size = os.path.getsize(key_path)
-            logger.info(f"File uploaded successfully to: {key_path} (size: {file_size} bytes)")
-            
-            # Print the full URL for debugging
-            full_url = f"{BASE_URL}/{bucket_name}/{key}"
-            logger.info(f"File accessible at: {full_url}")
-            
-            # Verify the file was actually written
-            if not os.path.exists(key_path):
-                logger.error(f"File does not exist after write: {key_path}")
-                return False
-                
-            if os.path.getsize(key_path) == 0:
-                logger.error(f"File is empty after write: {key_path}")
-                return False
-                
-            return True
-        except Exception as e:
-            logger.error(f"Error uploading file: {str(e)}")
-            logger.error(traceback.format_exc())
-            raise e
+            async with aiofiles.open(temp_path, "wb") as dest_file:
+                while True:
+                    chunk = await _read_chunk(file_obj, UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLarge(f"File is larger than the {max_size} byte limit")
+                    checksum.update(chunk)
+                    await dest_file.write(chunk)
+            await aiofiles.os.replace(temp_path, key_path)
+        except BaseException:
+            try:
+                await aiofiles.os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        
+        logger.info(f"File uploaded successfully to: {key_path} (size: {size} bytes)")
+        return {"key": key, "size": size, "sha256": checksum.hexdigest()}
     
     async def delete_object(self, bucket_name, key, **kwargs):
         """
@@ -166,14 +137,17 @@ class LocalS3Client:
             logger.warning(f"File not found for deletion: {file_path}")
             return False
 
-async def upload_file(file: UploadFile, folder: str = "", bucket: str = "okyke-files"):
+async def upload_file(file: UploadFile, folder: str = "", bucket: str = "okyke-files", max_size: int = None):
     """
     Upload a file to local S3-like storage and return its URL
     
+    The file is streamed to disk in chunks, never read into memory whole.
+    
     Args:
         file: The file to upload
         folder: Optional folder path within the bucket
         bucket: Simulated bucket name
+        max_size: Largest accepted size in bytes (default MAX_UPLOAD_SIZE)
     
     Returns:
         str: The URL of the uploaded file
@@ -181,11 +155,6 @@ async def upload_file(file: UploadFile, folder: str = "", bucket: str = "okyke-f
     try:
         logger.info(f"Starting upload for file: {file.filename} to folder: {folder}")
         
-        # Log all file attributes for debugging
-        file_attrs = {attr: getattr(file, attr) for attr in dir(file) 
-                     if not attr.startswith('_') and not callable(getattr(file, attr))}
-        logger.debug(f"File attributes: {file_attrs}")
-        
         # Ensure we have a filename to work with
         if not file.filename:
             file.filename = f"uploaded_file_{uuid.uuid4()}"
@@ -234,31 +203,6 @@ async def upload_file(file: UploadFile, folder: str = "", bucket: str = "okyke-f
         # Combine folder and filename, ensuring proper path format
         folder = folder.rstrip('/') if folder else ""
         
-        # Ensure the product directory exists first
-        if folder.startswith("products/"):
-            # Extract product ID
-            parts = folder.split('/')
-            if len(parts) >= 2 and parts[0] == "products":
-                product_id = parts[1]
-                logger.info(f"Processing upload for product ID: {product_id}")
-                
-                # Create the full product directory path - use the specific required path
-                product_dir = os.path.join(LOCAL_STORAGE_DIR, bucket, "products", product_id)
-                logger.info(f"Ensuring product directory exists: {product_dir}")
-                os.makedirs(product_dir, exist_ok=True)
-                
-                # Create test file to check permissions
-                test_file_path = os.path.join(product_dir, "test_write.txt")
-                try:
-                    with open(test_file_path, "w") as test_file:
-                        test_file.write("Test write permission")
-                    os.remove(test_file_path)  # Clean up test file
-                    logger.debug(f"Write test successful in directory: {product_dir}")
-                except Exception as e:
-                    logger.error(f"Write permission test failed: {str(e)}")
-                    # If permission test fails, log the details
-                    logger.error(f"Directory permissions: {os.access(product_dir, os.R_OK)}, {os.access(product_dir, os.W_OK)}, {os.access(product_dir, os.X_OK)}")
-        
         # Build the key with proper slashes - use SEO friendly filename
         key = f"{folder}/{seo_filename}" if folder else seo_filename
         key = key.replace('//', '/')  # Fix any double slashes
@@ -268,41 +212,24 @@ async def upload_file(file: UploadFile, folder: str = "", bucket: str = "okyke-f
         # Create S3 client - use the specific local storage directory
         s3_client = LocalS3Client(storage_dir=LOCAL_STORAGE_DIR)
         
-        # Get file content for direct upload
+        # Stream the upload to disk; the storage directories are created as needed
         try:
-            # Read file content
-            file_content = await file.read()
-            logger.debug(f"Read {len(file_content)} bytes from file")
-            
-            # Reset file position for upload
-            await file.seek(0)
-            logger.debug("Reset file position for upload")
-            
-            # Directly upload file content
-            file_key_path = os.path.join(bucket, key)
-            logger.debug(f"File key path: {file_key_path}")
-            
-            await s3_client.upload_fileobj(file.file, bucket, key)
+            result = await s3_client.upload_fileobj(file, bucket, key, max_size=max_size)
             
             # Build the URL to access the file
             url = f"{BASE_URL}/{bucket}/{key}"
-            logger.info(f"File uploaded successfully: {url}")
-            
-            # Verify file exists
-            file_path = os.path.join(LOCAL_STORAGE_DIR, bucket, key)
-            logger.debug(f"Physical file path: {file_path}")
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                logger.info(f"Verified file exists: {file_path} (size: {file_size} bytes)")
-            else:
-                logger.error(f"File does not exist after upload: {file_path}")
-                
+            logger.info(f"File uploaded successfully: {url} (size: {result['size']} bytes, sha256: {result['sha256']})")
             return url
+        except UploadTooLarge:
+            raise
         except Exception as e:
-            logger.error(f"Error reading file content: {str(e)}")
+            logger.error(f"Error writing uploaded file: {str(e)}")
             logger.error(traceback.format_exc())
             raise e
             
+    except UploadTooLarge as e:
+        logger.warning(f"Rejected upload of {file.filename}: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         logger.error(traceback.format_exc())
@@ -458,20 +385,11 @@ async def upload_customization_image_data(
         file_obj = io.BytesIO(image_bytes)
         
         # Upload the file object
-        await s3_client.upload_fileobj(file_obj, bucket, key)
+        result = await s3_client.upload_fileobj(file_obj, bucket, key)
         
         # Build the public URL
         url = f"{BASE_URL}/{bucket}/{key}"
-        logger.info(f"Customization image uploaded successfully: {url}")
-
-        # Verify file exists (optional, good for debugging local setup)
-        file_path = os.path.join(LOCAL_STORAGE_DIR, bucket, key)
-        if os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-            logger.info(f"Verified file exists: {file_path} (size: {file_size} bytes)")
-        else:
-            logger.error(f"File does not exist after upload: {file_path}")
-            # Even if verification fails locally, return URL as upload_fileobj didn't raise error
+        logger.info(f"Customization image uploaded successfully: {url} (size: {result['size']} bytes)")
 
         return url
 
@@ -0,0 +1,61 @@
+"""add product full-text search vector
+
+Revision ID: a3c91f0d2b7e
+Revises: eb0221ff7945
+Create Date: 2025-04-14 10:12:03.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91f0d2b7e'
+down_revision: Union[str, None] = 'eb0221ff7945'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Weighted document: name (A) > meta_title (B) > description (C) > meta_description (D)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(NEW.meta_title, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C') ||
+                setweight(to_tsvector('english', coalesce(NEW.meta_description, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER products_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, meta_title, description, meta_description
+        ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector_update();
+    """)
+
+    # Backfill existing rows
+    op.execute("""
+        UPDATE products SET search_vector =
+            setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(meta_title, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(meta_description, '')), 'D')
+    """)
+
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector_trigger ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_update()")
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,70 @@
+"""add materialized path to categories
+
+Revision ID: b6f1d3e8a245
+Revises: 7c2e4a9d1f63
+Create Date: 2025-05-08 14:03:27.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6f1d3e8a245'
+down_revision: Union[str, None] = '7c2e4a9d1f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('path', sa.String(length=255), nullable=True))
+    op.add_column('categories', sa.Column('depth', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill paths from parent_id. Categories whose parent is missing (or
+    # that are part of a parent cycle) become top-level.
+    connection = op.get_bind()
+    categories = sa.table(
+        'categories',
+        sa.column('id', sa.Integer),
+        sa.column('parent_id', sa.Integer),
+        sa.column('path', sa.String),
+        sa.column('depth', sa.Integer),
+    )
+    parents = dict(connection.execute(sa.select(categories.c.id, categories.c.parent_id)).all())
+    paths = {}
+
+    def resolve(category_id, seen=()):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            if parent_id not in parents or parent_id in seen or parent_id == category_id:
+                paths[category_id] = (f"/{category_id}/", 0)
+            else:
+                parent_path, parent_depth = resolve(parent_id, seen + (category_id,))
+                paths[category_id] = (f"{parent_path}{category_id}/", parent_depth + 1)
+        return paths[category_id]
+
+    for category_id in parents:
+        resolve(category_id)
+    if paths:
+        connection.execute(
+            categories.update()
+            .where(categories.c.id == sa.bindparam('category_id'))
+            .values(path=sa.bindparam('new_path'), depth=sa.bindparam('new_depth')),
+            [
+                {'category_id': category_id, 'new_path': path, 'new_depth': depth}
+                for category_id, (path, depth) in paths.items()
+            ],
+        )
+
+    op.create_index('ix_categories_path', 'categories', ['path'], unique=False,
+                    postgresql_ops={'path': 'varchar_pattern_ops'})
+    op.create_index('ix_products_category_id', 'products', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_category_id', table_name='products')
+    op.drop_index('ix_categories_path', table_name='categories')
+    op.drop_column('categories', 'depth')
+    op.drop_column('categories', 'path')
@@ -0,0 +1,53 @@
+"""add unique index on cart item product and customization
+
+Revision ID: d9a3f6c2e817
+Revises: b6f1d3e8a245
+Create Date: 2025-05-12 11:47:09.380562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a3f6c2e817'
+down_revision: Union[str, None] = 'b6f1d3e8a245'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate lines (from concurrent add-to-cart requests) into the
+    # oldest one before the index can be created
+    op.execute(sa.text("""
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(d.quantity) FROM cart_items d
+            WHERE d.cart_id = cart_items.cart_id
+              AND d.product_id = cart_items.product_id
+              AND COALESCE(d.product_customization_id, 0) = COALESCE(cart_items.product_customization_id, 0)
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart_items
+            GROUP BY cart_id, product_id, COALESCE(product_customization_id, 0)
+            HAVING COUNT(*) > 1
+        )
+    """))
+    op.execute(sa.text("""
+        DELETE FROM cart_items WHERE id NOT IN (
+            SELECT MIN(id) FROM cart_items
+            GROUP BY cart_id, product_id, COALESCE(product_customization_id, 0)
+        )
+    """))
+
+    op.create_index(
+        'uq_cart_items_cart_product_customization',
+        'cart_items',
+        ['cart_id', 'product_id', sa.text('COALESCE(product_customization_id, 0)')],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_cart_items_cart_product_customization', table_name='cart_items')
@@ -0,0 +1,48 @@
+"""add inventory reservations
+
+Revision ID: e8a4f17b3c52
+Revises: c5d81e2a9f34
+Create Date: 2025-04-24 15:08:12.671530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4f17b3c52'
+down_revision: Union[str, None] = 'c5d81e2a9f34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('ACTIVE', 'COMMITTED', 'RELEASED', 'EXPIRED', name='reservationstatus'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_reservations_id'), 'inventory_reservations', ['id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservations_order_id'), 'inventory_reservations', ['order_id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservations_product_id'), 'inventory_reservations', ['product_id'], unique=False)
+    # The sweeper looks for active reservations past their expiry
+    op.create_index('ix_inventory_reservations_status_expires_at', 'inventory_reservations', ['status', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_reservations_status_expires_at', table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_product_id'), table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_order_id'), table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_id'), table_name='inventory_reservations')
+    op.drop_table('inventory_reservations')
+    sa.Enum(name='reservationstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,29 @@
+"""index cart and order item customization references
+
+Revision ID: f1c7a2d94e38
+Revises: d9a3f6c2e817
+Create Date: 2025-05-14 09:22:41.615037
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c7a2d94e38'
+down_revision: Union[str, None] = 'd9a3f6c2e817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The cleanup job looks up customizations that no cart or order item references
+    op.create_index('ix_cart_items_product_customization_id', 'cart_items', ['product_customization_id'], unique=False)
+    op.create_index('ix_order_items_product_customization_id', 'order_items', ['product_customization_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_items_product_customization_id', table_name='order_items')
+    op.drop_index('ix_cart_items_product_customization_id', table_name='cart_items')
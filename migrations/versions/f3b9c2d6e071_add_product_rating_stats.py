@@ -0,0 +1,59 @@
+"""add product rating stats
+
+Revision ID: f3b9c2d6e071
+Revises: e8a4f17b3c52
+Create Date: 2025-04-28 11:46:30.915204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9c2d6e071'
+down_revision: Union[str, None] = 'e8a4f17b3c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('product_rating_stats',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stars_1', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stars_2', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stars_3', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stars_4', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stars_5', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+
+    # Backfill from existing reviews and bring the denormalized product columns in line
+    op.execute("""
+        INSERT INTO product_rating_stats
+            (product_id, rating_sum, rating_count, stars_1, stars_2, stars_3, stars_4, stars_5)
+        SELECT product_id, SUM(rating), COUNT(*),
+            SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END)
+        FROM reviews
+        GROUP BY product_id
+    """)
+    op.execute("""
+        UPDATE products SET
+            reviews_count = s.rating_count,
+            rating = ROUND(s.rating_sum::numeric / s.rating_count, 1)
+        FROM product_rating_stats s
+        WHERE s.product_id = products.id AND s.rating_count > 0
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('product_rating_stats')
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Fire many simultaneous checkouts at one low-stock product and check that
+it is never oversold.
+
+    python scripts/benchmark_checkout_concurrency.py --base-url http://localhost:8000 \
+        --login customer@example.com secret --product-id 42 --checkouts 500 --concurrency 200
+
+Each checkout orders --quantity units of the product. Stock is read before
+and after the run; the script exits non-zero if more units were sold than
+were in stock, if stock went negative, or if the stock left over does not
+match what the successful orders took. Throughput and latency of the
+checkout requests are reported alongside. Stock is read straight from the
+database (--database-url, default DATABASE_URL) because the API serves
+product detail from cache.
+
+An address is created for the logged-in user unless --address-id is given.
+Orders created by the run are cancelled afterwards (returning their stock)
+unless --keep-orders is passed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import create_engine, text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+# One line per checkout request would drown out the results
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.config import settings  # noqa: E402
+from scripts.benchmark_latency import login, summarize  # noqa: E402
+
+
+def read_stock(engine, product_id: int) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT stock FROM products WHERE id = :id"), {"id": product_id}
+        ).scalar_one()
+
+
+async def create_address(client: httpx.AsyncClient, headers: Dict[str, str]) -> int:
+    response = await client.post("/api/v1/addresses/", headers=headers, json={
+        "full_name": "Checkout Benchmark",
+        "address_line1": "1 Benchmark Way",
+        "city": "Lagos",
+        "state": "Lagos",
+        "postal_code": "100001",
+        "country": "NG",
+        "phone_number": "+2348000000000",
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def run(args: argparse.Namespace) -> bool:
+    engine = create_engine(args.database_url)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        token = args.token or await login(client, *args.login)
+        headers = {"Authorization": f"Bearer {token}"}
+        address_id = args.address_id or await create_address(client, headers)
+
+        stock_before = read_stock(engine, args.product_id)
+        logger.info(f"Product {args.product_id} has {stock_before} in stock; firing {args.checkouts} checkouts")
+
+        body = {
+            "shipping_address_id": address_id,
+            "billing_address_id": address_id,
+            "shipping_id": args.shipping_id,
+            "items": [{"product_id": args.product_id, "quantity": args.quantity}],
+            "subtotal": 1,
+            "shipping_cost": 0,
+            "tax": 0,
+            "total_amount": 1,
+        }
+        latencies: List[float] = []
+        outcomes: Dict[str, int] = {"created": 0, "out_of_stock": 0, "error": 0}
+        order_ids: List[int] = []
+        counter = iter(range(args.checkouts))
+        # Hold every worker until all are ready so the requests really overlap
+        start_gate = asyncio.Event()
+
+        async def worker():
+            await start_gate.wait()
+            for _ in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/orders/", headers=headers, json=body)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    logger.debug(f"Checkout failed: {e}")
+                    status = None
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status == 200:
+                    outcomes["created"] += 1
+                    order_ids.append(response.json()["id"])
+                elif status == 409:
+                    outcomes["out_of_stock"] += 1
+                else:
+                    outcomes["error"] += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+        started = time.perf_counter()
+        start_gate.set()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+        stock_after = read_stock(engine, args.product_id)
+        stats = summarize(latencies, 0, elapsed)
+        sold = outcomes["created"] * args.quantity
+
+        logger.info(
+            f"created={outcomes['created']} out_of_stock={outcomes['out_of_stock']} errors={outcomes['error']} "
+            f"rps={stats['throughput_rps']} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+        )
+        logger.info(f"Stock {stock_before} -> {stock_after}; units sold {sold}")
+
+        ok = True
+        if sold > stock_before:
+            logger.error(f"OVERSOLD: {sold} units sold with only {stock_before} in stock")
+            ok = False
+        if stock_after < 0:
+            logger.error(f"Stock went negative: {stock_after}")
+            ok = False
+        if stock_after != stock_before - sold:
+            logger.error(f"Stock mismatch: expected {stock_before - sold}, found {stock_after}")
+            ok = False
+        if outcomes["error"]:
+            logger.warning(f"{outcomes['error']} checkouts failed with unexpected errors")
+
+        if not args.keep_orders and order_ids:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def cancel(order_id: int):
+                async with semaphore:
+                    await client.post(f"/api/v1/orders/{order_id}/cancel", headers=headers)
+
+            await asyncio.gather(*(cancel(order_id) for order_id in order_ids))
+            logger.info(f"Cancelled {len(order_ids)} benchmark orders; stock is now {read_stock(engine, args.product_id)}")
+
+        return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check for overselling under concurrent checkouts")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--product-id", type=int, required=True)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--quantity", type=int, default=1, help="Units per checkout")
+    parser.add_argument("--shipping-id", type=int, default=1)
+    parser.add_argument("--address-id", type=int, help="Existing address to ship to")
+    parser.add_argument("--token", help="Bearer token of the customer placing the orders")
+    parser.add_argument("--login", nargs=2, metavar=("EMAIL", "PASSWORD"), help="Log in first and use the token")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL, help="Database to read stock from")
+    parser.add_argument("--keep-orders", action="store_true", help="Don't cancel the orders afterwards")
+    args = parser.parse_args()
+    if not args.token and not args.login:
+        parser.error("one of --token or --login is required")
+
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Measure request latency of a running API under concurrent load.
+
+Run it once against a server built before a change and once after, saving
+each run with --output, then compare the two:
+
+    python scripts/benchmark_latency.py --base-url http://localhost:8000 \
+        --concurrency 200 --requests 5000 --output before.json
+    python scripts/benchmark_latency.py ... --output after.json
+    python scripts/benchmark_latency.py --compare before.json after.json
+
+By default the catalog listing, product search and login endpoints are
+exercised; pass --path (repeatable) to target other routes.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATHS = [
+    "/api/v1/products/?limit=20",
+    "/api/v1/products/?limit=20&pagination=cursor&sort_by=price",
+    "/api/v1/products/search?q=shirt",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round((len(latencies) + errors) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p90_ms": round(percentile(ordered, 90), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/api/v1/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def run_load(base_url: str, paths: List[str], concurrency: int, total_requests: int,
+                   token: Optional[str] = None, login_credentials: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Issue `total_requests` GETs spread over `paths` with `concurrency` workers."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        if login_credentials:
+            token = await login(client, *login_credentials)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+        latencies: Dict[str, List[float]] = {path: [] for path in paths}
+        errors: Dict[str, int] = {path: 0 for path in paths}
+        counter = iter(range(total_requests))
+
+        async def worker():
+            for index in counter:
+                path = paths[index % len(paths)]
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                    ok = response.status_code < 500
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[path].append((time.perf_counter() - started) * 1000)
+                else:
+                    errors[path] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    results = {path: summarize(latencies[path], errors[path], elapsed) for path in paths}
+    results["all"] = summarize(
+        [value for values in latencies.values() for value in values],
+        sum(errors.values()),
+        elapsed,
+    )
+    return results
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    for path, stats in results.items():
+        logger.info(
+            f"{path}: n={stats['requests']} errors={stats['errors']} rps={stats['throughput_rps']} "
+            f"p50={stats['p50_ms']}ms p90={stats['p90_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+        )
+
+
+def compare(before_file: str, after_file: str) -> None:
+    with open(before_file) as f:
+        before = json.load(f)["results"]
+    with open(after_file) as f:
+        after = json.load(f)["results"]
+
+    for path in after:
+        if path not in before:
+            continue
+        parts = []
+        for metric in ("p50_ms", "p99_ms", "throughput_rps"):
+            old, new = before[path][metric], after[path][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            parts.append(f"{metric} {old} -> {new} ({change})")
+        logger.info(f"{path}: " + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API latency under concurrent load")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="Path to request (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--token", help="Bearer token sent with every request")
+    parser.add_argument("--login", nargs=2, metavar=("EMAIL", "PASSWORD"), help="Log in first and use the token")
+    parser.add_argument("--label", default="run", help="Name stored with the results")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved runs")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    paths = args.paths or DEFAULT_PATHS
+    logger.info(f"Running {args.requests} requests with {args.concurrency} concurrent clients against {args.base_url}")
+    results = asyncio.run(run_load(args.base_url, paths, args.concurrency, args.requests, args.token, args.login))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"label": args.label, "concurrency": args.concurrency, "results": results}, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(1)
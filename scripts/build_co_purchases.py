@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Build or catch up the co-purchase counts offline.
+
+    python scripts/build_co_purchases.py                  # count orders since the last run
+    python scripts/build_co_purchases.py --rebuild        # start over from the first order
+    python scripts/build_co_purchases.py --rerank         # re-rank every product from the counts
+
+The API runs the same incremental update periodically; use this for the
+initial backfill of a large order history (e.g. with a bigger
+--chunk-size) or after changing CO_PURCHASE_SCORE / CO_PURCHASE_TOP_K.
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Add the parent directory to the Python path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import co_purchases  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update co-purchase counts and frequently bought together lists")
+    parser.add_argument("--rebuild", action="store_true", help="Drop all counts and count every order again")
+    parser.add_argument("--rerank", action="store_true", help="Re-rank all products after counting")
+    parser.add_argument("--chunk-size", type=int, help="Orders per chunk (default CO_PURCHASE_CHUNK_ORDERS)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        logger.info("Dropping existing co-purchase counts")
+        co_purchases.reset_co_purchases()
+
+    counted = co_purchases.update_co_purchases(chunk_size=args.chunk_size)
+    logger.info(f"Counted {counted} order(s)")
+
+    if args.rerank:
+        logger.info(f"Wrote {co_purchases.rerank_all()} frequently bought together row(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Delete abandoned carts, orphaned customizations and unreferenced design files.
+
+    python scripts/cleanup_stale_rows.py --dry-run        # report what would be deleted
+    python scripts/cleanup_stale_rows.py                  # delete
+    python scripts/cleanup_stale_rows.py --vacuum         # delete, then VACUUM the cleaned tables
+
+The API runs the same cleanup periodically (CLEANUP_INTERVAL_SECONDS); use
+this to preview a run, or for the first cleanup of a large backlog with a
+bigger --batch-size during a quiet period.
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Add the parent directory to the Python path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from app.core.database import engine  # noqa: E402
+from app.services import cleanup  # noqa: E402
+
+VACUUM_TABLES = ("cart_items", "carts", "product_customizations")
+
+
+def vacuum() -> None:
+    """Reclaim the space of deleted rows right away instead of waiting for autovacuum."""
+    if engine.dialect.name != "postgresql":
+        logger.info(f"Skipping VACUUM on {engine.dialect.name}")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table in VACUUM_TABLES:
+            logger.info(f"VACUUM (ANALYZE) {table}")
+            connection.execute(text(f"VACUUM (ANALYZE) {table}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete abandoned carts and orphaned customizations")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be deleted without deleting")
+    parser.add_argument("--batch-size", type=int, help="Rows or files per batch (default CLEANUP_BATCH_SIZE)")
+    parser.add_argument("--pause", type=float, help="Seconds between batches (default CLEANUP_BATCH_PAUSE_SECONDS)")
+    parser.add_argument("--skip-files", action="store_true", help="Don't scan storage for unreferenced design files")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the cleaned tables afterwards (PostgreSQL)")
+    args = parser.parse_args()
+
+    metrics = cleanup.run_cleanup(
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        pause_seconds=args.pause,
+        include_files=not args.skip_files,
+    )
+    for name, value in metrics.items():
+        logger.info(f"{name}: {value}")
+
+    if args.vacuum and not args.dry_run:
+        vacuum()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Local SMTP server that accepts every message and keeps it instead of
+delivering it, for exercising the email outbox worker without a real
+mail provider.
+
+    python scripts/fake_smtp_sink.py --port 1025 --maildir /tmp/okyke-mail
+
+Point the API at it with:
+
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_STARTTLS=False \
+        MAIL_SSL_TLS=False USE_CREDENTIALS=False
+
+Each message is logged and, with --maildir, written out as a .eml file.
+--fail-rate makes the sink answer a share of messages with a temporary
+451 error so retries and backoff can be observed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class SinkSession:
+    """One client connection speaking a minimal subset of SMTP."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args: argparse.Namespace):
+        self.reader = reader
+        self.writer = writer
+        self.args = args
+        self.mail_from: Optional[str] = None
+        self.recipients: List[str] = []
+
+    async def reply(self, line: str) -> None:
+        self.writer.write(f"{line}\r\n".encode())
+        await self.writer.drain()
+
+    def reset(self) -> None:
+        self.mail_from = None
+        self.recipients = []
+
+    async def run(self) -> None:
+        await self.reply("220 okyke-fake-smtp ready")
+        while True:
+            raw = await self.reader.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            verb, _, argument = line.partition(" ")
+            verb = verb.upper()
+
+            if verb == "EHLO":
+                await self.reply("250-okyke-fake-smtp")
+                await self.reply("250-AUTH PLAIN LOGIN")
+                await self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                await self.reply("250 okyke-fake-smtp")
+            elif verb == "AUTH":
+                await self.authenticate(argument)
+            elif verb == "MAIL":
+                self.reset()
+                self.mail_from = argument.partition(":")[2].strip()
+                await self.reply("250 OK")
+            elif verb == "RCPT":
+                self.recipients.append(argument.partition(":")[2].strip())
+                await self.reply("250 OK")
+            elif verb == "DATA":
+                await self.receive_data()
+            elif verb == "RSET":
+                self.reset()
+                await self.reply("250 OK")
+            elif verb == "NOOP":
+                await self.reply("250 OK")
+            elif verb == "QUIT":
+                await self.reply("221 Bye")
+                return
+            else:
+                await self.reply("502 Command not implemented")
+
+    async def authenticate(self, argument: str) -> None:
+        # Any credentials are accepted
+        mechanism, _, initial = argument.partition(" ")
+        if mechanism.upper() == "LOGIN":
+            # Base64 "Username:" / "Password:" prompts
+            prompts = ["UGFzc3dvcmQ6"] if initial else ["VXNlcm5hbWU6", "UGFzc3dvcmQ6"]
+            for prompt in prompts:
+                await self.reply(f"334 {prompt}")
+                await self.reader.readline()
+        elif mechanism.upper() == "PLAIN" and not initial:
+            await self.reply("334 ")
+            await self.reader.readline()
+        await self.reply("235 Authentication successful")
+
+    async def receive_data(self) -> None:
+        if not self.recipients:
+            await self.reply("503 Need RCPT first")
+            return
+        await self.reply("354 End data with <CR><LF>.<CR><LF>")
+        lines = []
+        while True:
+            raw = await self.reader.readline()
+            if not raw or raw in (b".\r\n", b".\n"):
+                break
+            # Undo dot-stuffing
+            lines.append(raw[1:] if raw.startswith(b"..") else raw)
+        body = b"".join(lines)
+
+        if random.random() < self.args.fail_rate:
+            logger.info(f"Rejecting message for {', '.join(self.recipients)} with a temporary error")
+            await self.reply("451 Temporary failure, try again later")
+            self.reset()
+            return
+
+        self.store(body)
+        await self.reply("250 OK: queued")
+        self.reset()
+
+    def store(self, body: bytes) -> None:
+        subject = next(
+            (line[len("Subject:"):].strip() for line in body.decode(errors="replace").splitlines()
+             if line.lower().startswith("subject:")),
+            "",
+        )
+        logger.info(f"Received message from {self.mail_from} to {', '.join(self.recipients)}: {subject!r} ({len(body)} bytes)")
+        if self.args.maildir:
+            os.makedirs(self.args.maildir, exist_ok=True)
+            path = os.path.join(self.args.maildir, f"{time.time_ns()}.eml")
+            with open(path, "wb") as f:
+                f.write(body)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await SinkSession(reader, writer, args).run()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, args.host, args.port)
+    logger.info(f"Fake SMTP sink listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--maildir", help="Directory to write received messages to as .eml files")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of messages to answer with a temporary 451 error (0-1)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
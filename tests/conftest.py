@@ -0,0 +1,127 @@
+"""
+Shared fixtures: the API runs against a throwaway SQLite database that is
+recreated for every test, with the in-process caches reset alongside it.
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Must be set before app.core.config is imported
+_db_dir = tempfile.mkdtemp(prefix="okyke-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["GUEST_CART_BACKEND"] = "memory"
+os.environ["BACKGROUND_TASKS_ENABLED"] = "False"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.core.async_database import async_engine  # noqa: E402
+from app.core.cache import set_cache_backend  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.models.models import (  # noqa: E402
+    Address, Category, Product, ProductImage, ProductStatus, Shipping, User, UserRole,
+)
+from app.services import guest_cart  # noqa: E402
+from app.services.product_counts import count_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    set_cache_backend(None)
+    count_cache.invalidate()
+    guest_cart.set_store(None)
+    yield
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Not used as a context manager, so startup (seeding, background tasks) doesn't run
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def queries():
+    """SQL statements executed (on the sync and async engines) while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    yield statements
+    for target in engines:
+        event.remove(target, "before_cursor_execute", record)
+
+
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+
+@pytest.fixture
+def catalog(db):
+    """An admin, a customer, a two-level category tree and published products with images."""
+
+    def build(products: int = 10) -> SimpleNamespace:
+        admin = User(email="admin@example.com", hashed_password=get_password_hash("secret"),
+                     first_name="Ada", last_name="Admin", role=UserRole.ADMIN, is_active=True)
+        customer = User(email="customer@example.com", hashed_password=get_password_hash("secret"),
+                        first_name="Cy", last_name="Customer", role=UserRole.USER, is_active=True)
+        db.add_all([admin, customer])
+        db.flush()
+        category = Category(name="Clothing")
+        db.add(category)
+        db.flush()
+        subcategory = Category(name="Shirts", parent_id=category.id)
+        db.add(subcategory)
+        db.flush()
+
+        product_ids = []
+        for i in range(products):
+            product = Product(
+                name=f"Product {i}", slug=f"product-{i}", description=f"Product {i}", price=10 + i, stock=5,
+                category_id=subcategory.id if i % 3 == 0 else category.id, status=ProductStatus.PUBLISHED,
+                views_count=0, sales_count=0, rating=0, reviews_count=0, low_stock_threshold=2,
+                is_featured=False, is_customizable=False,
+            )
+            db.add(product)
+            db.flush()
+            for position in range(2):
+                image = ProductImage(product_id=product.id, url=f"http://images/{i}/{position}.jpg", position=position)
+                db.add(image)
+                db.flush()
+            product.featured_image_id = image.id
+            product_ids.append(product.id)
+
+        shipping = Shipping(name="Standard", price=5)
+        address = Address(user_id=customer.id, address_line1="1 Main St", city="Lagos", state="LA",
+                          postal_code="100001", country="NG")
+        db.add_all([shipping, address])
+        db.commit()
+        return SimpleNamespace(
+            admin_id=admin.id, customer_id=customer.id, category_id=category.id, subcategory_id=subcategory.id,
+            product_ids=product_ids, shipping_id=shipping.id, address_id=address.id,
+        )
+
+    return build
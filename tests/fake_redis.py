@@ -0,0 +1,220 @@
+"""
+In-process stand-in for the subset of redis.Redis (decode_responses=True)
+the cache and guest cart stores use, including pipelines and WATCH/MULTI
+transactions.
+"""
+import threading
+import time
+
+from redis.exceptions import WatchError
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._versions = {}
+        self.lock = threading.RLock()
+        self.down = False
+
+    # Internals
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("Redis is down")
+
+    def _alive(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _touch(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    # Strings
+
+    def get(self, key):
+        with self.lock:
+            self._check()
+            return self._data.get(key) if self._alive(key) else None
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            self._check()
+            if nx and self._alive(key):
+                return None
+            self._data[key] = str(value)
+            self._expires.pop(key, None)
+            if px:
+                self._expires[key] = time.monotonic() + px / 1000
+            self._touch(key)
+            return True
+
+    def incr(self, key):
+        with self.lock:
+            self._check()
+            value = int(self._data.get(key, 0) if self._alive(key) else 0) + 1
+            self._data[key] = str(value)
+            self._touch(key)
+            return value
+
+    # Keys
+
+    def delete(self, *keys):
+        with self.lock:
+            self._check()
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+                self._touch(key)
+            return removed
+
+    def exists(self, key):
+        with self.lock:
+            self._check()
+            return int(self._alive(key))
+
+    def expire(self, key, seconds):
+        with self.lock:
+            self._check()
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def ttl(self, key):
+        with self.lock:
+            if not self._alive(key):
+                return -2
+            expires_at = self._expires.get(key)
+            return -1 if expires_at is None else int(expires_at - time.monotonic())
+
+    def rename(self, key, new_key):
+        with self.lock:
+            self._check()
+            if not self._alive(key):
+                raise Exception("ERR no such key")
+            self._data[new_key] = self._data.pop(key)
+            expires_at = self._expires.pop(key, None)
+            self._expires.pop(new_key, None)
+            if expires_at is not None:
+                self._expires[new_key] = expires_at
+            self._touch(key)
+            self._touch(new_key)
+            return True
+
+    # Hashes
+
+    def _hash(self, key, create=False):
+        if not self._alive(key):
+            if not create:
+                return {}
+            self._data[key] = {}
+        return self._data[key]
+
+    def hgetall(self, key):
+        with self.lock:
+            self._check()
+            return dict(self._hash(key))
+
+    def hkeys(self, key):
+        with self.lock:
+            self._check()
+            return list(self._hash(key))
+
+    def hlen(self, key):
+        with self.lock:
+            self._check()
+            return len(self._hash(key))
+
+    def hexists(self, key, field):
+        with self.lock:
+            self._check()
+            return field in self._hash(key)
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self._check()
+            fields = self._hash(key, create=True)
+            added = int(field not in fields)
+            fields[field] = str(value)
+            self._touch(key)
+            return added
+
+    def hincrby(self, key, field, amount):
+        with self.lock:
+            self._check()
+            fields = self._hash(key, create=True)
+            fields[field] = str(int(fields.get(field, 0)) + amount)
+            self._touch(key)
+            return int(fields[field])
+
+    def hdel(self, key, *fields):
+        with self.lock:
+            self._check()
+            existing = self._hash(key)
+            removed = sum(1 for field in fields if existing.pop(field, None) is not None)
+            if key in self._data and not existing:
+                self.delete(key)
+            self._touch(key)
+            return removed
+
+    def pipeline(self, transaction=True):
+        self._check()
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands until execute(); after watch(), commands run immediately until multi()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+        self.watched = {}
+        self.buffering = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self.commands = []
+        self.watched = {}
+        self.buffering = True
+
+    def watch(self, *keys):
+        self.client._check()
+        self.watched = {key: self.client._versions.get(key, 0) for key in keys}
+        self.buffering = False
+
+    def multi(self):
+        self.buffering = True
+
+    def execute(self):
+        with self.client.lock:
+            self.client._check()
+            for key, version in self.watched.items():
+                if self.client._versions.get(key, 0) != version:
+                    self.reset()
+                    raise WatchError(key)
+            results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.reset()
+        return results
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            if not self.buffering:
+                return command(*args, **kwargs)
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return call
@@ -0,0 +1,94 @@
+import asyncio
+
+from passlib.hash import bcrypt
+
+from app.core import principal, security
+from app.core.config import settings
+from app.models.models import User, UserRole
+from tests.conftest import auth_headers
+
+
+def _set_role(db, user_id, role):
+    db.get(User, user_id).role = role
+    db.commit()
+
+
+def test_role_change_applies_once_the_principal_is_invalidated(client, catalog, db):
+    shop = catalog(products=0)
+    headers = auth_headers(shop.customer_id)
+    assert client.get("/api/v1/health/cache", headers=headers).status_code == 403
+
+    _set_role(db, shop.customer_id, UserRole.ADMIN)
+    # Still served from the principal cache
+    assert client.get("/api/v1/health/cache", headers=headers).status_code == 403
+
+    principal.invalidate_principal(shop.customer_id)
+    assert client.get("/api/v1/health/cache", headers=headers).status_code == 200
+
+
+def test_demotion_revokes_admin_access_after_invalidation(client, catalog, db):
+    shop = catalog(products=0)
+    headers = auth_headers(shop.admin_id)
+    assert client.get("/api/v1/health/cache", headers=headers).status_code == 200
+
+    _set_role(db, shop.admin_id, UserRole.USER)
+    principal.invalidate_principal(shop.admin_id, "admin@example.com")
+
+    assert client.get("/api/v1/health/cache", headers=headers).status_code == 403
+
+
+def test_principal_cache_is_used_off_the_event_loop(client, catalog, monkeypatch):
+    shop = catalog(products=0)
+    calls = []
+
+    def record(method):
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls.append("event loop")
+            except RuntimeError:
+                calls.append("thread")
+            return method(*args, **kwargs)
+        return call
+
+    cache = principal.principal_cache
+    monkeypatch.setattr(cache, "get", record(cache.get))
+    monkeypatch.setattr(cache, "set", record(cache.set))
+
+    for _ in range(2):
+        assert client.get("/api/v1/health/", headers=auth_headers(shop.customer_id)).status_code == 200
+
+    # A miss (get + set), then a hit
+    assert calls == ["thread"] * 3
+
+
+def _login(client, password="secret"):
+    return client.post("/api/v1/auth/login", data={"username": "customer@example.com", "password": password})
+
+
+def test_login_replaces_a_hash_with_an_outdated_cost(client, catalog, db):
+    shop = catalog(products=0)
+    db.get(User, shop.customer_id).hashed_password = bcrypt.using(rounds=4).hash("secret")
+    db.commit()
+
+    assert _login(client, "wrong").status_code == 400
+    response = _login(client)
+
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    stored = db.get(User, shop.customer_id).hashed_password
+    assert bcrypt.from_string(stored).rounds == settings.BCRYPT_ROUNDS
+    assert _login(client).status_code == 200
+
+
+def test_login_is_shed_with_503_when_hashing_is_saturated(client, catalog, monkeypatch):
+    catalog(products=0)
+    monkeypatch.setattr(security, "_hash_slots", security.threading.BoundedSemaphore(1))
+    security._hash_slots.acquire()
+
+    response = _login(client)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    security._hash_slots.release()
+    assert _login(client).status_code == 200
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from app.core.cache import LOCAL_LOCK_STRIPES, RedisCacheBackend, VersionedCache
+from tests.fake_redis import FakeRedis
+
+
+def _worker_caches(count=2, ttl=60):
+    """Caches of `count` separate workers sharing one Redis."""
+    redis = FakeRedis()
+    return redis, [VersionedCache("products", ttl, backend=RedisCacheBackend(client=redis)) for _ in range(count)]
+
+
+def test_get_or_set_loads_once_and_is_shared_between_workers():
+    _, (worker_a, worker_b) = _worker_caches()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"id": 1, "name": "Shirt"}
+
+    assert worker_a.get_or_set("id:1", loader) == {"id": 1, "name": "Shirt"}
+    assert worker_b.get_or_set("id:1", loader) == {"id": 1, "name": "Shirt"}
+    assert len(loads) == 1
+
+
+def test_invalidate_all_in_one_worker_drops_entries_in_every_worker():
+    _, (worker_a, worker_b) = _worker_caches()
+    worker_a.set("id:1", {"name": "old"})
+
+    worker_b.invalidate_all()
+
+    assert worker_a.get_or_set("id:1", lambda: {"name": "new"}) == {"name": "new"}
+
+
+def test_concurrent_misses_across_workers_run_the_loader_once():
+    _, workers = _worker_caches(count=4)
+    loads = []
+    results = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda cache=cache: results.append(cache.get_or_set("hot", loader)))
+        for cache in workers for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * len(threads)
+    assert len(loads) == 1
+
+
+def test_none_is_returned_but_not_cached():
+    _, (cache,) = _worker_caches(count=1)
+    assert cache.get_or_set("missing", lambda: None) is None
+    assert cache.get_or_set("missing", lambda: "found") == "found"
+
+
+def test_redis_outage_degrades_to_loading():
+    redis, (cache,) = _worker_caches(count=1)
+    cache.set("id:1", "cached")
+    redis.down = True
+
+    assert cache.get_or_set("id:1", lambda: "loaded") == "loaded"
+    assert cache.backend.stats()["errors"] > 0
+
+
+def test_entries_expire_with_their_ttl():
+    _, (cache,) = _worker_caches(count=1, ttl=0.05)
+    cache.set("id:1", "value")
+    time.sleep(0.1)
+    assert cache.get_or_set("id:1", lambda: "reloaded") == "reloaded"
+
+
+def test_local_locks_do_not_grow_with_keys():
+    _, (cache,) = _worker_caches(count=1)
+    for i in range(1000):
+        cache.get_or_set(f"slug:product-{i}", lambda: None)
+    assert len(cache._local_locks) == LOCAL_LOCK_STRIPES
@@ -0,0 +1,71 @@
+from sqlalchemy import func, select
+
+from app.models.models import CartItem
+from tests.conftest import auth_headers
+
+
+def _lines(db):
+    db.expire_all()
+    return dict(db.execute(select(CartItem.product_id, CartItem.quantity)).all())
+
+
+def test_adding_a_product_twice_increments_one_line(client, catalog, db):
+    shop = catalog(products=1)
+    headers = auth_headers(shop.customer_id)
+
+    first = client.post("/api/v1/cart/items", headers=headers, json={"product_id": shop.product_ids[0], "quantity": 1})
+    second = client.post("/api/v1/cart/items", headers=headers, json={"product_id": shop.product_ids[0], "quantity": 2})
+
+    assert first.status_code == second.status_code == 200, second.text
+    assert first.json()["id"] == second.json()["id"]
+    assert second.json()["quantity"] == 3
+    assert db.scalar(select(func.count()).select_from(CartItem)) == 1
+
+
+def test_batch_add_merges_repeated_and_existing_lines(client, catalog, db):
+    shop = catalog(products=2)
+    headers = auth_headers(shop.customer_id)
+    first, other = shop.product_ids
+    client.post("/api/v1/cart/items", headers=headers, json={"product_id": first, "quantity": 1})
+
+    response = client.post("/api/v1/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": first, "quantity": 2},
+        {"product_id": other, "quantity": 1},
+        {"product_id": first, "quantity": 1},
+    ]})
+
+    assert response.status_code == 200, response.text
+    assert _lines(db) == {first: 4, other: 1}
+    cart = response.json()
+    assert len(cart["items"]) == 2
+    # Product 0 costs 10, product 1 costs 11
+    assert (cart["subtotal"], cart["total_items"]) == (51, 5)
+
+
+def test_batch_with_an_unknown_product_adds_nothing(client, catalog, db):
+    shop = catalog(products=1)
+
+    response = client.post("/api/v1/cart/items/batch", headers=auth_headers(shop.customer_id), json={"items": [
+        {"product_id": shop.product_ids[0], "quantity": 1},
+        {"product_id": 999, "quantity": 1},
+    ]})
+
+    assert response.status_code == 404
+    assert _lines(db) == {}
+
+
+def test_cart_view_query_count_does_not_grow_with_items(client, catalog, queries):
+    shop = catalog(products=4)
+    headers = auth_headers(shop.customer_id)
+
+    counts = {}
+    for product_id in shop.product_ids:
+        client.post("/api/v1/cart/items", headers=headers, json={"product_id": product_id, "quantity": 2})
+        queries.clear()
+        cart = client.get("/api/v1/cart/", headers=headers).json()
+        counts[len(cart["items"])] = len(queries)
+
+    assert counts[4] == counts[1] == 1
+    # Products 0-3 cost 10, 11, 12 and 13
+    assert (cart["subtotal"], cart["total_items"]) == (92, 8)
+    assert [item["line_total"] for item in cart["items"]] == [20, 22, 24, 26]
@@ -0,0 +1,93 @@
+import pytest
+
+from app.models.models import Category, Product
+from app.services import category_tree
+from tests.conftest import auth_headers
+
+
+def test_category_tree_is_nested_and_served_from_cache(client, catalog, queries):
+    data = catalog(products=1)
+
+    queries.clear()
+    first = client.get("/api/v1/categories/tree")
+    assert first.status_code == 200
+    assert len(queries) == 1
+    (root,) = first.json()
+    assert root["id"] == data.category_id
+    assert [child["id"] for child in root["children"]] == [data.subcategory_id]
+
+    queries.clear()
+    assert client.get("/api/v1/categories/tree").json() == first.json()
+    assert queries == []
+
+
+def test_category_list_is_served_from_cache(client, catalog, queries):
+    catalog(products=1)
+
+    first = client.get("/api/v1/categories/")
+    queries.clear()
+    second = client.get("/api/v1/categories/")
+
+    assert second.json() == first.json()
+    assert len(first.json()) == 2
+    assert queries == []
+
+
+def test_deleting_a_subcategory_refreshes_subtree_totals(client, catalog, db):
+    data = catalog(products=6)
+    # A featured image and its product reference each other, which the delete cascade cannot order
+    db.query(Product).update({"featured_image_id": None})
+    db.commit()
+    subtree = f"/api/v1/products/?category_id={data.category_id}&include_subcategories=true&limit=2"
+    assert client.get(subtree).json()["total"] == 6
+
+    response = client.delete(f"/api/v1/categories/{data.subcategory_id}", headers=auth_headers(data.admin_id))
+    assert response.status_code == 200, response.text
+
+    # Products 0 and 3 were in the subcategory and went with it
+    assert client.get(subtree).json()["total"] == 4
+
+
+def test_subtree_filter_includes_descendants_only_when_asked(client, catalog):
+    data = catalog(products=6)
+
+    def listed(query):
+        return sorted(item["id"] for item in client.get(f"/api/v1/products/?{query}").json()["items"])
+
+    in_subcategory = [data.product_ids[0], data.product_ids[3]]
+    assert listed(f"category_id={data.category_id}&include_subcategories=true") == data.product_ids
+    assert listed(f"category_id={data.category_id}") == sorted(set(data.product_ids) - set(in_subcategory))
+    assert listed(f"category_id={data.subcategory_id}&include_subcategories=true") == in_subcategory
+
+
+def test_category_cannot_move_under_itself_or_a_descendant(catalog, db):
+    data = catalog(products=0)
+    parent = db.get(Category, data.category_id)
+    leaf = Category(name="Polo", parent_id=data.subcategory_id)
+    db.add(leaf)
+    db.commit()
+
+    for new_parent in (data.category_id, data.subcategory_id, leaf.id):
+        with pytest.raises(ValueError):
+            category_tree.check_parent(db, parent, new_parent)
+    with pytest.raises(ValueError):
+        category_tree.check_parent(db, parent, 999)
+    category_tree.check_parent(db, db.get(Category, leaf.id), data.category_id)
+
+
+def test_moving_a_branch_rewrites_its_paths(catalog, db):
+    data = catalog(products=0)
+    other = Category(name="Sale")
+    db.add(other)
+    db.flush()
+    leaf = Category(name="Polo", parent_id=data.subcategory_id)
+    db.add(leaf)
+    db.commit()
+
+    db.get(Category, data.subcategory_id).parent_id = other.id
+    db.commit()
+
+    moved = db.scalars(category_tree.subtree_ids(other.id)).all()
+    assert sorted(moved) == sorted([other.id, data.subcategory_id, leaf.id])
+    assert db.scalars(category_tree.subtree_ids(data.category_id)).all() == [data.category_id]
+    assert db.get(Category, leaf.id).depth == 2
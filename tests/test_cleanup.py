@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import local_s3
+import pytest
+from sqlalchemy import func, select
+
+from app.models.models import Cart, CartItem, ProductCustomization
+from app.services import cleanup
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_s3, "LOCAL_STORAGE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _design_file(key, age_days):
+    path = cleanup._design_path(cleanup.DESIGN_PREFIX + key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    old = (datetime.now() - timedelta(days=age_days)).timestamp()
+    os.utime(path, (old, old))
+    return path
+
+
+@pytest.fixture
+def leftovers(catalog, db, storage):
+    """A stale and a fresh cart, an orphaned and a used customization, and a stray design file."""
+    shop = catalog(products=2)
+    old = datetime.now(timezone.utc) - timedelta(days=60)
+    url = f"http://files/{cleanup.DESIGN_BUCKET}/{cleanup.DESIGN_PREFIX}"
+
+    orphan = ProductCustomization(user_id=shop.customer_id, product_id=shop.product_ids[0],
+                                  rendered_image_url=url + "orphan.png", created_at=old)
+    used = ProductCustomization(user_id=shop.admin_id, product_id=shop.product_ids[0],
+                                rendered_image_url=url + "used.png", created_at=old)
+    stale = Cart(user_id=shop.customer_id, created_at=old, updated_at=old)
+    fresh = Cart(user_id=shop.admin_id)
+    db.add_all([orphan, used, stale, fresh])
+    db.flush()
+    db.add_all([
+        CartItem(cart_id=stale.id, product_id=product_id, quantity=1, created_at=old, updated_at=old)
+        for product_id in shop.product_ids
+    ])
+    db.add(CartItem(cart_id=fresh.id, product_id=shop.product_ids[0], quantity=1, product_customization_id=used.id))
+    db.commit()
+    return {
+        "orphan": _design_file("orphan.png", age_days=60),
+        "used": _design_file("used.png", age_days=60),
+        "stray": _design_file("stray.png", age_days=60),
+        "recent": _design_file("recent.png", age_days=0),
+    }
+
+
+def _count(db, model):
+    db.expire_all()
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_dry_run_counts_without_deleting(db, leftovers):
+    metrics = cleanup.run_cleanup(dry_run=True, pause_seconds=0)
+
+    assert (metrics["carts"], metrics["cart_items"], metrics["customizations"]) == (1, 2, 1)
+    # The orphan's image is still referenced until its row is really deleted
+    assert (metrics["files"], metrics["bytes"]) == (1, 10)
+    assert (_count(db, Cart), _count(db, CartItem), _count(db, ProductCustomization)) == (2, 3, 2)
+    assert all(os.path.exists(path) for path in leftovers.values())
+
+
+def test_cleanup_deletes_what_the_dry_run_counted(db, leftovers):
+    dry_run = cleanup.run_cleanup(dry_run=True, pause_seconds=0)
+
+    metrics = cleanup.run_cleanup(batch_size=1, pause_seconds=0)
+
+    for key in ("carts", "cart_items", "customizations"):
+        assert metrics[key] == dry_run[key]
+    assert (_count(db, Cart), _count(db, CartItem), _count(db, ProductCustomization)) == (1, 1, 1)
+    assert metrics["files"] == 2
+    assert {name for name, path in leftovers.items() if os.path.exists(path)} == {"used", "recent"}
@@ -0,0 +1,5 @@
+def test_cross_origin_clients_can_read_pagination_and_cart_headers(client):
+    response = client.get("/api/v1/cart/guest", headers={"Origin": "http://localhost:3000"})
+
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "x-total-count", "etag", "x-cart-token"} <= exposed
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import aiosmtplib
+import pytest
+
+from app.core.async_database import async_engine
+from app.core.config import settings
+from app.core.email import enqueue_email
+from app.models.models import EmailOutbox, EmailOutboxStatus
+from app.services import email_outbox
+
+
+class FakeSMTP:
+    """Records delivered recipients; `errors` maps a recipient to the exception its send raises."""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+
+    async def send_message(self, message):
+        error = self.errors.get(message["To"])
+        if error:
+            raise error
+        self.sent.append(message["To"])
+
+    async def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = FakeSMTP()
+
+    async def connect():
+        return server
+
+    monkeypatch.setattr(email_outbox, "_open_connection", connect)
+    return server
+
+
+def _run(job):
+    """Run a worker coroutine, closing its pooled connections before the event loop goes away."""
+
+    async def run():
+        try:
+            return await job
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+def _queue(db, *recipients, due_in=timedelta(0)):
+    rows = [enqueue_email(db, recipient, "Hello", "<p>Hi</p>") for recipient in recipients]
+    for row in rows:
+        row.next_attempt_at = datetime.now(timezone.utc) + due_in
+    db.commit()
+    return [row.id for row in rows]
+
+
+def _outbox(db, email_id):
+    db.expire_all()
+    return db.get(EmailOutbox, email_id)
+
+
+def test_due_emails_are_sent_once_over_one_connection(db, smtp):
+    due = _queue(db, "a@example.com", "b@example.com")
+    later = _queue(db, "later@example.com", due_in=timedelta(hours=1))
+
+    assert _run(email_outbox.drain_outbox()) == 2
+    assert _run(email_outbox.drain_outbox()) == 0
+
+    assert smtp.sent == ["a@example.com", "b@example.com"]
+    assert {_outbox(db, email_id).status for email_id in due} == {EmailOutboxStatus.SENT}
+    assert _outbox(db, later[0]).status == EmailOutboxStatus.PENDING
+
+
+def test_claimed_emails_are_leased_to_one_worker(db):
+    _queue(db, "a@example.com")
+
+    first = _run(email_outbox.claim_batch(10))
+    second = _run(email_outbox.claim_batch(10))
+
+    assert [row.recipient for row in first] == ["a@example.com"] and second == []
+    assert first[0].attempts == 1
+
+
+def test_temporary_failure_is_retried_with_backoff(db, smtp):
+    email_id = _queue(db, "flaky@example.com")[0]
+    smtp.errors["flaky@example.com"] = aiosmtplib.SMTPResponseException(451, "try again later")
+
+    assert _run(email_outbox.drain_outbox()) == 0
+
+    row = _outbox(db, email_id)
+    assert (row.status, row.attempts) == (EmailOutboxStatus.PENDING, 1)
+    assert "try again later" in row.last_error
+    delay = row.next_attempt_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)
+    assert timedelta(0) < delay <= timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS)
+
+    smtp.errors.clear()
+    row.next_attempt_at = datetime.now(timezone.utc)
+    db.commit()
+    assert _run(email_outbox.drain_outbox()) == 1
+    assert _outbox(db, email_id).status == EmailOutboxStatus.SENT
+
+
+def test_permanent_rejection_and_exhausted_retries_give_up(db, smtp, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 1)
+    rejected, flaky = _queue(db, "nobody@example.com", "flaky@example.com")
+    smtp.errors["nobody@example.com"] = aiosmtplib.SMTPResponseException(550, "no such user")
+    smtp.errors["flaky@example.com"] = aiosmtplib.SMTPResponseException(451, "try again later")
+
+    _run(email_outbox.drain_outbox())
+
+    assert _outbox(db, rejected).status == EmailOutboxStatus.FAILED
+    assert _outbox(db, flaky).status == EmailOutboxStatus.FAILED
+
+
+def test_retry_delay_doubles_up_to_the_cap():
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS
+    assert [email_outbox.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)] == [base, 2 * base, 4 * base]
+    assert email_outbox.retry_delay(50).total_seconds() == settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.crud.crud_cart import cart_item as crud_cart_item
+from app.models.models import Cart, CartItem
+from app.services import guest_cart
+from tests.fake_redis import FakePipeline, FakeRedis
+
+TOKEN = "guest-token-0123456789"
+
+
+class SlowPipeline(FakePipeline):
+    """Pauses after every round trip, so concurrent writers read the same cart before either writes."""
+
+    def execute(self):
+        results = super().execute()
+        time.sleep(0.02)
+        return results
+
+    def __getattr__(self, name):
+        call = super().__getattr__(name)
+
+        def slow_call(*args, **kwargs):
+            result = call(*args, **kwargs)
+            if not self.buffering:
+                time.sleep(0.02)
+            return result
+
+        return slow_call
+
+
+class SlowRedis(FakeRedis):
+    def pipeline(self, transaction=True):
+        self._check()
+        return SlowPipeline(self)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    store = guest_cart.create_store(request.param, client=SlowRedis() if request.param == "redis" else None)
+    guest_cart.set_store(store)
+    return store
+
+
+def _run_concurrently(*targets):
+    errors = []
+
+    def run(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_adds_cannot_exceed_the_item_limit(store, monkeypatch):
+    monkeypatch.setattr(settings, "GUEST_CART_MAX_ITEMS", 2)
+
+    errors = _run_concurrently(*(lambda product_id=product_id: store.add_items(TOKEN, {product_id: 1})
+                                 for product_id in range(1, 5)))
+
+    assert len(store.get_items(TOKEN)) == 2
+    assert len(errors) == 2 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_concurrent_adds_of_one_product_all_count(store):
+    errors = _run_concurrently(*(lambda: store.add_items(TOKEN, {7: 1}) for _ in range(4)))
+
+    assert errors == []
+    assert store.get_items(TOKEN) == {7: 4}
+
+
+def test_concurrent_merges_add_the_guest_cart_once(store, catalog, db):
+    shop = catalog(products=2)
+    store.add_items(TOKEN, {shop.product_ids[0]: 2, shop.product_ids[1]: 1})
+
+    merge = lambda: guest_cart.merge_into_user_cart(shop.customer_id, TOKEN)  # noqa: E731
+    assert _run_concurrently(merge, merge) == []
+
+    quantities = dict(db.execute(
+        select(CartItem.product_id, CartItem.quantity).join(Cart).where(Cart.user_id == shop.customer_id)
+    ).all())
+    assert quantities == {shop.product_ids[0]: 2, shop.product_ids[1]: 1}
+    assert store.get_items(TOKEN) == {}
+
+
+def test_failed_merge_puts_the_guest_cart_back(store, catalog, monkeypatch):
+    shop = catalog(products=1)
+    store.add_items(TOKEN, {shop.product_ids[0]: 3})
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(crud_cart_item, "add_items", fail)
+    with pytest.raises(RuntimeError):
+        guest_cart.merge_into_user_cart(shop.customer_id, TOKEN)
+
+    assert store.get_items(TOKEN) == {shop.product_ids[0]: 3}
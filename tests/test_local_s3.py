@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+import local_s3
+
+
+class FailingFile(io.BytesIO):
+    """Fails after the first chunk, like a client disconnecting mid-upload."""
+
+    def read(self, size=-1):
+        if self.tell():
+            raise ConnectionResetError("client went away")
+        return super().read(size)
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_s3, "UPLOAD_CHUNK_SIZE", 4)
+    return local_s3.LocalS3Client(storage_dir=str(tmp_path))
+
+
+def _stored(tmp_path):
+    return sorted(str(path.relative_to(tmp_path)) for path in tmp_path.rglob("*") if path.is_file())
+
+
+def test_upload_is_streamed_in_chunks_and_checksummed(s3, tmp_path):
+    data = b"0123456789"
+
+    result = asyncio.run(s3.upload_fileobj(io.BytesIO(data), "bucket", "designs/a.png"))
+
+    assert result == {"key": "designs/a.png", "size": 10, "sha256": hashlib.sha256(data).hexdigest()}
+    assert (tmp_path / "bucket" / "designs" / "a.png").read_bytes() == data
+    assert _stored(tmp_path) == ["bucket/designs/a.png"]
+
+
+def test_oversized_upload_is_rejected_and_leaves_no_part_file(s3, tmp_path):
+    with pytest.raises(local_s3.UploadTooLarge):
+        asyncio.run(s3.upload_fileobj(io.BytesIO(b"0123456789"), "bucket", "big.png", max_size=9))
+
+    assert _stored(tmp_path) == []
+
+
+def test_declared_size_over_the_limit_is_rejected_before_reading(s3, tmp_path):
+    upload = io.BytesIO(b"small")
+    upload.size = 100
+
+    with pytest.raises(local_s3.UploadTooLarge):
+        asyncio.run(s3.upload_fileobj(upload, "bucket", "big.png", max_size=10))
+
+    assert upload.tell() == 0
+    assert _stored(tmp_path) == []
+
+
+def test_failed_upload_keeps_the_previous_object(s3, tmp_path):
+    asyncio.run(s3.upload_fileobj(io.BytesIO(b"old"), "bucket", "a.png"))
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(s3.upload_fileobj(FailingFile(b"0123456789"), "bucket", "a.png"))
+
+    assert (tmp_path / "bucket" / "a.png").read_bytes() == b"old"
+    assert _stored(tmp_path) == ["bucket/a.png"]
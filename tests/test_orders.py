@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.models import InventoryReservation, Order, Product, ReservationStatus
+from app.services import inventory
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def place_order(client, catalog):
+    """Checks out 2 units of the first product as the customer; returns (shop, order_id)."""
+
+    def place(shop=None):
+        shop = shop or catalog(products=1)
+        response = client.post(
+            "/api/v1/orders/",
+            headers=auth_headers(shop.customer_id),
+            json={
+                "shipping_address_id": shop.address_id,
+                "billing_address_id": shop.address_id,
+                "shipping_id": shop.shipping_id,
+                "items": [{"product_id": shop.product_ids[0], "quantity": 2}],
+                "subtotal": 20,
+                "shipping_cost": 5,
+                "tax": 0,
+                "total_amount": 25,
+            },
+        )
+        assert response.status_code == 200, response.text
+        return shop, response.json()["id"]
+
+    return place
+
+
+def _stock_and_sales(db, product_id):
+    db.expire_all()
+    product = db.get(Product, product_id)
+    return product.stock, product.sales_count
+
+
+def _reservation_statuses(db, order_id):
+    db.expire_all()
+    return {r.status for r in db.query(InventoryReservation).filter_by(order_id=order_id)}
+
+
+def test_customer_cannot_mark_their_order_paid_or_shipped(client, db, place_order):
+    shop, order_id = place_order()
+
+    for changes in ({"payment_status": "paid"}, {"status": "shipped"}, {"status": "processing"}):
+        response = client.put(f"/api/v1/orders/{order_id}", headers=auth_headers(shop.customer_id), json=changes)
+        assert response.status_code == 403
+
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.ACTIVE}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (3, 0)
+
+
+def test_admin_marking_an_order_paid_commits_the_sale(client, db, place_order):
+    shop, order_id = place_order()
+
+    response = client.put(f"/api/v1/orders/{order_id}", headers=auth_headers(shop.admin_id), json={"payment_status": "paid"})
+
+    assert response.status_code == 200, response.text
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.COMMITTED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (3, 2)
+
+
+def test_customer_cancel_of_a_pending_order_returns_the_stock(client, db, place_order):
+    shop, order_id = place_order()
+
+    response = client.post(f"/api/v1/orders/{order_id}/cancel", headers=auth_headers(shop.customer_id))
+
+    assert response.status_code == 200, response.text
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.RELEASED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (5, 0)
+
+
+@pytest.mark.parametrize("action", ["cancel", "update", "delete"])
+def test_customer_cannot_undo_a_shipped_sale(client, db, place_order, action):
+    shop, order_id = place_order()
+    admin, customer = auth_headers(shop.admin_id), auth_headers(shop.customer_id)
+    assert client.put(f"/api/v1/orders/{order_id}", headers=admin, json={"status": "shipped"}).status_code == 200
+
+    if action == "cancel":
+        response = client.post(f"/api/v1/orders/{order_id}/cancel", headers=customer)
+    elif action == "update":
+        response = client.put(f"/api/v1/orders/{order_id}", headers=customer, json={"status": "cancelled"})
+    else:
+        response = client.delete(f"/api/v1/orders/{order_id}", headers=customer)
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(Order, order_id).status == "shipped"
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.COMMITTED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (3, 2)
+
+
+def test_customer_cancel_of_a_processing_order_keeps_the_committed_sale(client, db, place_order):
+    shop, order_id = place_order()
+    assert client.put(
+        f"/api/v1/orders/{order_id}", headers=auth_headers(shop.admin_id), json={"status": "processing"}
+    ).status_code == 200
+
+    response = client.post(f"/api/v1/orders/{order_id}/cancel", headers=auth_headers(shop.customer_id))
+
+    assert response.status_code == 200, response.text
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.COMMITTED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (3, 2)
+
+
+def test_customer_delete_of_a_pending_order_returns_the_stock(client, db, place_order):
+    shop, order_id = place_order()
+
+    response = client.delete(f"/api/v1/orders/{order_id}", headers=auth_headers(shop.customer_id))
+
+    assert response.status_code == 200, response.text
+    assert _stock_and_sales(db, shop.product_ids[0]) == (5, 0)
+
+
+def test_placed_order_survives_a_sweep_and_takes_its_stock_again_when_paid(client, db, place_order):
+    shop, order_id = place_order()
+    db.query(InventoryReservation).filter_by(order_id=order_id).update(
+        {"expires_at": datetime.now(timezone.utc) - timedelta(minutes=1)}
+    )
+    db.commit()
+
+    assert asyncio.run(inventory.sweep_expired()) == 1
+
+    db.expire_all()
+    assert db.get(Order, order_id).status == "pending"
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.EXPIRED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (5, 0)
+
+    response = client.put(f"/api/v1/orders/{order_id}", headers=auth_headers(shop.admin_id), json={"payment_status": "paid"})
+
+    assert response.status_code == 200, response.text
+    assert _reservation_statuses(db, order_id) == {ReservationStatus.COMMITTED}
+    assert _stock_and_sales(db, shop.product_ids[0]) == (3, 2)
+
+
+def test_product_detail_shows_the_new_stock_after_checkout_and_cancel(client, place_order):
+    shop, order_id = place_order()
+    product_url = f"/api/v1/products/{shop.product_ids[0]}"
+    assert client.get(product_url).json()["stock"] == 3
+
+    client.post(f"/api/v1/orders/{order_id}/cancel", headers=auth_headers(shop.customer_id))
+    assert client.get(product_url).json()["stock"] == 5
+
+    place_order(shop)
+    assert client.get(product_url).json()["stock"] == 3
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.models.models import Product
+from app.services import product_counts
+from app.services.product_counts import ProductCountCache
+
+
+def test_invalidation_reaches_other_workers():
+    # Two workers' caches over the same (shared) backend
+    worker_a = ProductCountCache(ttl_seconds=60)
+    worker_b = ProductCountCache(ttl_seconds=60)
+    signature = product_counts.filter_signature(category_id=3, search="Shirt")
+
+    worker_a.set(signature, 42)
+    assert worker_b.get(signature) == 42
+
+    worker_b.invalidate()
+    assert worker_a.get(signature) is None
+
+
+def test_listing_total_follows_product_writes(client, catalog, db):
+    data = catalog(products=25)
+    assert client.get("/api/v1/products/?limit=5").json()["total"] == 25
+
+    db.query(Product).filter(Product.id == data.product_ids[0]).delete()
+    db.commit()
+    product_counts.invalidate()
+
+    assert client.get("/api/v1/products/?limit=5").json()["total"] == 24
+
+
+def test_async_listing_reads_and_writes_the_count_cache_off_the_event_loop(client, catalog, monkeypatch):
+    catalog(products=25)
+    calls = []
+
+    def record(name, method):
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls.append((name, "event loop"))
+            except RuntimeError:
+                calls.append((name, "thread"))
+            return method(*args, **kwargs)
+        return call
+
+    cache = product_counts.count_cache._cache
+    monkeypatch.setattr(cache, "get", record("get", cache.get))
+    monkeypatch.setattr(cache, "set", record("set", cache.set))
+
+    assert client.get("/api/v1/products/?limit=5").json()["total"] == 25
+
+    assert ("get", "thread") in calls and ("set", "thread") in calls
+    assert all(where == "thread" for _, where in calls)
@@ -0,0 +1,110 @@
+from app.models.models import Product
+from app.utils.http_cache import PRIVATE_CACHE_CONTROL
+from tests.conftest import auth_headers
+
+
+def test_product_list_query_count_does_not_grow_with_page_size(client, catalog, queries):
+    catalog(products=30)
+
+    counts = {}
+    for limit in (5, 25):
+        queries.clear()
+        response = client.get(f"/api/v1/products/?limit={limit}")
+        assert response.status_code == 200, response.text
+        assert len(response.json()["items"]) == limit
+        counts[limit] = len(queries)
+
+    # Page + images; the total is counted once, then cached for the same filters
+    assert counts[5] <= 3
+    assert counts[25] <= counts[5]
+
+
+def test_product_list_returns_images_without_extra_queries(client, catalog, queries):
+    catalog(products=10)
+    queries.clear()
+
+    response = client.get("/api/v1/products/?limit=10&include_total=false")
+
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert all(item["featured_image_url"] and len(item["images"]) == 2 for item in items)
+    assert len(queries) <= 2
+
+
+def test_cursor_pages_cover_every_product_once(client, catalog):
+    shop = catalog(products=7)
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/v1/products/?pagination=cursor&limit=3&sort_by=price&sort_order=asc"
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200, response.text
+        page = response.json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == shop.product_ids
+    assert page["total"] is None
+
+
+def test_cursor_from_another_sort_order_is_rejected(client, catalog):
+    catalog(products=3)
+    cursor = client.get("/api/v1/products/?pagination=cursor&limit=1").json()["next_cursor"]
+
+    response = client.get(f"/api/v1/products/?pagination=cursor&limit=1&sort_order=asc&cursor={cursor}")
+    assert response.status_code == 400
+    assert client.get("/api/v1/products/?pagination=cursor&cursor=not-a-cursor").status_code == 400
+
+
+def test_unchanged_listing_is_answered_with_304_until_a_product_changes(client, catalog, db):
+    shop = catalog(products=3)
+    first = client.get("/api/v1/products/")
+    etag = first.headers["etag"]
+
+    repeat = client.get("/api/v1/products/", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b"" and repeat.headers["etag"] == etag
+
+    db.get(Product, shop.product_ids[0]).price = 99
+    db.commit()
+    changed = client.get("/api/v1/products/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_admin_listing_is_private(client, catalog):
+    shop = catalog(products=1)
+
+    assert client.get("/api/v1/products/").headers["cache-control"] != PRIVATE_CACHE_CONTROL
+    assert client.get("/api/v1/products/", headers=auth_headers(shop.admin_id)).headers["cache-control"] == PRIVATE_CACHE_CONTROL
+
+
+def test_product_detail_honours_if_modified_since(client, catalog):
+    shop = catalog(products=1)
+    first = client.get(f"/api/v1/products/{shop.product_ids[0]}")
+
+    response = client.get(f"/api/v1/products/{shop.product_ids[0]}",
+                          headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert response.status_code == 304
+
+
+def test_product_detail_is_cached_under_its_id_and_slug(client, catalog, queries):
+    shop = catalog(products=1)
+    first = client.get(f"/api/v1/products/{shop.product_ids[0]}").json()
+
+    queries.clear()
+    by_id = client.get(f"/api/v1/products/{shop.product_ids[0]}").json()
+    by_slug = client.get("/api/v1/products/product-0").json()
+
+    assert by_id == by_slug == first
+    assert queries == []
+
+
+def test_missing_product_is_not_cached(client, catalog, queries):
+    catalog(products=0)
+    assert client.get("/api/v1/products/no-such-product").status_code == 404
+
+    queries.clear()
+    assert client.get("/api/v1/products/no-such-product").status_code == 404
+    assert queries != []
@@ -0,0 +1,51 @@
+from sqlalchemy import delete
+
+from app.models.models import Product, ProductRatingStats, Review
+from app.services import ratings
+from tests.conftest import auth_headers
+
+
+def _review(client, user_id, slug, rating):
+    response = client.post(f"/api/v1/products/{slug}/reviews", headers=auth_headers(user_id), json={"rating": rating})
+    assert response.status_code == 200, response.text
+
+
+def _rating(db, product_id):
+    db.expire_all()
+    product = db.get(Product, product_id)
+    return product.rating, product.reviews_count
+
+
+def test_reviews_update_the_running_totals_and_histogram(client, catalog, db):
+    shop = catalog(products=1)
+    product_url = f"/api/v1/products/{shop.product_ids[0]}"
+    assert client.get(product_url).json()["rating_histogram"] == ratings.empty_histogram()
+
+    _review(client, shop.customer_id, "product-0", 5)
+    _review(client, shop.admin_id, "product-0", 2)
+
+    stats = db.get(ProductRatingStats, shop.product_ids[0])
+    assert (stats.rating_sum, stats.rating_count) == (7, 2)
+    assert _rating(db, shop.product_ids[0]) == (3.5, 2)
+    detail = client.get(product_url).json()
+    assert detail["rating_histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+    assert detail["reviews_count"] == 2
+
+
+def test_reconcile_fixes_drift_across_batches(client, catalog, db):
+    shop = catalog(products=5)
+    for product_id in shop.product_ids:
+        _review(client, shop.customer_id, f"product-{product_id - shop.product_ids[0]}", 4)
+    first, last = shop.product_ids[0], shop.product_ids[-1]
+    # A review removed directly in the database, and a product whose stats row was lost
+    db.execute(delete(Review).where(Review.product_id == first, Review.user_id == shop.customer_id))
+    db.execute(delete(ProductRatingStats).where(ProductRatingStats.product_id == last))
+    db.commit()
+
+    assert ratings.reconcile_rating_stats(batch_size=2) == 2
+
+    assert _rating(db, first) == (0.0, 0)
+    assert db.get(ProductRatingStats, first).histogram == ratings.empty_histogram()
+    assert _rating(db, last) == (4.0, 1)
+    assert db.get(ProductRatingStats, last).stars_4 == 1
+    assert ratings.reconcile_rating_stats(batch_size=2) == 0
@@ -0,0 +1,46 @@
+from sqlalchemy import func, select
+
+from app.models.models import FrequentlyBoughtTogether, JobState, ProductRelated
+from app.services import related_products
+
+
+def _related_rows(db):
+    db.expire_all()
+    return db.scalar(select(func.count()).select_from(ProductRelated))
+
+
+def test_rebuild_ranks_every_product_and_records_the_run(catalog, db):
+    catalog(products=6)
+
+    assert related_products.rebuild_related_products() == 6
+
+    assert _related_rows(db) == 6 * 5
+    assert db.get(JobState, related_products.JOB_NAME).processed_count == 6
+
+
+def test_rebuild_is_skipped_while_another_worker_holds_the_lock(catalog, db, monkeypatch):
+    catalog(products=6)
+    related_products.rebuild_related_products()
+    monkeypatch.setattr(related_products, "lock_job_state", lambda db, name: None)
+
+    assert related_products.rebuild_related_products() == 0
+
+    assert _related_rows(db) == 6 * 5
+
+
+def test_frequently_bought_together_products_rank_first(catalog, db, monkeypatch):
+    shop = catalog(products=6)
+    # Product 1 is in the parent category, product 0 in the subcategory
+    product, bought_with = shop.product_ids[1], shop.product_ids[0]
+    db.add(FrequentlyBoughtTogether(
+        product_id=product, rank=1, related_product_id=bought_with, score=0.9, orders_count=4,
+    ))
+    db.commit()
+    monkeypatch.setattr(related_products, "RANK_BATCH_SIZE", 2)
+
+    related_products.rebuild_related_products()
+
+    top = db.scalar(select(ProductRelated.related_product_id).where(
+        ProductRelated.product_id == product, ProductRelated.rank == 1,
+    ))
+    assert top == bought_with
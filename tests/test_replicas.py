@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from app.core import replicas
+from app.core.cache import RedisCacheBackend, set_cache_backend
+from app.core.config import settings
+from app.core.database import engine
+from tests.fake_redis import FakeRedis
+
+
+class DeadSession:
+    closed = False
+
+    def connection(self):
+        raise ConnectionError("replica unreachable")
+
+    def close(self):
+        self.closed = True
+
+
+def _replica(name, session_factory=None):
+    return replicas.Replica(
+        name=name, url=f"postgresql://{name}", engine=None, async_engine=None,
+        session_factory=session_factory, async_session_factory=None,
+    )
+
+
+@pytest.fixture
+def shared_backend():
+    backend = RedisCacheBackend(client=FakeRedis())
+    set_cache_backend(backend)
+    return backend
+
+
+def test_reads_rotate_over_healthy_replicas_and_skip_failed_ones():
+    router = replicas.ReplicaRouter(replicas=[_replica("a"), _replica("b")])
+
+    first = [replica.name for replica in router.candidates()]
+    second = [replica.name for replica in router.candidates()]
+    assert sorted(first) == sorted(second) == ["a", "b"] and first != second
+
+    router.mark_down(router.replicas[0], ConnectionError("down"))
+    assert [replica.name for replica in router.candidates()] == ["b"]
+
+    router.mark_down(router.replicas[1], ConnectionError("down"))
+    assert router.candidates() == []
+
+
+def test_read_session_falls_back_to_the_primary_when_the_replica_is_down(monkeypatch):
+    dead = DeadSession()
+    router = replicas.ReplicaRouter(replicas=[_replica("a", session_factory=lambda: dead)])
+    monkeypatch.setattr(replicas, "router", router)
+
+    sessions = replicas.get_read_db()
+    db = next(sessions)
+
+    assert db.get_bind() is engine
+    assert dead.closed
+    assert not router.replicas[0].healthy
+    sessions.close()
+
+
+def test_a_write_in_one_worker_keeps_every_worker_on_the_primary(shared_backend, monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 0.2)
+    writer = replicas.ReplicaRouter(replicas=[_replica("a")])
+    reader = replicas.ReplicaRouter(replicas=[_replica("a")])
+
+    writer.note_write()
+
+    assert writer.candidates() == []
+    assert reader.candidates() == []
+    time.sleep(0.3)
+    assert [replica.name for replica in reader.candidates()] == ["a"]
+
+
+def test_guard_falls_back_to_the_writing_process_when_redis_is_down(shared_backend, monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 60)
+    shared_backend.client.down = True
+    writer = replicas.ReplicaRouter(replicas=[_replica("a")])
+    reader = replicas.ReplicaRouter(replicas=[_replica("a")])
+
+    writer.note_write()
+
+    assert writer.candidates() == []
+    assert [replica.name for replica in reader.candidates()] == ["a"]
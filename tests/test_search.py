@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import search
+
+
+class PostgresSession:
+    """Just enough of a Session for uses_fulltext() to see a PostgreSQL bind."""
+
+    bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), url="postgresql://shop")
+
+    def get_bind(self):
+        return self.bind
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    """The products columns the fake database reports; records each inspection."""
+    state = SimpleNamespace(columns=["id", "name"], inspections=0, now=1000.0)
+
+    def get_columns(table):
+        state.inspections += 1
+        return [{"name": name} for name in state.columns]
+
+    monkeypatch.setattr(search, "_fulltext_available", {})
+    monkeypatch.setattr(search, "inspect", lambda bind: SimpleNamespace(get_columns=get_columns))
+    monkeypatch.setattr(search.time, "monotonic", lambda: state.now)
+    return state
+
+
+def test_fulltext_check_is_cached_until_the_ttl_expires(schema):
+    db = PostgresSession()
+    assert not search.uses_fulltext(db)
+
+    schema.columns.append("search_vector")
+    schema.now += search.FULLTEXT_CHECK_TTL_SECONDS - 1
+    assert not search.uses_fulltext(db)
+    assert schema.inspections == 1
+
+    schema.now += 1
+    assert search.uses_fulltext(db)
+    assert schema.inspections == 2
+
+
+def test_forgotten_check_is_redone_on_the_next_search(schema):
+    db = PostgresSession()
+    schema.columns.append("search_vector")
+    assert search.uses_fulltext(db)
+
+    schema.columns.remove("search_vector")
+    search.forget_fulltext_check(db)
+
+    assert not search.uses_fulltext(db)
+    assert schema.inspections == 2
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models.models import Product
+from app.services import view_counter
+from app.services.view_counter import ViewCounter
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    counter = ViewCounter(max_pending_products=3, batch_size=2)
+    monkeypatch.setattr(view_counter, "view_counter", counter)
+    return counter
+
+
+def _views(db, product_ids):
+    db.expire_all()
+    return [db.get(Product, product_id).views_count for product_id in product_ids]
+
+
+def test_detail_views_are_buffered_until_flushed(client, catalog, db, counter):
+    shop = catalog(products=2)
+    updated_at = db.get(Product, shop.product_ids[0]).updated_at
+    for product_id in (shop.product_ids[0], shop.product_ids[0], shop.product_ids[1]):
+        assert client.get(f"/api/v1/products/{product_id}").status_code == 200
+
+    assert _views(db, shop.product_ids) == [0, 0]
+    assert view_counter.flush() == 3
+
+    assert _views(db, shop.product_ids) == [2, 1]
+    assert db.get(Product, shop.product_ids[0]).updated_at == updated_at
+    assert counter.stats()["pending_views"] == 0
+
+
+def test_failed_batch_is_requeued_without_repeating_committed_ones(catalog, db, counter, monkeypatch):
+    shop = catalog(products=3)
+    for product_id in shop.product_ids:
+        counter.record(product_id, views=2)
+    execute, calls = db.execute, []
+
+    def fail_second_batch(statement, *args, **kwargs):
+        calls.append(statement)
+        if len(calls) == 2:
+            raise OperationalError("UPDATE products", {}, Exception("database is locked"))
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", fail_second_batch)
+    assert counter.flush(db) == 4
+
+    assert _views(db, shop.product_ids) == [2, 2, 0]
+    assert counter.stats()["pending_views"] == 2 and counter.failed_flushes == 1
+
+    assert counter.flush(db) == 2
+    assert _views(db, shop.product_ids) == [2, 2, 2]
+
+
+def test_views_of_new_products_are_dropped_once_the_buffer_is_full(counter):
+    for product_id in range(1, 6):
+        counter.record(product_id)
+    counter.record(1)
+
+    stats = counter.stats()
+    assert (stats["pending_products"], stats["pending_views"], stats["dropped"]) == (3, 4, 2)